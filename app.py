@@ -1,15 +1,31 @@
-from flask import Flask, jsonify, request, render_template, send_from_directory, session, redirect, url_for, has_request_context, g
+from flask import Flask, Response, jsonify, request, render_template, send_from_directory, session, redirect, url_for, has_request_context, g
+from werkzeug.middleware.proxy_fix import ProxyFix
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.pool
+import psycopg2.extensions
+import psycopg2.errors
+from psycopg2.extras import RealDictCursor, Json, execute_values
 import os
+import re
+import click
 import csv
+import codecs
 import io
+import json
+import functools
+import itertools
 from datetime import datetime, timezone, timedelta
 import uuid
 import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import time as time_module
 from functools import wraps
 import smtplib
+import socket
+import select
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
@@ -20,10 +36,7 @@ from logging.handlers import RotatingFileHandler
 import jwt
 import secrets
 import hashlib
-from argon2 import PasswordHasher, exceptions as argon2_exceptions
-
-# Argon2 hasher instance (raise if argon2-cffi missing so failures are visible)
-ph = PasswordHasher()
+from password_hashing import ph, verify_password
 
 # Configure logging with rotation
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
@@ -62,6 +75,15 @@ logger.info("Application starting")
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
+# Reverse proxies in front of the app. Each one appends the client address to
+# X-Forwarded-For; only that many trailing hops are trusted for
+# request.remote_addr (login rate limits, refresh token records), so clients
+# cannot spoof it. 0 means the app is reached directly and the headers are ignored.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+if TRUSTED_PROXY_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS, x_proto=TRUSTED_PROXY_HOPS,
+                            x_host=TRUSTED_PROXY_HOPS)
+
 # Application version
 
 __version__ = '3.0.0'
@@ -130,10 +152,372 @@ MAX_AVATAR_SIZE = 5 * 1024 * 1024  # 5MB
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# --- Cooperative (gevent) workers ---
+# With GUNICORN_WORKER_CLASS=gevent (see gunicorn.conf.py) each worker serves
+# many requests at once on greenlets. gunicorn monkey-patches sockets, select,
+# threading and sleep before this module is imported, which makes SMTP, the
+# invalidation listener and all locks cooperative. psycopg2 talks to libpq
+# directly, so it is switched to non-blocking mode with a wait callback that
+# yields to other greenlets while a query is in flight.
+try:
+    from gevent import monkey as gevent_monkey, socket as gevent_socket
+except ImportError:
+    gevent_monkey = None
+GEVENT_WORKER = gevent_monkey is not None and gevent_monkey.is_module_patched('socket')
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 wait callback that waits for the connection's socket via gevent."""
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            break
+        elif state == psycopg2.extensions.POLL_READ:
+            gevent_socket.wait_read(conn.fileno(), timeout=timeout)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            gevent_socket.wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f'Bad result from poll: {state!r}')
+
+
+if GEVENT_WORKER:
+    psycopg2.extensions.set_wait_callback(gevent_wait_callback)
+    logger.info("gevent worker: psycopg2 made cooperative")
+
+# --- Database connection pool ---
+# Connections are borrowed from a bounded per-process pool instead of opening a
+# new PostgreSQL session for every call. Inside a request the same physical
+# connection is reused by every get_db_connection() call and handed back to the
+# pool when the app context tears down.
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+
+
+class DatabasePool:
+    """Bounded, thread-safe and fork-aware PostgreSQL connection pool.
+
+    Wraps psycopg2's ThreadedConnectionPool with a semaphore so callers wait
+    (up to DB_POOL_TIMEOUT) for a free connection instead of failing as soon
+    as the pool is exhausted. The pool remembers the PID that created it; a
+    forked child (e.g. a gunicorn worker) builds its own pool rather than
+    sharing the parent's sockets.
+    """
+
+    def __init__(self, dsn, minconn, maxconn, timeout):
+        self.dsn = dsn
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        # Pools inherited across fork are kept referenced (never closed) so the
+        # child does not terminate the parent's server sessions on GC.
+        self._abandoned = []
+
+    def _ensure_pool(self):
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._pool is not None and self._pid == pid:
+                return
+            if self._pool is not None:
+                self._abandoned.append(self._pool)
+            self._pool = psycopg2.pool.ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn)
+            self._slots = threading.BoundedSemaphore(self.maxconn)
+            self._pid = pid
+            self._in_use = 0
+
+    def getconn(self):
+        """Borrow a connection, waiting up to `timeout` seconds for a free slot."""
+        self._ensure_pool()
+        started = time_module.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise psycopg2.pool.PoolError(f'Timed out after {self.timeout}s waiting for a database connection')
+        waited = time_module.monotonic() - started
+        try:
+            conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection, discarding it if it is broken or mid-transaction."""
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                discard = True
+        try:
+            self._pool.putconn(conn, close=discard)
+        finally:
+            with self._lock:
+                self._in_use = max(0, self._in_use - 1)
+            self._slots.release()
+
+    def stats(self):
+        """Return a snapshot of pool size, checkout and wait-time metrics."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'pid': self._pid,
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'idle': len(self._pool._pool) if self._pool is not None else 0,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'wait_avg_ms': round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+db_pool = DatabasePool(DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT)
+
+
+class PooledConnection:
+    """Proxy around a pooled psycopg2 connection.
+
+    Behaves like the underlying connection except that close() hands the
+    connection back instead of terminating the session. Uncommitted work is
+    rolled back on close, matching what closing a real connection does.
+    Request-scoped proxies are reference counted so nested helpers (permission
+    decorator, settings lookups, notifications) share one connection per
+    request.
+    """
+
+    def __init__(self, conn, request_scoped=False):
+        self._conn = conn
+        self._request_scoped = request_scoped
+        self._refs = 1
+        self._released = False
+        self._commits_held = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __del__(self):
+        # Safety net for code paths that drop a connection without closing it
+        try:
+            self.release()
+        except Exception:
+            pass
+
+    def _execute(self, sql):
+        with self._conn.cursor() as cursor:
+            cursor.execute(sql)
+
+    def commit(self):
+        if self._commits_held:
+            self._execute('SAVEPOINT held_commit')
+        else:
+            self._conn.commit()
+
+    def rollback(self):
+        if self._commits_held:
+            self._execute('ROLLBACK TO SAVEPOINT held_commit')
+        else:
+            self._conn.rollback()
+
+    def hold_commits(self):
+        """Keep the transaction open across commit() calls until release_commits().
+
+        While held, commit() only marks a savepoint and rollback() returns to
+        the last one, so a wrapper (see idempotent) can add its own writes to
+        the transaction and commit everything at once.
+        """
+        self._execute('SAVEPOINT held_commit')
+        self._commits_held = True
+
+    def release_commits(self):
+        """Stop holding commits, discarding work done since the last commit(); the caller commits."""
+        self._commits_held = False
+        self._execute('ROLLBACK TO SAVEPOINT held_commit')
+
+    def close(self):
+        if self._released:
+            return
+        if self._request_scoped:
+            self._refs = max(0, self._refs - 1)
+            if self._refs == 0 and not self._conn.closed:
+                try:
+                    self._conn.rollback()
+                except Exception:
+                    pass
+            return
+        self.release()
+
+    def release(self):
+        """Return the connection to the pool (idempotent)."""
+        if self._released:
+            return
+        self._released = True
+        db_pool.putconn(self._conn)
+
+
 def get_db_connection():
-    """Get a database connection with dictionary cursor."""
-    conn = psycopg2.connect(DATABASE_URL)
-    return conn
+    """Get a pooled database connection.
+
+    Within a request every call returns the same request-scoped connection;
+    it goes back to the pool when the request ends. Outside a request (background
+    jobs) each call borrows its own connection until close() is called.
+    """
+    if has_request_context():
+        conn = g.get('_db_conn')
+        if conn is not None and not conn._released and not conn._conn.closed:
+            conn._refs += 1
+            return conn
+        conn = PooledConnection(db_pool.getconn(), request_scoped=True)
+        g._db_conn = conn
+        return conn
+    return PooledConnection(db_pool.getconn())
+
+
+def take_request_connection():
+    """Take the request's connection for work that outlives the request.
+
+    Used by streamed responses, whose body is produced after the request has
+    finished: the request-scoped connection (if any) is handed over instead of
+    borrowing a second one, so a request never holds two pool connections
+    while waiting. The caller owns the returned connection and must close()
+    it; later get_db_connection() calls in the request borrow a fresh one.
+    """
+    conn = g.pop('_db_conn', None) if has_request_context() else None
+    if conn is None or conn._released or conn._conn.closed:
+        return PooledConnection(db_pool.getconn())
+    # Detach the request-scoped proxy so its remaining close() calls are no-ops
+    conn._released = True
+    return PooledConnection(conn._conn)
+
+
+@app.teardown_appcontext
+def release_db_connection(exc):
+    """Return the request-scoped connection to the pool."""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.release()
+    # The request's transaction has committed by now; wake a sender for its email
+    if g.pop('_email_queued', False):
+        email_outbox_wakeup.set()
+
+
+# --- Streaming queries ---
+# Large reads go through a server-side (named) cursor that fetches
+# QUERY_STREAM_ITERSIZE rows per round trip, so only one batch is held in
+# memory at a time instead of the whole result.
+QUERY_STREAM_ITERSIZE = int(os.environ.get('QUERY_STREAM_ITERSIZE', 1000))
+# Bytes of encoded output buffered before a chunk is sent to the client
+STREAM_CHUNK_SIZE = 64 * 1024
+_query_stream_ids = itertools.count(1)
+
+
+class QueryStream:
+    """Rows of a query read through a server-side cursor, a batch at a time.
+
+    Iterating yields plain tuples; `columns` holds the column names once the
+    first batch has been fetched. The cursor lives in the connection's
+    current transaction and is closed when iteration ends or close() is
+    called.
+    """
+
+    def __init__(self, conn, sql, params=None, itersize=QUERY_STREAM_ITERSIZE):
+        self.cursor = conn.cursor(name=f'query_stream_{next(_query_stream_ids)}')
+        self.cursor.itersize = itersize
+        self.columns = None
+        try:
+            self.cursor.execute(sql, params)
+        except Exception:
+            self.cursor.close()
+            raise
+
+    def __iter__(self):
+        try:
+            for row in self.cursor:
+                if self.columns is None:
+                    self.columns = tuple(column[0] for column in self.cursor.description)
+                yield row
+        finally:
+            self.close()
+
+    def dicts(self):
+        """Iterate the rows as {column: value} dicts."""
+        for row in self:
+            yield dict(zip(self.columns, row))
+
+    def close(self):
+        if not self.cursor.closed:
+            self.cursor.close()
+
+
+def encode_json_rows(stream, transform=None):
+    """Encode a QueryStream as a JSON array of objects, yielded in chunks.
+
+    Values are serialized by the app's JSON provider, so dates and keys look
+    exactly as they do with jsonify(). `transform` may rewrite each row dict.
+    """
+    dumps = functools.partial(app.json.dumps, separators=(',', ':'))
+    buffer = io.StringIO()
+    buffer.write('[')
+    separator = ''
+    for row in stream.dicts():
+        buffer.write(separator)
+        buffer.write(dumps(transform(row) if transform else row))
+        separator = ','
+        if buffer.tell() >= STREAM_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    buffer.write(']\n')
+    yield buffer.getvalue()
+
+
+def stream_json_array_response(sql, params=None, transform=None):
+    """Run a query and stream its rows to the client as a JSON array.
+
+    The body is produced after the request has finished, so the query runs
+    on the request's connection taken over with take_request_connection(),
+    returned to the pool when the stream ends or the client disconnects.
+    Errors in the query itself are raised here, before any output is sent.
+    """
+    conn = take_request_connection()
+    try:
+        stream = QueryStream(conn, sql, params)
+    except Exception:
+        conn.close()
+        raise
+
+    def generate():
+        try:
+            yield from encode_json_rows(stream, transform)
+        except Exception as e:
+            logger.error(f"Error while streaming query results: {e}", exc_info=True)
+            raise
+        finally:
+            stream.close()
+            conn.close()
+
+    return Response(generate(), mimetype='application/json')
 
 
 # --- JWT / Refresh token helpers ---
@@ -142,6 +526,8 @@ JWT_ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRES = int(os.environ.get('ACCESS_TOKEN_EXPIRES', 900))  # 15 minutes default
 # Refresh token lifetime in seconds (long-lived)
 REFRESH_TOKEN_EXPIRES = int(os.environ.get('REFRESH_TOKEN_EXPIRES', 60 * 60 * 24 * 30))  # 30 days
+# Active refresh tokens kept per tenant; issuing one more revokes the oldest (0 = unlimited)
+REFRESH_TOKENS_MAX_PER_TENANT = int(os.environ.get('REFRESH_TOKENS_MAX_PER_TENANT', 50))
 
 def create_access_token(tenant_id: str):
     now = datetime.utcnow()
@@ -153,47 +539,584 @@ def create_access_token(tenant_id: str):
     token = jwt.encode(payload, app.secret_key, algorithm=JWT_ALGORITHM)
     return token
 
-def create_refresh_token_record(conn, tenant_id, user_agent=None, ip_address=None):
+# Issues a refresh token in one statement: optionally stores an upgraded
+# password hash for the tenant (rehash on login), inserts the token and
+# revokes the tenant's oldest active tokens beyond REFRESH_TOKENS_MAX_PER_TENANT.
+# The new token is not visible to the statement's own snapshot, so one fewer
+# existing token is kept.
+ISSUE_REFRESH_TOKEN_SQL = '''
+    WITH rehashed AS (
+        UPDATE tenants SET tenant_password = %(password_hash)s
+        WHERE tenant_id = %(tenant_id)s AND %(password_hash)s IS NOT NULL
+    ), issued AS (
+        INSERT INTO refresh_tokens (tenant_id, token_hash, issued_at, expires_at, user_agent, ip_address)
+        VALUES (%(tenant_id)s, %(token_hash)s, %(issued_at)s, %(expires_at)s, %(user_agent)s, %(ip_address)s)
+    ), evicted AS (
+        UPDATE refresh_tokens SET revoked = TRUE
+        WHERE %(max_tokens)s > 0 AND tenant_id = %(tenant_id)s AND (id, expires_at) IN (
+            SELECT id, expires_at FROM refresh_tokens
+            WHERE tenant_id = %(tenant_id)s AND NOT revoked AND expires_at > %(issued_at)s
+            ORDER BY issued_at DESC, id DESC
+            OFFSET GREATEST(%(max_tokens)s - 1, 0)
+        )
+        RETURNING token_hash
+    )
+    SELECT token_hash, pg_notify(%(channel)s, 'token:' || token_hash) FROM evicted
+'''
+
+
+def create_refresh_token_record(conn, tenant_id, user_agent=None, ip_address=None, password_hash=None):
+    """Issue a refresh token for the tenant and commit.
+
+    password_hash, when given, replaces the tenant's stored password hash in
+    the same statement.
+
+    Returns:
+        (token, expires_at)
+    """
     # Create a cryptographically random token, store its sha256 hash in DB
     token = secrets.token_urlsafe(64)
     token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
     issued_at = datetime.utcnow()
     expires_at = issued_at + timedelta(seconds=REFRESH_TOKEN_EXPIRES)
     cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO refresh_tokens (tenant_id, token_hash, issued_at, expires_at, user_agent, ip_address) VALUES (%s, %s, %s, %s, %s, %s) RETURNING id",
-        (tenant_id, token_hash, issued_at, expires_at, user_agent, ip_address)
-    )
+    cur.execute(ISSUE_REFRESH_TOKEN_SQL, {
+        'tenant_id': tenant_id, 'token_hash': token_hash, 'issued_at': issued_at, 'expires_at': expires_at,
+        'user_agent': user_agent, 'ip_address': ip_address, 'password_hash': password_hash,
+        'max_tokens': REFRESH_TOKENS_MAX_PER_TENANT, 'channel': REFRESH_TOKEN_REVOKED_CHANNEL,
+    })
+    # Other processes drop evicted tokens on the NOTIFY; this one right away
+    for evicted_hash, _ in cur.fetchall():
+        refresh_token_cache.invalidate(token_hash=evicted_hash)
     conn.commit()
     cur.close()
     return token, expires_at
 
-# Argon2 password hasher instance
-try:
-    ph = PasswordHasher()
-except Exception:
-    ph = None
-
 def revoke_refresh_token(conn, token):
     token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
     cur = conn.cursor()
-    cur.execute('UPDATE refresh_tokens SET revoked = TRUE WHERE token_hash = %s', (token_hash,))
+    cur.execute('UPDATE refresh_tokens SET revoked = TRUE WHERE token_hash = %s AND expires_at > %s',
+                (token_hash, datetime.utcnow()))
+    notify_refresh_tokens_revoked(cur, token_hash=token_hash)
     conn.commit()
     cur.close()
 
 def validate_refresh_token(conn, token):
     token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    now = datetime.utcnow()
     cur = conn.cursor()
-    cur.execute('SELECT id, tenant_id, issued_at, expires_at, revoked FROM refresh_tokens WHERE token_hash = %s', (token_hash,))
+    # The expiry bound lets the planner skip partitions of expired tokens
+    cur.execute('SELECT id, tenant_id, issued_at, expires_at, revoked FROM refresh_tokens WHERE token_hash = %s AND expires_at > %s',
+                (token_hash, now))
     row = cur.fetchone()
     cur.close()
     if not row:
         return None
     id_, tenant_id, issued_at, expires_at, revoked = row
-    now = datetime.utcnow()
     if revoked or expires_at < now:
         return None
-    return {'id': id_, 'tenant_id': tenant_id}
+    return {'id': id_, 'tenant_id': tenant_id, 'expires_at': expires_at}
+
+# --- Cross-process cache invalidation ---
+# In-process caches stay coherent across gunicorn workers and containers by
+# LISTENing on PostgreSQL notification channels. Writers call pg_notify() in
+# the same transaction as the change, so the notification is delivered only
+# if (and when) the change commits.
+
+
+class InvalidationListener:
+    """Dispatch PostgreSQL NOTIFY messages to in-process cache handlers.
+
+    Holds one dedicated autocommit connection per process, outside the pool.
+    While that connection is down notifications can be missed, so every
+    subscriber's reset callback runs on disconnect and caches must not be
+    trusted until `connected` is set again.
+    """
+
+    def __init__(self, dsn, keepalive=30):
+        self.dsn = dsn
+        self.keepalive = keepalive
+        self.connected = threading.Event()
+        self._handlers = {}
+        self._resets = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.notifications = 0
+        self.reconnects = 0
+
+    def subscribe(self, channel, handler, reset=None):
+        """Call handler(payload) for each notification on `channel`; reset() on disconnect."""
+        with self._lock:
+            self._handlers.setdefault(channel, []).append(handler)
+            if reset is not None:
+                self._resets.append(reset)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="InvalidationListener")
+            self._thread.start()
+
+    def _reset_all(self):
+        self.connected.clear()
+        for reset in list(self._resets):
+            try:
+                reset()
+            except Exception as e:
+                logger.error(f"Cache reset failed: {e}", exc_info=True)
+
+    def _dispatch(self, notify):
+        self.notifications += 1
+        for handler in self._handlers.get(notify.channel, []):
+            try:
+                handler(notify.payload)
+            except Exception as e:
+                logger.error(f"Invalidation handler for {notify.channel} failed: {e}", exc_info=True)
+
+    def _run(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                cur = conn.cursor()
+                for channel in list(self._handlers):
+                    cur.execute(f'LISTEN {channel}')
+                # Anything cached before this point may have missed a notification
+                self._reset_all()
+                self.connected.set()
+                logger.info(f"Invalidation listener connected: {', '.join(self._handlers)}")
+                while True:
+                    if select.select([conn], [], [], self.keepalive) == ([], [], []):
+                        # Idle: make sure the connection is still alive
+                        cur.execute('SELECT 1')
+                    conn.poll()
+                    while conn.notifies:
+                        self._dispatch(conn.notifies.pop(0))
+            except Exception as e:
+                logger.warning(f"Invalidation listener disconnected: {e}")
+            finally:
+                self._reset_all()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self.reconnects += 1
+            time_module.sleep(5)
+
+    def stats(self):
+        return {
+            'connected': self.connected.is_set(),
+            'channels': sorted(self._handlers),
+            'notifications': self.notifications,
+            'reconnects': self.reconnects,
+        }
+
+
+invalidation_listener = InvalidationListener(DATABASE_URL)
+
+# --- Verified refresh token cache ---
+# Cookie-authenticated requests look the refresh token up here before going to
+# the database. Entries live for at most REFRESH_TOKEN_CACHE_TTL seconds and
+# are dropped as soon as a revocation is NOTIFYed; 0 disables the cache.
+REFRESH_TOKEN_CACHE_TTL = float(os.environ.get('REFRESH_TOKEN_CACHE_TTL', 60))
+REFRESH_TOKEN_CACHE_SIZE = int(os.environ.get('REFRESH_TOKEN_CACHE_SIZE', 10000))
+REFRESH_TOKEN_REVOKED_CHANNEL = 'refresh_token_revoked'
+
+
+class RefreshTokenCache:
+    """Bounded LRU of token hash -> tenant for refresh tokens verified in the DB.
+
+    `generation` is bumped on every invalidation; a lookup that started
+    before an invalidation cannot store its (possibly stale) result.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and invalidation_listener.connected.is_set()
+
+    def get(self, token_hash):
+        """Return the cached tenant_id for a valid token, or None."""
+        if not self.enabled:
+            with self._lock:
+                self.bypassed += 1
+            return None
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is not None:
+                tenant_id, expires_at, cached_at = entry
+                if time_module.monotonic() - cached_at < self.ttl and expires_at > datetime.utcnow():
+                    self._entries.move_to_end(token_hash)
+                    self.hits += 1
+                    return tenant_id
+                del self._entries[token_hash]
+            self.misses += 1
+            return None
+
+    def put(self, token_hash, tenant_id, expires_at, generation):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[token_hash] = (tenant_id, expires_at, time_module.monotonic())
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token_hash=None, tenant_id=None):
+        """Drop one token, every token of a tenant, or (no arguments) everything."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if token_hash is None and tenant_id is None:
+                self._entries.clear()
+            elif token_hash is not None:
+                self._entries.pop(token_hash, None)
+            else:
+                tenant_id = str(tenant_id)
+                for key in [k for k, v in self._entries.items() if str(v[0]) == tenant_id]:
+                    del self._entries[key]
+
+    def handle_notification(self, payload):
+        kind, _, value = (payload or '').partition(':')
+        if kind == 'token':
+            self.invalidate(token_hash=value)
+        elif kind == 'tenant':
+            self.invalidate(tenant_id=value)
+        else:
+            self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+refresh_token_cache = RefreshTokenCache(REFRESH_TOKEN_CACHE_TTL, REFRESH_TOKEN_CACHE_SIZE)
+invalidation_listener.subscribe(REFRESH_TOKEN_REVOKED_CHANNEL, refresh_token_cache.handle_notification,
+                                refresh_token_cache.invalidate)
+
+
+def notify_refresh_tokens_revoked(cursor, token_hash=None, tenant_id=None):
+    """Invalidate cached refresh tokens here and, on commit, in every other process.
+
+    Call with the cursor of the transaction that revokes the token(s).
+    """
+    payload = f'token:{token_hash}' if token_hash else f'tenant:{tenant_id}'
+    cursor.execute('SELECT pg_notify(%s, %s)', (REFRESH_TOKEN_REVOKED_CHANNEL, payload))
+    refresh_token_cache.invalidate(token_hash=token_hash, tenant_id=tenant_id)
+
+
+def authenticate_refresh_token(token):
+    """Return the tenant_id for a valid refresh token, using the cache when possible."""
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    tenant_id = refresh_token_cache.get(token_hash)
+    if tenant_id is not None:
+        return tenant_id
+    generation = refresh_token_cache.generation
+    conn = get_db_connection()
+    try:
+        valid = validate_refresh_token(conn, token)
+    finally:
+        conn.close()
+    if not valid:
+        return None
+    refresh_token_cache.put(token_hash, valid['tenant_id'], valid['expires_at'], generation)
+    return valid['tenant_id']
+
+# --- Refresh token compaction ---
+# `refresh_tokens` is range-partitioned by month of expires_at (migration 005).
+# Once a month has passed, its partition holds nothing but expired tokens and
+# is dropped whole; revoked and expired rows in the live partitions are
+# deleted in batches. Runs as the daily `refresh_token_compaction` job.
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.environ.get('REFRESH_TOKEN_PURGE_BATCH_SIZE', 5000))
+REFRESH_TOKEN_PARTITION_RE = re.compile(r'^refresh_tokens_(\d{4})(\d{2})$')
+
+REFRESH_TOKEN_PARTITIONS_SQL = '''
+    SELECT c.relname, GREATEST(c.reltuples, 0)::bigint AS estimated_rows
+    FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'refresh_tokens'::regclass
+    ORDER BY c.relname
+'''
+
+
+def _next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def compact_refresh_tokens(now=None):
+    """Create upcoming partitions, drop expired ones and purge dead tokens.
+
+    Each step commits on its own so a long purge never holds locks for long.
+
+    Returns:
+        Report dict with the partitions created and dropped, rows removed by
+        dropping partitions and by batched deletes, the rows left and the
+        purge throughput (rows_per_second).
+    """
+    now = now or datetime.utcnow()
+    started = time_module.monotonic()
+    report = {'created_partitions': [], 'dropped_partitions': [], 'dropped_rows': 0, 'deleted_rows': 0}
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        # Partitions for every month a token issued from now on can expire in
+        month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        horizon = now + timedelta(seconds=REFRESH_TOKEN_EXPIRES)
+        while month <= horizon:
+            cursor.execute('SELECT create_refresh_token_partition(%s)', (month,))
+            if cursor.fetchone()[0]:
+                report['created_partitions'].append(f"refresh_tokens_{month:%Y%m}")
+            conn.commit()
+            month = _next_month(month)
+
+        cursor.execute(REFRESH_TOKEN_PARTITIONS_SQL)
+        for name, _ in cursor.fetchall():
+            match = REFRESH_TOKEN_PARTITION_RE.match(name)
+            if not match or _next_month(datetime(int(match.group(1)), int(match.group(2)), 1)) > now:
+                continue
+            cursor.execute(f'SELECT COUNT(*) FROM {name}')
+            report['dropped_rows'] += cursor.fetchone()[0]
+            cursor.execute(f'DROP TABLE {name}')
+            conn.commit()
+            report['dropped_partitions'].append(name)
+
+        # Keyset batches over the primary key, so each row is visited once
+        last_id = 0
+        while True:
+            cursor.execute('''
+                WITH doomed AS (
+                    SELECT id, expires_at FROM refresh_tokens
+                    WHERE id > %s AND (revoked OR expires_at <= %s)
+                    ORDER BY id
+                    LIMIT %s
+                )
+                DELETE FROM refresh_tokens r USING doomed d
+                WHERE r.id = d.id AND r.expires_at = d.expires_at
+                RETURNING r.id
+            ''', (last_id, now, REFRESH_TOKEN_PURGE_BATCH_SIZE))
+            deleted = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+            report['deleted_rows'] += len(deleted)
+            if len(deleted) < REFRESH_TOKEN_PURGE_BATCH_SIZE:
+                break
+            last_id = max(deleted)
+
+        cursor.execute('SELECT COUNT(*) FROM refresh_tokens')
+        report['remaining_rows'] = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    seconds = time_module.monotonic() - started
+    purged = report['dropped_rows'] + report['deleted_rows']
+    report['seconds'] = round(seconds, 3)
+    report['rows_per_second'] = round(purged / seconds, 1) if seconds else None
+    logger.info(f"Refresh token compaction purged {purged} row(s) in {seconds:.3f}s "
+                f"({len(report['dropped_partitions'])} partition(s) dropped, {report['remaining_rows']} left)")
+    return report
+
+
+def get_refresh_token_table_stats():
+    """Return estimated row counts per refresh_tokens partition for metrics reporting."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(REFRESH_TOKEN_PARTITIONS_SQL)
+        partitions = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+    return {'estimated_rows': sum(partitions.values()), 'partitions': partitions}
+
+
+@app.cli.command('compact-refresh-tokens')
+def compact_refresh_tokens_command():
+    """Drop expired refresh token partitions and purge revoked tokens now."""
+    click.echo(json.dumps(compact_refresh_tokens(), indent=2))
+
+
+# --- Tenant settings / permissions cache ---
+# Settings and kid permissions are read on almost every request but change
+# rarely. Every change bumps the tenant's row in tenant_config_versions and
+# NOTIFYs "<tenant_id>:<version>"; each process drops any cached copy older
+# than that version. 0 disables the cache.
+TENANT_CONFIG_CACHE_TTL = float(os.environ.get('TENANT_CONFIG_CACHE_TTL', 300))
+TENANT_CONFIG_CHANNEL = 'tenant_config_changed'
+
+# One round trip for the version stamp, all settings and the kid role
+TENANT_CONFIG_SQL = '''
+    SELECT
+        (SELECT COALESCE(MAX(version), 0) FROM tenant_config_versions WHERE tenant_id = %(tenant_id)s) AS version,
+        (SELECT COALESCE(json_object_agg(setting_key, setting_value), '{}'::json)
+         FROM tenant_settings WHERE tenant_id = %(tenant_id)s) AS settings,
+        (SELECT row_to_json(r) FROM (
+            SELECT can_record_chore, can_redeem_points, can_withdraw_cash, can_view_history
+            FROM tenant_roles WHERE tenant_id = %(tenant_id)s AND role_name = 'kid'
+         ) r) AS kid_role
+'''
+
+
+class TenantConfigCache:
+    """Per-tenant cache of tenant_settings and the kid role, stamped with a version.
+
+    An entry is only stored if no invalidation happened while it was being
+    loaded (`generation`) and it is not older than the newest version
+    announced for the tenant (`_min_versions`).
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._min_versions = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and invalidation_listener.connected.is_set()
+
+    def get(self, tenant_id):
+        """Return {'version', 'settings', 'kid_role'} for a tenant, loading it on a miss."""
+        tenant_id = str(tenant_id)
+        enabled = self.enabled
+        with self._lock:
+            if enabled:
+                entry = self._entries.get(tenant_id)
+                if entry is not None and time_module.monotonic() - entry[1] < self.ttl:
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            else:
+                self.bypassed += 1
+            generation = self.generation
+        config = self._load(tenant_id)
+        if enabled:
+            with self._lock:
+                if generation == self.generation and config['version'] >= self._min_versions.get(tenant_id, 0):
+                    self._entries[tenant_id] = (config, time_module.monotonic())
+        return config
+
+    def _load(self, tenant_id):
+        conn = get_db_connection()
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute(TENANT_CONFIG_SQL, {'tenant_id': tenant_id})
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        return {'version': row['version'], 'settings': row['settings'] or {}, 'kid_role': row['kid_role']}
+
+    def invalidate(self, tenant_id=None, version=None):
+        """Drop one tenant (or, with `version`, only a copy older than it) or everything."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if tenant_id is None:
+                self._entries.clear()
+                self._min_versions.clear()
+                return
+            tenant_id = str(tenant_id)
+            if version is not None:
+                self._min_versions[tenant_id] = max(version, self._min_versions.get(tenant_id, 0))
+                entry = self._entries.get(tenant_id)
+                if entry is not None and entry[0]['version'] >= version:
+                    return
+            self._entries.pop(tenant_id, None)
+
+    def handle_notification(self, payload):
+        tenant_id, _, version = (payload or '').partition(':')
+        try:
+            self.invalidate(tenant_id or None, int(version) if version else None)
+        except ValueError:
+            self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'ttl_seconds': self.ttl,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypassed': self.bypassed,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+tenant_config_cache = TenantConfigCache(TENANT_CONFIG_CACHE_TTL)
+invalidation_listener.subscribe(TENANT_CONFIG_CHANNEL, tenant_config_cache.handle_notification,
+                                tenant_config_cache.invalidate)
+
+
+# CTEs bumping a tenant's config version and NOTIFYing it; the statement
+# must select from `config_notified` (params: tenant_id, config_channel)
+TENANT_CONFIG_BUMP_CTES = '''
+    config_bumped AS (
+        INSERT INTO tenant_config_versions (tenant_id, version) VALUES (%(tenant_id)s, 1)
+        ON CONFLICT (tenant_id) DO UPDATE
+        SET version = tenant_config_versions.version + 1, updated_at = CURRENT_TIMESTAMP
+        RETURNING tenant_id, version
+    ),
+    config_notified AS (
+        SELECT pg_notify(%(config_channel)s, tenant_id::text || ':' || version) FROM config_bumped
+    )
+'''
+
+
+def bump_tenant_config_version(cursor, tenant_id):
+    """Stamp a change to a tenant's settings or roles and announce it on commit.
+
+    Call with the cursor of the transaction that writes tenant_settings or
+    tenant_roles, before committing.
+    """
+    cursor.execute('WITH ' + TENANT_CONFIG_BUMP_CTES + 'SELECT COUNT(*) FROM config_notified',
+                   {'tenant_id': str(tenant_id), 'config_channel': TENANT_CONFIG_CHANNEL})
+    tenant_config_cache.invalidate(tenant_id)
+
+
+def get_tenant_settings(tenant_id):
+    """Return the tenant's settings as a {setting_key: setting_value} dict (cached)."""
+    return tenant_config_cache.get(tenant_id)['settings']
+
+
+def get_kid_role(tenant_id):
+    """Return the tenant's kid role permissions, or None if it has no kid role (cached)."""
+    return tenant_config_cache.get(tenant_id)['kid_role']
 
 def log_system_event(log_type, message, details=None, status='success'):
     """Log a system event using the logging module.
@@ -316,20 +1239,11 @@ def kid_permission_required(permission_key):
                     # Unknown permission key - deny access by default
                     return redirect(url_for('index'))
 
-                conn = get_db_connection()
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                try:
-                    tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-                    if not tenant_id:
-                        # No tenant context -> deny
-                        cursor.close()
-                        conn.close()
-                        return redirect(url_for('index'))
-                    cursor.execute(f'SELECT {col} FROM tenant_roles WHERE tenant_id = %s AND role_name = %s', (tenant_id, 'kid'))
-                    row = cursor.fetchone()
-                finally:
-                    cursor.close()
-                    conn.close()
+                tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
+                if not tenant_id:
+                    # No tenant context -> deny
+                    return redirect(url_for('index'))
+                row = get_kid_role(tenant_id)
 
                 if row and row.get(col):
                     return f(*args, **kwargs)
@@ -420,16 +1334,10 @@ def require_auth_for_everything():
 
     refresh = request.cookies.get('refresh_token')
     if refresh:
-        conn = None
-        try:
-            conn = get_db_connection()
-            valid = validate_refresh_token(conn, refresh)
-            if valid:
-                g.tenant_id = valid['tenant_id']
-                return None
-        finally:
-            if conn:
-                conn.close()
+        tenant_id = authenticate_refresh_token(refresh)
+        if tenant_id:
+            g.tenant_id = tenant_id
+            return None
 
     # Not authenticated: API -> 401 JSON, pages -> redirect to index
     if path.startswith('/api/'):
@@ -456,12 +1364,9 @@ def validate_pin():
         return jsonify({'valid': False, 'error': 'No tenant context'}), 401
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s", (tenant_id, 'parent_pin'))
-        row = cur.fetchone()
-        if row and row.get('setting_value') is not None:
-            raw_val = str(row.get('setting_value'))
+        stored_pin = get_tenant_settings(tenant_id).get('parent_pin')
+        if stored_pin is not None:
+            raw_val = str(stored_pin)
             try_decrypted = decrypt_password(raw_val)
             if try_decrypted and try_decrypted.isdigit():
                 db_pin = try_decrypted
@@ -469,15 +1374,6 @@ def validate_pin():
                 db_pin = raw_val
     except Exception:
         db_pin = None
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     # If no tenant-scoped PIN is found, reject authentication
     if not db_pin:
@@ -551,79 +1447,387 @@ def get_role():
     return jsonify({'role': user_role}), 200
 
 
-@app.route('/api/auth/login', methods=['POST'])
-def api_auth_login():
-    data = request.get_json(force=True)
-    tenant_name = data.get('tenant_name')
-    password = data.get('password')
-    if not tenant_name or not password:
-        return jsonify({'error': 'Missing tenant_name or password'}), 400
+# --- Password verification pool and login rate limiting ---
+# Argon2 is deliberately CPU- and memory-heavy. Login verifications run in a
+# small pool of worker processes (see password_hashing.py), and at most
+# PASSWORD_HASH_QUEUE_LIMIT more may wait for it; beyond that logins are
+# turned away with a 503 instead of piling up. Attempts are also limited per
+# client IP, and failed attempts per tenant name, before any hashing is done.
+# Both limits are enforced per gunicorn worker process.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))  # 0 = verify in the request thread
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', 4))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))
+LOGIN_RATE_LIMIT_WINDOW = int(os.environ.get('LOGIN_RATE_LIMIT_WINDOW', 300))
+LOGIN_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_ATTEMPTS_PER_IP', 30))  # 0 = unlimited
+LOGIN_FAILURES_PER_TENANT = int(os.environ.get('LOGIN_FAILURES_PER_TENANT', 10))  # 0 = unlimited
+
+
+class PasswordHashUnavailable(Exception):
+    """The password hashing pool is saturated, timed out or broke."""
+
+
+class PasswordHashPool:
+    """Bounded pool of worker processes for Argon2 calls.
+
+    Processes are forked by start(), before the worker starts its background
+    threads: a child forked while another thread holds a lock (logging, the
+    database pool) would inherit it locked and hang on its first call. A
+    spawned process would re-run the main script (gunicorn's, or this module
+    under `python app.py`); a forked one only runs password_hashing functions
+    and leaves with os._exit, so it never closes the database connections it
+    inherits. A pool whose worker died is forked again on next use. At most
+    `workers` calls run at once and `queue_limit` more may wait; further calls
+    raise PasswordHashUnavailable immediately.
+    """
 
-    conn = get_db_connection()
-    cur = conn.cursor()
+    def __init__(self, workers, queue_limit, timeout):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+        self._seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+        return self._executor
+
+    def start(self):
+        """Fork the pool's processes now and wait until they answer."""
+        if self.workers <= 0:
+            return
+        with self._lock:
+            executor = self._get_executor()
+        # The first submit forks every process of a 'fork' pool
+        executor.submit(os.getpid).result(timeout=self.timeout)
+
+    def run(self, fn, *args):
+        """Return fn(*args) computed in the pool (inline when workers is 0)."""
+        if self.workers <= 0:
+            return fn(*args)
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise PasswordHashUnavailable('password hashing queue is full')
+            self._in_flight += 1
+            executor = self._get_executor()
+        started = time_module.monotonic()
+        failed = True
+        try:
+            result = executor.submit(fn, *args).result(timeout=self.timeout)
+            failed = False
+            return result
+        except FuturesTimeoutError:
+            raise PasswordHashUnavailable(f'password hashing took longer than {self.timeout}s')
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise PasswordHashUnavailable('password hashing worker died')
+        finally:
+            elapsed = time_module.monotonic() - started
+            with self._lock:
+                self._in_flight -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                    self._seconds += elapsed
+                    self._max_seconds = max(self._max_seconds, elapsed)
+
+    def stats(self):
+        """Return queue depth and latency counters for metrics reporting."""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_limit': self.queue_limit,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'failed': self._failed,
+                'avg_ms': round(self._seconds / self._completed * 1000, 1) if self._completed else None,
+                'max_ms': round(self._max_seconds * 1000, 1),
+            }
+
+
+class LoginRateLimiter:
+    """Fixed-window counters of login attempts per client IP and failures per (IP, tenant name).
+
+    Failures are counted per client as well as per tenant, so one client
+    guessing a family's password cannot lock that family out for everyone
+    else. At most `max_keys` counters are kept; the least recently used are
+    dropped first.
+    """
 
-    # Fetch stored password hash for tenant and verify using Argon2 only.
-    # Perform case-insensitive tenant lookup so usernames are not case-sensitive
-    cur.execute("SELECT tenant_id, tenant_password FROM tenants WHERE LOWER(tenant_name) = LOWER(%s)", (tenant_name,))
-    row = cur.fetchone()
-    if not row:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
+    def __init__(self, window, per_ip, per_tenant, max_keys=10000):
+        self.window = window
+        self.per_ip = per_ip
+        self.per_tenant = per_tenant
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._counters = OrderedDict()  # key -> [window_start, count]
+        self._limited = 0
+
+    def _counter(self, key, now):
+        counter = self._counters.get(key)
+        if counter is None or now - counter[0] >= self.window:
+            counter = self._counters[key] = [now, 0]
+        self._counters.move_to_end(key)
+        while len(self._counters) > self.max_keys:
+            self._counters.popitem(last=False)
+        return counter
+
+    def _retry_after(self, counter, now):
+        return max(1, int(counter[0] + self.window - now) + 1)
+
+    def check(self, ip, tenant_name):
+        """Count an attempt from ip; return seconds to wait if it is over a limit, else 0."""
+        now = time_module.monotonic()
+        with self._lock:
+            if self.per_ip > 0:
+                counter = self._counter(('ip', ip), now)
+                counter[1] += 1
+                if counter[1] > self.per_ip:
+                    self._limited += 1
+                    return self._retry_after(counter, now)
+            if self.per_tenant > 0:
+                counter = self._counter(self._failure_key(ip, tenant_name), now)
+                if counter[1] >= self.per_tenant:
+                    self._limited += 1
+                    return self._retry_after(counter, now)
+        return 0
+
+    @staticmethod
+    def _failure_key(ip, tenant_name):
+        return ('tenant', ip, str(tenant_name).lower())
+
+    def record_failure(self, ip, tenant_name):
+        if self.per_tenant > 0:
+            with self._lock:
+                self._counter(self._failure_key(ip, tenant_name), time_module.monotonic())[1] += 1
+
+    def reset(self, ip, tenant_name):
+        """Clear a client's failure count for a tenant after a successful login."""
+        with self._lock:
+            self._counters.pop(self._failure_key(ip, tenant_name), None)
+
+    def stats(self):
+        with self._lock:
+            return {'tracked_keys': len(self._counters), 'limited': self._limited}
+
+
+password_hash_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT, PASSWORD_HASH_TIMEOUT)
+login_rate_limiter = LoginRateLimiter(LOGIN_RATE_LIMIT_WINDOW, LOGIN_ATTEMPTS_PER_IP, LOGIN_FAILURES_PER_TENANT)
+
+
+# --- Login service ---
+# Both login endpoints authenticate through login_tenant(). The tenant is
+# looked up by LOWER(tenant_name) (served by idx_tenants_lower_tenant_name),
+# the password is verified in the hashing pool and, on success, one autocommit
+# statement stores any upgraded hash and issues the refresh token. Names known
+# not to exist skip the lookup; they are still checked against a dummy hash so
+# an unknown tenant takes as long as a wrong password.
+UNKNOWN_TENANT_CACHE_TTL = float(os.environ.get('UNKNOWN_TENANT_CACHE_TTL', 300))
+UNKNOWN_TENANT_CACHE_SIZE = int(os.environ.get('UNKNOWN_TENANT_CACHE_SIZE', 10000))
+TENANT_REGISTERED_CHANNEL = 'tenant_registered'
+
+TENANT_LOGIN_SQL = 'SELECT tenant_id, tenant_password FROM tenants WHERE LOWER(tenant_name) = LOWER(%s)'
+
+
+class UnknownTenantCache:
+    """Bounded LRU of lower-cased tenant names that had no tenant.
+
+    Creating a tenant NOTIFYs its name so every process forgets it; like
+    RefreshTokenCache, `generation` keeps a lookup that raced an
+    invalidation from caching a stale miss.
+    """
 
-    tenant_id, stored = row[0], row[1]
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and invalidation_listener.connected.is_set()
+
+    def contains(self, tenant_name):
+        if not self.enabled:
+            return False
+        key = str(tenant_name).lower()
+        with self._lock:
+            cached_at = self._entries.get(key)
+            if cached_at is None:
+                return False
+            if time_module.monotonic() - cached_at >= self.ttl:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, tenant_name, generation):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[str(tenant_name).lower()] = time_module.monotonic()
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tenant_name=None):
+        """Forget one name, or (no argument) everything."""
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            if tenant_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(tenant_name).lower(), None)
 
-    # Only accept Argon2-formatted hashes (argon2-cffi). Reject other formats.
-    if not (isinstance(stored, str) and stored.startswith('$argon2')):
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
+    def handle_notification(self, payload):
+        self.invalidate(payload or None)
 
-    try:
-        ph.verify(stored, password)
-        # Rehash transparently if parameters changed
-        try:
-            if ph.check_needs_rehash(stored):
-                new_hash = ph.hash(password)
-                cur.execute('UPDATE tenants SET tenant_password = %s WHERE tenant_id = %s', (new_hash, tenant_id))
-                conn.commit()
-        except Exception:
-            pass
-    except argon2_exceptions.VerifyMismatchError:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
-    except Exception:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'invalidations': self.invalidations,
+            }
 
-    # Successful authentication - issue tokens
-    access_token = create_access_token(tenant_id)
-    refresh_token, refresh_expires = create_refresh_token_record(conn, tenant_id, request.headers.get('User-Agent'), request.remote_addr)
 
-    # Set refresh token as HttpOnly cookie (note: Secure cookie requires HTTPS in browsers)
-    resp = jsonify({'access_token': access_token, 'expires_in': ACCESS_TOKEN_EXPIRES})
-    resp.set_cookie('refresh_token', refresh_token, httponly=True, secure=False, samesite='Strict', expires=refresh_expires)
+unknown_tenant_cache = UnknownTenantCache(UNKNOWN_TENANT_CACHE_TTL, UNKNOWN_TENANT_CACHE_SIZE)
+invalidation_listener.subscribe(TENANT_REGISTERED_CHANNEL, unknown_tenant_cache.handle_notification,
+                                unknown_tenant_cache.invalidate)
 
-    try:
-        log_system_event('login', 'Tenant login success', {'tenant_id': tenant_id}, 'success')
-    except Exception:
-        pass
 
-    cur.close()
-    conn.close()
-    return resp, 200
+def notify_tenant_registered(cursor, tenant_name):
+    """Make every process forget a cached miss for tenant_name once the transaction commits."""
+    cursor.execute('SELECT pg_notify(%s, %s)', (TENANT_REGISTERED_CHANNEL, str(tenant_name).lower()))
+    unknown_tenant_cache.invalidate(tenant_name)
 
 
-@app.route('/api/auth/refresh', methods=['POST'])
-def api_auth_refresh():
-    # Read refresh token from cookie or JSON body
-    token = request.cookies.get('refresh_token') or (request.get_json(silent=True) or {}).get('refresh_token')
-    if not token:
-        return jsonify({'error': 'Missing refresh token'}), 400
+class LoginFailed(Exception):
+    """A login attempt was refused; response() is the HTTP answer."""
 
-    conn = get_db_connection()
+    def __init__(self, status, error, retry_after=None):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+        self.retry_after = retry_after
+
+    def response(self):
+        headers = {'Retry-After': str(self.retry_after)} if self.retry_after else {}
+        return jsonify({'error': self.error}), self.status, headers
+
+
+def login_tenant(tenant_name, password, user_agent=None, ip_address=None):
+    """Authenticate a tenant by name and password and issue its tokens.
+
+    Takes one query before the password check (none for a cached unknown
+    name) and one statement after it. No connection is held while hashing.
+
+    Returns:
+        dict with tenant_id, access_token, refresh_token and refresh_expires
+    Raises:
+        LoginFailed: rate limited (429), bad credentials (401) or the hashing
+        pool is saturated (503)
+    """
+    retry_after = login_rate_limiter.check(ip_address, tenant_name)
+    if retry_after:
+        raise LoginFailed(429, 'Too many login attempts. Please try again later.', retry_after)
+
+    tenant_id, stored = None, None
+    if not unknown_tenant_cache.contains(tenant_name):
+        generation = unknown_tenant_cache.generation
+        conn = PooledConnection(db_pool.getconn())
+        try:
+            # Autocommit: no BEGIN/COMMIT round trips around single statements
+            conn._conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(TENANT_LOGIN_SQL, (tenant_name,))
+            row = cur.fetchone()
+            cur.close()
+        finally:
+            conn.close()
+        if row:
+            tenant_id, stored = row
+        else:
+            unknown_tenant_cache.add(tenant_name, generation)
+
+    try:
+        verified, new_hash = password_hash_pool.run(verify_password, stored, password)
+    except PasswordHashUnavailable:
+        raise LoginFailed(503, 'Too many logins in progress. Please try again shortly.', 1)
+    if not verified:
+        login_rate_limiter.record_failure(ip_address, tenant_name)
+        raise LoginFailed(401, 'Invalid credentials')
+    login_rate_limiter.reset(ip_address, tenant_name)
+
+    conn = PooledConnection(db_pool.getconn())
+    try:
+        conn._conn.autocommit = True
+        refresh_token, refresh_expires = create_refresh_token_record(conn, tenant_id, user_agent, ip_address,
+                                                                     password_hash=new_hash)
+    finally:
+        conn.close()
+    return {
+        'tenant_id': tenant_id,
+        'access_token': create_access_token(tenant_id),
+        'refresh_token': refresh_token,
+        'refresh_expires': refresh_expires,
+    }
+
+
+@app.route('/api/auth/login', methods=['POST'])
+def api_auth_login():
+    data = request.get_json(force=True)
+    tenant_name = data.get('tenant_name')
+    password = data.get('password')
+    if not tenant_name or not password:
+        return jsonify({'error': 'Missing tenant_name or password'}), 400
+
+    try:
+        login = login_tenant(tenant_name, password, request.headers.get('User-Agent'), request.remote_addr)
+    except LoginFailed as e:
+        return e.response()
+
+    # Set refresh token as HttpOnly cookie (note: Secure cookie requires HTTPS in browsers)
+    resp = jsonify({'access_token': login['access_token'], 'expires_in': ACCESS_TOKEN_EXPIRES})
+    resp.set_cookie('refresh_token', login['refresh_token'], httponly=True, secure=False, samesite='Strict', expires=login['refresh_expires'])
+
+    try:
+        log_system_event('login', 'Tenant login success', {'tenant_id': login['tenant_id']}, 'success')
+    except Exception:
+        pass
+
+    return resp, 200
+
+
+@app.route('/api/auth/refresh', methods=['POST'])
+def api_auth_refresh():
+    # Read refresh token from cookie or JSON body
+    token = request.cookies.get('refresh_token') or (request.get_json(silent=True) or {}).get('refresh_token')
+    if not token:
+        return jsonify({'error': 'Missing refresh token'}), 400
+
+    conn = get_db_connection()
     valid = validate_refresh_token(conn, token)
     if not valid:
         conn.close()
@@ -686,64 +1890,24 @@ def api_tenant_login():
     if not tenant or not password:
         return jsonify({'error': 'Missing tenant or password'}), 400
 
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    # Look up tenant credentials
-    # Perform case-insensitive tenant lookup so usernames are not case-sensitive
-    cur.execute("SELECT tenant_id, tenant_password FROM tenants WHERE LOWER(tenant_name) = LOWER(%s)", (tenant,))
-    row = cur.fetchone()
-    if not row:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
-
-    tenant_id, stored = row[0], row[1]
-
-    # Only accept Argon2-formatted hashes
-    if not (isinstance(stored, str) and stored.startswith('$argon2')):
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
-
     try:
-        ph.verify(stored, password)
-        # Rehash transparently if parameters changed
-        try:
-            if ph.check_needs_rehash(stored):
-                new_hash = ph.hash(password)
-                cur.execute('UPDATE tenants SET tenant_password = %s WHERE tenant_id = %s', (new_hash, tenant_id))
-                conn.commit()
-        except Exception:
-            pass
-    except argon2_exceptions.VerifyMismatchError:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
-    except Exception:
-        cur.close()
-        conn.close()
-        return jsonify({'error': 'Invalid credentials'}), 401
-
-    # Issue tokens
-    access_token = create_access_token(tenant_id)
-    refresh_token, refresh_expires = create_refresh_token_record(conn, tenant_id, request.headers.get('User-Agent'), request.remote_addr)
+        login = login_tenant(tenant, password, request.headers.get('User-Agent'), request.remote_addr)
+    except LoginFailed as e:
+        return e.response()
 
     # Set cookies: refresh_token and tenant_id (HttpOnly)
-    resp = jsonify({'token': access_token, 'expires_in': ACCESS_TOKEN_EXPIRES})
+    resp = jsonify({'token': login['access_token'], 'expires_in': ACCESS_TOKEN_EXPIRES})
     # refresh_token cookie (long-lived)
-    resp.set_cookie('refresh_token', refresh_token, httponly=True, secure=False, samesite='Strict', expires=refresh_expires)
+    resp.set_cookie('refresh_token', login['refresh_token'], httponly=True, secure=False, samesite='Strict', expires=login['refresh_expires'])
     # tenant_id cookie (HttpOnly so JS cannot access it)
     # set expiry similar to refresh token so tenant association persists
-    resp.set_cookie('tenant_id', str(tenant_id), httponly=True, secure=False, samesite='Strict', expires=refresh_expires)
+    resp.set_cookie('tenant_id', str(login['tenant_id']), httponly=True, secure=False, samesite='Strict', expires=login['refresh_expires'])
 
     try:
-        log_system_event('tenant_login', 'Tenant login success', {'tenant_id': tenant_id}, 'success')
+        log_system_event('tenant_login', 'Tenant login success', {'tenant_id': login['tenant_id']}, 'success')
     except Exception:
         pass
 
-    cur.close()
-    conn.close()
     return resp, 200
 
 
@@ -882,6 +2046,7 @@ def api_create_tenant():
             (tenant_name, hashed, tenant_email, False, verification_token, token_expires_at)
         )
         tenant_id = cur.fetchone()[0]
+        notify_tenant_registered(cur, tenant_name)
 
         # Encrypt and store the required parent PIN in the tenant-scoped settings table
         try:
@@ -1123,6 +2288,7 @@ def api_change_tenant_password():
         cur.execute('UPDATE tenants SET tenant_password = %s WHERE tenant_id = %s', (hashed, tenant_id))
         # Revoke any existing refresh tokens so existing sessions must re-auth
         cur.execute('UPDATE refresh_tokens SET revoked = TRUE WHERE tenant_id = %s', (tenant_id,))
+        notify_refresh_tokens_revoked(cur, tenant_id=tenant_id)
         conn.commit()
 
         try:
@@ -1377,6 +2543,46 @@ def get_tz_info():
         'timestamp': iso_timestamp
     }), 200
 
+
+@app.route('/api/metrics', methods=['GET'])
+@parent_required
+def get_metrics():
+    """Return runtime metrics for this worker process.
+
+    JSON fields:
+      - db_pool: connection pool size, checkout count and wait times
+      - scheduler: whether this worker is the scheduler leader, plus recent job runs
+      - smtp: SMTP session pool size and session reuse / message counters
+      - email_outbox: queued/failed email counts and delivery latency
+      - auth_cache: refresh token cache hit ratio and invalidation listener state
+      - refresh_tokens: estimated rows per refresh_tokens partition
+      - tenant_config_cache: settings/permissions cache hit ratio
+      - password_hashing: login verification pool queue depth, rejections and latency
+      - login_rate_limiter: tracked IPs/tenants and rate-limited login attempts
+      - unknown_tenant_cache: cached unknown tenant names skipped at login
+    """
+    return jsonify({
+        'db_pool': db_pool.stats(),
+        'scheduler': {
+            'enabled': ENABLE_JOB_SCHEDULER,
+            'worker': scheduler_leadership.worker,
+            'is_leader': scheduler_leadership.is_leader,
+            'recent_runs': get_recent_job_runs(),
+        },
+        'smtp': smtp_pool.stats(),
+        'email_outbox': get_email_outbox_stats(),
+        'auth_cache': {
+            'refresh_tokens': refresh_token_cache.stats(),
+            'listener': invalidation_listener.stats(),
+        },
+        'refresh_tokens': get_refresh_token_table_stats(),
+        'tenant_config_cache': tenant_config_cache.stats(),
+        'idempotency_cache': idempotency_cache.stats(),
+        'password_hashing': password_hash_pool.stats(),
+        'login_rate_limiter': login_rate_limiter.stats(),
+        'unknown_tenant_cache': unknown_tenant_cache.stats(),
+    }), 200
+
 @app.route('/add-user')
 @parent_required
 def add_user_page():
@@ -1427,17 +2633,11 @@ def get_chores():
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
 
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
     # Return tenant-scoped chores ordered by point value, and treats leading underscores as spaces for sorting by chore name
-    cursor.execute(
+    return stream_json_array_response(
         'SELECT * FROM tenant_chores WHERE tenant_id = %s ORDER BY point_value, REPLACE(chore, \'_\', \' \') ASC',
         (tenant_id,)
     )
-    chores = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify([dict(chore) for chore in chores])
 
 @app.route('/api/chores/<int:chore_id>', methods=['DELETE'])
 @parent_required
@@ -1739,65 +2939,122 @@ def create_chore():
         
         return jsonify({'error': f'Error creating chore: {error_msg}'}), 500
 
-@app.route('/api/chores/import', methods=['POST'])
-@parent_required
-def import_chores():
-    """Import multiple chores from CSV data."""
-    data = request.get_json()
-    
+# Bulk chore import: the whole payload is validated up front, then every valid
+# row is loaded with a single COPY round trip.
+CHORE_IMPORT_MAX_ROWS = 10000
+CHORE_IMPORT_COPY_SQL = 'COPY tenant_chores (tenant_id, chore, point_value, "repeat") FROM STDIN WITH (FORMAT csv)'
+# COPY is unavailable while psycopg2 runs with a wait callback (gevent workers)
+CHORE_IMPORT_INSERT_SQL = 'INSERT INTO tenant_chores (tenant_id, chore, point_value, "repeat") VALUES %s'
+
+
+def validate_chore_import_row(row):
+    """Normalize one import row.
+
+    Returns:
+        ((chore, point_value, repeat), None) for a valid row, or (None, error message)
+    """
+    if not isinstance(row, dict):
+        return None, 'row must be an object'
+    chore = str(row.get('chore') or '').strip()
+    if not chore:
+        return None, 'chore is required'
+    if len(chore) > 255:
+        return None, 'chore must be at most 255 characters'
+    try:
+        point_value = int(row.get('point_value'))
+    except (ValueError, TypeError):
+        return None, 'point_value must be a number'
+    if not -2147483648 <= point_value <= 2147483647:
+        return None, 'point_value is out of range'
+
+    repeat = str(row.get('repeat') or '').strip().lower()
+    # Default to 'as_needed' if not provided or is empty, but allow explicit null
+    # If explicitly set to "null" or "none" (case-insensitive), use None
+    if repeat in ['null', 'none']:
+        repeat = None
+    elif repeat == '':
+        repeat = 'as_needed'
+    elif len(repeat) > 50:
+        return None, 'repeat must be at most 50 characters'
+    return (chore, point_value, repeat), None
+
+
+def read_chore_import_rows():
+    """Return an iterator of (row_number, row dict) from the import request.
+
+    Accepts a streamed CSV body (Content-Type: text/csv), a multipart upload
+    with a `file` field, or the JSON {"chores": [...]} array. CSV row numbers
+    are file line numbers (the header is line 1).
+
+    Raises:
+        ValueError: if the payload itself is unusable
+    """
+    if request.mimetype == 'text/csv' or 'file' in request.files:
+        raw = request.files['file'].stream if 'file' in request.files else request.stream
+        reader = csv.DictReader(codecs.getreader('utf-8-sig')(raw))
+        if not reader.fieldnames:
+            raise ValueError('CSV must have a header row')
+        reader.fieldnames = [(name or '').strip().lower() for name in reader.fieldnames]
+        if not {'chore', 'point_value'}.issubset(reader.fieldnames):
+            raise ValueError('CSV must have "chore" and "point_value" columns')
+        return ((reader.line_num, row) for row in reader)
+
+    data = request.get_json(silent=True)
     if not data or 'chores' not in data:
-        return jsonify({'error': 'chores array is required'}), 400
-    
+        raise ValueError('chores array is required')
     chores = data['chores']
     if not isinstance(chores, list):
-        return jsonify({'error': 'chores must be an array'}), 400
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        raise ValueError('chores must be an array')
+    return enumerate(chores, start=1)
+
+
+@app.route('/api/chores/import', methods=['POST'])
+@parent_required
+def import_chores():
+    """Import multiple chores from a CSV upload or a JSON array.
+
+    Invalid rows are skipped and reported in `row_errors` as {row, error};
+    the valid ones are inserted together.
+    """
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
 
-    imported = 0
-    errors = 0
-    
-    for chore_data in chores:
-        try:
-            chore = chore_data.get('chore', '').strip()
-            point_value = chore_data.get('point_value', '')
-            repeat = chore_data.get('repeat', '')
-            if repeat:
-                repeat = repeat.strip().lower()
+    valid_rows = []
+    row_errors = []
+    total = 0
+    try:
+        for row_number, row in read_chore_import_rows():
+            total += 1
+            if total > CHORE_IMPORT_MAX_ROWS:
+                return jsonify({'error': f'Too many rows; at most {CHORE_IMPORT_MAX_ROWS} chores can be imported at once'}), 400
+            values, error = validate_chore_import_row(row)
+            if error:
+                row_errors.append({'row': row_number, 'error': error})
             else:
-                repeat = ''
-            
-            # Default to 'as_needed' if not provided or is empty, but allow explicit null
-            # If explicitly set to "null" or "none" (case-insensitive), use None
-            if repeat in ['null', 'none']:
-                repeat = None
-            elif repeat == '':
-                repeat = 'as_needed'
-            
-            if not chore:
-                errors += 1
-                continue
-            
-            try:
-                point_value = int(point_value)
-            except (ValueError, TypeError):
-                errors += 1
-                continue
-            
-            cursor.execute(
-                'INSERT INTO tenant_chores (tenant_id, chore, point_value, "repeat") VALUES (%s, %s, %s, %s)',
-                (tenant_id, chore, point_value, repeat)
-            )
-            imported += 1
-        except Exception as e:
-            errors += 1
-            logger.error(f"Error importing chore: {e}")
-    
+                valid_rows.append(values)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except csv.Error as e:
+        return jsonify({'error': f'Invalid CSV: {e}'}), 400
+
+    imported = len(valid_rows)
+    errors = len(row_errors)
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
+        if valid_rows and GEVENT_WORKER:
+            execute_values(cursor, CHORE_IMPORT_INSERT_SQL,
+                           [(tenant_id, chore, point_value, repeat) for chore, point_value, repeat in valid_rows],
+                           page_size=1000)
+        elif valid_rows:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for chore, point_value, repeat in valid_rows:
+                # None is written as an unquoted empty field, which COPY reads as NULL
+                writer.writerow([tenant_id, chore, point_value, repeat])
+            buffer.seek(0)
+            cursor.copy_expert(CHORE_IMPORT_COPY_SQL, buffer)
         conn.commit()
         cursor.close()
         conn.close()
@@ -1806,13 +3063,14 @@ def import_chores():
         try:
             status = 'success' if errors == 0 else 'error' if imported == 0 else 'success'
             log_system_event('chore_imported', f'Chores imported: {imported} successful, {errors} errors', 
-                            {'imported': imported, 'errors': errors, 'total': len(chores)}, status)
+                            {'imported': imported, 'errors': errors, 'total': total}, status)
         except Exception:
             pass  # Don't fail if logging fails
         
         return jsonify({
             'imported': imported,
             'errors': errors,
+            'row_errors': row_errors,
             'message': f'Imported {imported} chore(s)'
         }), 201
     except Exception as e:
@@ -1824,7 +3082,7 @@ def import_chores():
         # Log import error
         try:
             log_system_event('chore_imported', f'Error during chore import: {error_msg}', 
-                            {'imported': imported, 'errors': errors, 'total': len(chores), 'error': error_msg}, 'error')
+                            {'imported': 0, 'errors': errors, 'total': total, 'error': error_msg}, 'error')
         except Exception:
             pass  # Don't fail if logging fails
         
@@ -1839,9 +3097,7 @@ def get_users():
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
 
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    cursor.execute('''
+    return stream_json_array_response('''
         SELECT 
             u.user_id,
             u.full_name,
@@ -1852,10 +3108,6 @@ def get_users():
         WHERE u.tenant_id = %s
         ORDER BY u.user_id
     ''', (tenant_id,))
-    users = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return jsonify([dict(user) for user in users])
 
 @app.route('/api/users/<int:user_id>/avatar', methods=['POST'])
 @kid_or_parent_required
@@ -2062,19 +3314,569 @@ def delete_user(user_id):
     
     return jsonify({'message': 'User deleted successfully'}), 200
 
+
+# --- Balance ledger ---
+# tenant_users.points_balance and cash_balance are the balance snapshots every
+# read uses. A trigger (migrations.py, 003_balance_ledger) appends each change
+# to them to the append-only balance_ledger, tagged with the reason set for the
+# current transaction; changes made without one are recorded as 'adjustment'
+# (or 'opening' for a new user).
+BALANCE_REASONS = ('chore_completed', 'points_redemption', 'cash_withdrawal', 'daily_cash_out',
+                   'points_reset', 'cash_reset')
+# Cash is stored as DOUBLE PRECISION; smaller differences are rounding noise
+BALANCE_CASH_TOLERANCE = 0.005
+
+# Per user: the snapshot against the sum of its ledger entries, and the ledger
+# entries against the transaction history. Chore points and cash withdrawals
+# match their transactions one to one. Every points_redemption transaction is
+# either a redemption (ledger points equal its value) or the conversion of a
+# daily cash out (ledger cash of -value / 5), so the two together must add up
+# to the history. What history cannot show is bounded: money redemptions
+# credit at most $1 per 5 points redeemed, and cash outs remove at least the
+# points they convert (the rest is forfeited rollover). The app tags every
+# balance change it makes, so 'adjustment' entries are changes made outside
+# it and are reported as drift.
+BALANCE_VERIFY_SQL = '''
+    WITH ledger AS (
+        SELECT user_id,
+               SUM(points_delta) AS points,
+               SUM(cash_delta) AS cash,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'chore_completed'), 0) AS chore_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'cash_withdrawal'), 0) AS withdrawn_cash,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'points_redemption'), 0) AS redeemed_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'points_redemption'), 0) AS redeemed_cash,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'daily_cash_out'), 0) AS cash_out_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'daily_cash_out'), 0) AS cash_out_cash,
+               COUNT(*) FILTER (WHERE reason = 'adjustment') AS adjustments
+        FROM balance_ledger
+        WHERE {scope}
+        GROUP BY user_id
+    ),
+    history AS (
+        SELECT user_id,
+               COALESCE(SUM(value) FILTER (WHERE transaction_type = 'chore_completed'), 0) AS chore_points,
+               COALESCE(SUM(value) FILTER (WHERE transaction_type = 'cash_withdrawal'), 0) AS withdrawn_cash,
+               COALESCE(SUM(value) FILTER (WHERE transaction_type = 'points_redemption'), 0) AS redeemed_points
+        FROM tenant_transactions
+        WHERE {scope}
+        GROUP BY user_id
+    ),
+    totals AS (
+        SELECT u.tenant_id, u.user_id, u.full_name,
+               COALESCE(u.points_balance, 0) AS points_balance,
+               COALESCE(u.cash_balance, 0) AS cash_balance,
+               COALESCE(l.points, 0) AS ledger_points,
+               COALESCE(l.cash, 0) AS ledger_cash,
+               COALESCE(l.chore_points, 0) AS ledger_chore_points,
+               COALESCE(h.chore_points, 0) AS history_chore_points,
+               COALESCE(l.withdrawn_cash, 0) AS ledger_withdrawn_cash,
+               COALESCE(h.withdrawn_cash, 0) AS history_withdrawn_cash,
+               COALESCE(l.redeemed_points, 0) AS ledger_redeemed_points,
+               COALESCE(l.redeemed_cash, 0) AS ledger_redeemed_cash,
+               COALESCE(l.cash_out_points, 0) AS ledger_cash_out_points,
+               COALESCE(l.cash_out_cash, 0) AS ledger_cash_out_cash,
+               COALESCE(h.redeemed_points, 0) AS history_redeemed_points,
+               COALESCE(l.adjustments, 0) AS adjustments
+        FROM tenant_users u
+        LEFT JOIN ledger l ON l.user_id = u.user_id
+        LEFT JOIN history h ON h.user_id = u.user_id
+        WHERE {user_scope}
+    )
+    SELECT *
+    FROM totals
+    WHERE points_balance <> ledger_points
+       OR ABS(cash_balance - ledger_cash) > %(cash_tolerance)s
+       OR ledger_chore_points <> history_chore_points
+       OR ABS(ledger_withdrawn_cash - history_withdrawn_cash) > %(cash_tolerance)s
+       OR ABS(ledger_redeemed_points - 5 * ledger_cash_out_cash - history_redeemed_points) > 5 * %(cash_tolerance)s
+       OR ledger_redeemed_cash > -ledger_redeemed_points / 5.0 + %(cash_tolerance)s
+       OR ledger_cash_out_points > -5 * ledger_cash_out_cash + 5 * %(cash_tolerance)s
+       OR adjustments > 0
+    ORDER BY tenant_id, user_id
+'''
+
+# Deleting a tenant's history leaves its chore, withdrawal, redemption and cash
+# out ledger entries without transactions; move their totals into 'opening'
+# entries (net zero, snapshots unchanged) so the ledger keeps reconciling with
+# what is left
+REBASE_BALANCE_LEDGER_SQL = '''
+    INSERT INTO balance_ledger (tenant_id, user_id, reason, points_delta, cash_delta, points_balance, cash_balance)
+    SELECT u.tenant_id, u.user_id, e.reason, e.points_delta, e.cash_delta,
+           COALESCE(u.points_balance, 0), COALESCE(u.cash_balance, 0)
+    FROM (
+        SELECT user_id,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'chore_completed'), 0) AS chore_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'cash_withdrawal'), 0) AS withdrawn_cash,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'points_redemption'), 0) AS redeemed_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'points_redemption'), 0) AS redeemed_cash,
+               COALESCE(SUM(points_delta) FILTER (WHERE reason = 'daily_cash_out'), 0) AS cash_out_points,
+               COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'daily_cash_out'), 0) AS cash_out_cash
+        FROM balance_ledger
+        WHERE tenant_id = %(tenant_id)s
+        GROUP BY user_id
+    ) l
+    JOIN tenant_users u ON u.user_id = l.user_id
+    CROSS JOIN LATERAL (VALUES
+        (1, 'chore_completed', -l.chore_points, 0),
+        (2, 'cash_withdrawal', 0, -l.withdrawn_cash),
+        (3, 'points_redemption', -l.redeemed_points, -l.redeemed_cash),
+        (4, 'daily_cash_out', -l.cash_out_points, -l.cash_out_cash),
+        (5, 'opening', l.chore_points + l.redeemed_points + l.cash_out_points,
+                       l.withdrawn_cash + l.redeemed_cash + l.cash_out_cash)
+    ) AS e(ord, reason, points_delta, cash_delta)
+    WHERE e.points_delta <> 0 OR e.cash_delta <> 0
+    ORDER BY u.user_id, e.ord
+'''
+
+
+def set_balance_reason(cursor, reason):
+    """Tag the balance changes made by the rest of the current transaction in balance_ledger."""
+    cursor.execute("SELECT set_config('familychores.balance_reason', %s, true)", (reason,))
+
+
+# Conditional balance updates (redeem, withdraw) lock the user's row with the
+# UPDATE itself. A concurrent request for the same user waits for the lock and
+# then re-checks the condition against the committed balance, so a balance can
+# never be spent twice. The wait is capped at BALANCE_LOCK_TIMEOUT_MS; a
+# timeout or deadlock rolls back and the update is retried.
+BALANCE_LOCK_TIMEOUT_MS = int(os.environ.get('BALANCE_LOCK_TIMEOUT_MS', 2000))
+BALANCE_UPDATE_ATTEMPTS = 3
+BALANCE_RETRYABLE_ERRORS = (psycopg2.errors.LockNotAvailable, psycopg2.errors.DeadlockDetected)
+
+
+def update_balance(conn, cursor, reason, sql, params):
+    """Run a conditional `UPDATE tenant_users ... RETURNING` in the current transaction.
+
+    Tags the change with `reason` in the balance ledger. Each attempt runs
+    under a savepoint, so a lock timeout or deadlock only undoes the attempt
+    and not earlier work of the transaction (such as an Idempotency-Key
+    claim). Returns the RETURNING row, or None when no row matched (unknown
+    user or condition not met). Raises one of BALANCE_RETRYABLE_ERRORS once
+    every attempt has failed.
+    """
+    for attempt in range(1, BALANCE_UPDATE_ATTEMPTS + 1):
+        cursor.execute('SAVEPOINT balance_update')
+        try:
+            cursor.execute("SELECT set_config('lock_timeout', %s, true), set_config('familychores.balance_reason', %s, true)",
+                           (f'{BALANCE_LOCK_TIMEOUT_MS}ms', reason))
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+            cursor.execute('RELEASE SAVEPOINT balance_update')
+            return row
+        except BALANCE_RETRYABLE_ERRORS:
+            cursor.execute('ROLLBACK TO SAVEPOINT balance_update')
+            if attempt == BALANCE_UPDATE_ATTEMPTS:
+                raise
+            logger.warning(f"Balance update for {reason} hit a lock timeout, retrying ({attempt}/{BALANCE_UPDATE_ATTEMPTS})")
+            time_module.sleep(0.05 * attempt)
+
+
+# --- Idempotency keys ---
+# Clients send an Idempotency-Key header with balance-changing requests and
+# reuse it when they retry. The first request with a key runs normally; its
+# key row is inserted in the same transaction as the request's writes, and the
+# handler's commit is held until the response has been stored in that
+# transaction too, so the key, the writes and the response commit together
+# (or, if the process dies, not at all). A retry of a completed request gets the
+# stored response back (header Idempotent-Replayed: true) without running the
+# handler again; a retry that arrives while the original is still running gets
+# a 409. Only successful (2xx) responses are kept, so a request that failed
+# can simply be retried. Recently completed keys are also cached per process.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 86400))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 2000))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Claims the key, taking over a row whose TTL has passed; returns no row when a
+# live request or result already holds it
+IDEMPOTENCY_CLAIM_SQL = '''
+    INSERT INTO idempotency_keys (tenant_id, idempotency_key, request_hash)
+    VALUES (%(tenant_id)s, %(key)s, %(request_hash)s)
+    ON CONFLICT (tenant_id, idempotency_key) DO UPDATE
+        SET request_hash = EXCLUDED.request_hash, status_code = NULL, response_body = NULL,
+            created_at = CURRENT_TIMESTAMP
+        WHERE idempotency_keys.created_at < CURRENT_TIMESTAMP - make_interval(secs => %(ttl)s)
+    RETURNING 1
+'''
+
+
+class IdempotencyCache:
+    """Bounded LRU of (tenant_id, key) -> completed response for replaying retries.
+
+    Stored responses never change, so entries only need to expire.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id, key):
+        """Return (request_hash, status_code, body) for a completed key, or None."""
+        with self._lock:
+            entry = self._entries.get((tenant_id, key))
+            if entry is not None:
+                if time_module.monotonic() < entry[3]:
+                    self._entries.move_to_end((tenant_id, key))
+                    self.hits += 1
+                    return entry[:3]
+                del self._entries[(tenant_id, key)]
+            self.misses += 1
+            return None
+
+    def put(self, tenant_id, key, request_hash, status_code, body):
+        with self._lock:
+            self._entries[(tenant_id, key)] = (request_hash, status_code, body, time_module.monotonic() + self.ttl)
+            self._entries.move_to_end((tenant_id, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl_seconds': self.ttl,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+idempotency_cache = IdempotencyCache(IDEMPOTENCY_KEY_TTL, IDEMPOTENCY_CACHE_SIZE)
+
+
+def _replay_idempotent_response(stored, request_hash):
+    stored_hash, status_code, body = stored
+    if stored_hash != request_hash:
+        return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+    return Response(body, status=status_code, mimetype='application/json',
+                    headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    """Make a mutating endpoint honour the Idempotency-Key request header.
+
+    Requests without the header are passed straight through. Apply below the
+    route and permission decorators.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get('Idempotency-Key') or '').strip()
+        tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
+        if not key or not tenant_id:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+
+        tenant_id = str(tenant_id)
+        request_hash = hashlib.sha256(request.method.encode() + b' ' + request.path.encode() + b'\n'
+                                      + request.get_data()).hexdigest()
+        stored = idempotency_cache.get(tenant_id, key)
+        if stored is not None:
+            return _replay_idempotent_response(stored, request_hash)
+
+        # Hold a reference to the request connection so the handler's close()
+        # cannot roll back the claim
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        params = {'tenant_id': tenant_id, 'key': key, 'request_hash': request_hash, 'ttl': IDEMPOTENCY_KEY_TTL}
+        try:
+            # Waits here if another request with this key has not committed yet
+            cursor.execute(IDEMPOTENCY_CLAIM_SQL, params)
+            if cursor.fetchone() is None:
+                cursor.execute('''
+                    SELECT request_hash, status_code, response_body FROM idempotency_keys
+                    WHERE tenant_id = %(tenant_id)s AND idempotency_key = %(key)s
+                ''', params)
+                row = cursor.fetchone()
+                conn.rollback()
+                if row is None or row[1] is None:
+                    return jsonify({'error': 'A request with this Idempotency-Key is still being processed'}), 409, {'Retry-After': '1'}
+                idempotency_cache.put(tenant_id, key, *row)
+                return _replay_idempotent_response(row, request_hash)
+
+            def release_claim():
+                # Keep what the handler committed and drop the claim, so the
+                # request can be retried
+                cursor.execute('''
+                    DELETE FROM idempotency_keys
+                    WHERE tenant_id = %(tenant_id)s AND idempotency_key = %(key)s AND status_code IS NULL
+                ''', params)
+                conn.commit()
+
+            # The handler's commit() and rollback() only move a savepoint
+            # until the response is stored below
+            conn.hold_commits()
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except Exception:
+                conn.release_commits()
+                release_claim()
+                raise
+            conn.release_commits()
+            if not 200 <= response.status_code < 300:
+                release_claim()
+                return response
+
+            body = response.get_data(as_text=True)
+            cursor.execute('''
+                UPDATE idempotency_keys SET status_code = %(status_code)s, response_body = %(body)s
+                WHERE tenant_id = %(tenant_id)s AND idempotency_key = %(key)s
+            ''', dict(params, status_code=response.status_code, body=body))
+            conn.commit()
+            idempotency_cache.put(tenant_id, key, request_hash, response.status_code, body)
+            return response
+        finally:
+            cursor.close()
+            conn.close()
+
+    return wrapper
+
+
+def purge_idempotency_keys():
+    """Delete idempotency keys older than IDEMPOTENCY_KEY_TTL."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM idempotency_keys WHERE created_at < CURRENT_TIMESTAMP - make_interval(secs => %s)',
+                       (IDEMPOTENCY_KEY_TTL,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def verify_balances(cursor, tenant_id=None):
+    """Reconcile balance snapshots with the ledger and the transaction history.
+
+    Checks every user of one tenant (all tenants if None) in a single
+    set-based query. Returns {'checked_users': n, 'drift': [...]}, one drift
+    entry per failed check with the expected and actual values.
+    """
+    params = {'cash_tolerance': BALANCE_CASH_TOLERANCE}
+    if tenant_id is None:
+        scope = user_scope = 'TRUE'
+        cursor.execute('SELECT COUNT(*) FROM tenant_users')
+    else:
+        scope, user_scope = 'tenant_id = %(tenant_id)s', 'u.tenant_id = %(tenant_id)s'
+        params['tenant_id'] = str(tenant_id)
+        cursor.execute('SELECT COUNT(*) FROM tenant_users WHERE tenant_id = %s', (str(tenant_id),))
+    checked_users = cursor.fetchone()[0]
+    cursor.execute(BALANCE_VERIFY_SQL.format(scope=scope, user_scope=user_scope), params)
+
+    drift = []
+    for (row_tenant_id, user_id, full_name, points_balance, cash_balance, ledger_points, ledger_cash,
+         ledger_chore_points, history_chore_points, ledger_withdrawn_cash, history_withdrawn_cash,
+         ledger_redeemed_points, ledger_redeemed_cash, ledger_cash_out_points, ledger_cash_out_cash,
+         history_redeemed_points, adjustments) in cursor.fetchall():
+        checks = (
+            # (check, expected, actual, tolerance, expected is only an upper limit)
+            ('points_balance', ledger_points, points_balance, 0, False),
+            ('cash_balance', ledger_cash, cash_balance, BALANCE_CASH_TOLERANCE, False),
+            ('chore_points', history_chore_points, ledger_chore_points, 0, False),
+            ('cash_withdrawals', history_withdrawn_cash, ledger_withdrawn_cash, BALANCE_CASH_TOLERANCE, False),
+            ('redeemed_points', history_redeemed_points, ledger_redeemed_points - 5 * ledger_cash_out_cash,
+             5 * BALANCE_CASH_TOLERANCE, False),
+            ('redemption_cash', -ledger_redeemed_points / 5, ledger_redeemed_cash, BALANCE_CASH_TOLERANCE, True),
+            ('cash_out_points', -5 * ledger_cash_out_cash, ledger_cash_out_points, 5 * BALANCE_CASH_TOLERANCE, True),
+            ('adjustments', 0, adjustments, 0, False),
+        )
+        for check, expected, actual, tolerance, upper_limit in checks:
+            difference = actual - expected
+            if difference > tolerance or (not upper_limit and difference < -tolerance):
+                drift.append({
+                    'tenant_id': str(row_tenant_id),
+                    'user_id': user_id,
+                    'user_name': full_name,
+                    'check': check,
+                    'expected': expected,
+                    'actual': actual,
+                    'difference': round(difference, 2),
+                })
+    return {'checked_users': checked_users, 'drift': drift}
+
+
+@app.route('/api/balances/verify', methods=['GET'])
+@parent_required
+def verify_tenant_balances():
+    """Report users of the tenant whose balances do not reconcile with the ledger or history."""
+    tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
+    if not tenant_id:
+        return jsonify({'error': 'tenant context required'}), 401
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        report = verify_balances(cursor, tenant_id)
+    finally:
+        cursor.close()
+        conn.close()
+
+    if report['drift']:
+        try:
+            log_system_event('balance_drift', f"Balance drift found for {len({d['user_id'] for d in report['drift']})} user(s)",
+                             {'drift': report['drift']}, 'error')
+        except Exception:
+            pass  # Don't fail if logging fails
+    return jsonify(report)
+
+
+@app.cli.command('verify-balances')
+@click.option('--tenant-id', default=None, help='Only check this tenant (default: all tenants)')
+def verify_balances_command(tenant_id):
+    """Reconcile every balance with the ledger and history; exit 1 on drift."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        report = verify_balances(cursor, tenant_id)
+    finally:
+        cursor.close()
+        conn.close()
+    for d in report['drift']:
+        click.echo(f"{d['tenant_id']} user {d['user_id']} ({d['user_name']}): {d['check']} "
+                   f"expected {d['expected']} actual {d['actual']}")
+    click.echo(f"Checked {report['checked_users']} user(s), {len(report['drift'])} drift(s)")
+    if report['drift']:
+        raise click.exceptions.Exit(1)
+
+
 # Transactions endpoints
+TRANSACTION_TYPES = ('chore_completed', 'points_redemption', 'cash_withdrawal')
+TRANSACTIONS_PAGE_DEFAULT = 50
+TRANSACTIONS_PAGE_MAX = 500
+# Query parameters that switch /api/transactions to the paginated response
+TRANSACTIONS_PAGE_PARAMS = ('limit', 'cursor', 'user_id', 'transaction_type', 'start', 'end', 'q', 'order')
+
+
+def encode_transactions_cursor(timestamp, transaction_id):
+    """Encode the keyset position after (timestamp, transaction_id) as an opaque string."""
+    raw = json.dumps([timestamp.isoformat(), transaction_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_transactions_cursor(cursor_value):
+    """Decode a cursor from encode_transactions_cursor. Raises ValueError if malformed."""
+    try:
+        padded = cursor_value + '=' * (-len(cursor_value) % 4)
+        timestamp, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(transaction_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def parse_local_datetime(value, end_of_day=False):
+    """Parse a YYYY-MM-DD date or ISO datetime into a naive local-time datetime.
+
+    Timestamps are stored as naive local system time, so aware datetimes are
+    converted to the local timezone. A bare date maps to the start of that
+    day, or to the start of the next day if end_of_day (exclusive bound).
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(get_local_timezone()).replace(tzinfo=None)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_transaction_filters(args, conditions, params):
+    """Add the user_id / transaction_type / start / end / q filters in `args` to a query.
+
+    start/end accept a date (YYYY-MM-DD, end inclusive) or ISO datetime
+    (end exclusive). q matches the user name, description or type,
+    case-insensitively; the query must join tenant_users as `u`. Raises
+    ValueError with a client-facing message.
+    """
+    if args.get('user_id'):
+        try:
+            params['user_id'] = int(args['user_id'])
+        except ValueError:
+            raise ValueError('user_id must be an integer')
+        conditions.append('t.user_id = %(user_id)s')
+    if args.get('transaction_type'):
+        if args['transaction_type'] not in TRANSACTION_TYPES:
+            raise ValueError(f"transaction_type must be one of: {', '.join(TRANSACTION_TYPES)}")
+        params['transaction_type'] = args['transaction_type']
+        conditions.append('t.transaction_type = %(transaction_type)s')
+    try:
+        if args.get('start'):
+            params['start'] = parse_local_datetime(args['start'])
+            conditions.append('t.timestamp >= %(start)s')
+        if args.get('end'):
+            params['end'] = parse_local_datetime(args['end'], end_of_day=True)
+            conditions.append('t.timestamp < %(end)s')
+    except ValueError:
+        raise ValueError('start and end must be ISO dates or datetimes')
+    if args.get('q'):
+        params['q'] = '%' + re.sub(r'([\\%_])', r'\\\1', args['q'].strip()) + '%'
+        conditions.append('(u.full_name ILIKE %(q)s OR t.description ILIKE %(q)s OR t.transaction_type ILIKE %(q)s)')
+
+
+def serialize_transaction(transaction):
+    """Convert a transaction row to a dict with an ISO timestamp including timezone info."""
+    transaction_dict = dict(transaction)
+    timestamp = transaction_dict.get('timestamp')
+    if timestamp:
+        # Timestamps are stored as naive datetimes in local system time
+        # Convert to timezone-aware and then to ISO format string
+        transaction_dict['timestamp'] = make_timezone_aware(timestamp).isoformat()
+    return transaction_dict
+
+
 @app.route('/api/transactions', methods=['GET'])
 @kid_or_parent_required
 def get_transactions():
-    """Get all transactions with user and chore names."""
+    """Get transactions with user names, newest first.
+
+    Without query parameters every transaction is returned as a JSON array.
+    With any of limit, cursor, user_id, transaction_type, start, end, q
+    (search) or order the response is one page:
+        {"transactions": [...], "next_cursor": "<opaque>" | null}
+    Pages are keyset-paginated on (timestamp, transaction_id), newest first
+    or oldest first with order=asc; pass next_cursor back as `cursor` (with
+    the same filters and order) to get the following page. start/end accept
+    a date (YYYY-MM-DD, end inclusive) or ISO datetime (end exclusive).
+    """
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
 
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    paginated = any(param in request.args for param in TRANSACTIONS_PAGE_PARAMS)
+    conditions = ['t.tenant_id = %(tenant_id)s']
+    params = {'tenant_id': tenant_id}
+    order = 'DESC'
+    if paginated:
+        order = request.args.get('order', 'desc').upper()
+        if order not in ('ASC', 'DESC'):
+            return jsonify({'error': 'order must be asc or desc'}), 400
+        try:
+            limit = int(request.args.get('limit', TRANSACTIONS_PAGE_DEFAULT))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit < 1 or limit > TRANSACTIONS_PAGE_MAX:
+            return jsonify({'error': f'limit must be between 1 and {TRANSACTIONS_PAGE_MAX}'}), 400
+        params['limit'] = limit + 1  # one extra row tells whether there is a next page
+
+        # Rows without a timestamp cannot be positioned by the keyset
+        conditions.append('t.timestamp IS NOT NULL')
+        try:
+            parse_transaction_filters(request.args, conditions, params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if request.args.get('cursor'):
+            try:
+                params['cursor_ts'], params['cursor_id'] = decode_transactions_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            comparison = '>' if order == 'ASC' else '<'
+            conditions.append(f'(t.timestamp, t.transaction_id) {comparison} (%(cursor_ts)s, %(cursor_id)s)')
+
     # Join with tenant_users to get user name, description is now directly in tenant_transactions table
-    cursor.execute('''
+    sql = f'''
         SELECT 
             t.transaction_id,
             t.user_id,
@@ -2085,106 +3887,173 @@ def get_transactions():
             u.full_name as user_name
         FROM tenant_transactions t
         LEFT JOIN tenant_users u ON t.user_id = u.user_id AND t.tenant_id = u.tenant_id
-        WHERE t.tenant_id = %s
-        ORDER BY t.timestamp DESC
-    ''', (tenant_id,))
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.timestamp {order}, t.transaction_id {order}
+        {'LIMIT %(limit)s' if paginated else ''}
+    '''
+    if not paginated:
+        # The full history is unbounded, so stream it rather than build it in memory
+        return stream_json_array_response(sql, params, transform=serialize_transaction)
+
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute(sql, params)
     transactions = cursor.fetchall()
     cursor.close()
     conn.close()
-    
-    # Convert timestamps to ISO format with timezone info
-    transactions_list = []
-    for transaction in transactions:
-        transaction_dict = dict(transaction)
-        timestamp = transaction_dict.get('timestamp')
-        if timestamp:
-            # Timestamps are stored as naive datetimes in local system time
-            # Convert to timezone-aware and then to ISO format string
-            timestamp_aware = make_timezone_aware(timestamp)
-            transaction_dict['timestamp'] = timestamp_aware.isoformat()
-        transactions_list.append(transaction_dict)
-    
-    return jsonify(transactions_list)
 
-@app.route('/history')
-@kid_permission_required('kid_allowed_view_history')
-def history_page():
-    """Page to view transaction history."""
-    return render_template('history.html')
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_transactions_cursor(last['timestamp'], last['transaction_id'])
+    return jsonify({'transactions': [serialize_transaction(t) for t in transactions], 'next_cursor': next_cursor})
 
-def get_email_notification_setting(setting_key):
-    """Get email notification setting from database."""
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    # Prefer tenant-scoped setting when tenant context is available
+# Columns of /api/transactions/export, in output order
+TRANSACTION_EXPORT_COLUMNS = ('transaction_id', 'timestamp', 'user_id', 'user_name', 'transaction_type', 'description', 'value')
+# Rows fetched per round trip from the server-side cursor
+TRANSACTION_EXPORT_BATCH_SIZE = 2000
+
+
+@app.route('/api/transactions/export', methods=['GET'])
+@parent_required
+def export_transactions():
+    """Stream the tenant's transaction history as CSV or NDJSON, newest first.
+
+    Query parameters:
+      - format: csv (default) or ndjson
+      - columns: comma-separated subset of TRANSACTION_EXPORT_COLUMNS (default: all)
+      - user_id, transaction_type, start, end, q: same filters as /api/transactions
+
+    Rows are read through a server-side (named) cursor in batches and written
+    out as a chunked response, so memory use stays flat however long the
+    history is.
+    """
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-    result = None
+    if not tenant_id:
+        return jsonify({'error': 'tenant context required'}), 401
+
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()] or list(TRANSACTION_EXPORT_COLUMNS)
+    unknown = [c for c in columns if c not in TRANSACTION_EXPORT_COLUMNS]
+    if unknown:
+        return jsonify({'error': f"Unknown columns: {', '.join(unknown)}"}), 400
+
+    conditions = ['t.tenant_id = %(tenant_id)s']
+    params = {'tenant_id': tenant_id}
     try:
-        if tenant_id:
-            cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, setting_key))
-            result = cursor.fetchone()
-    finally:
-        cursor.close()
+        parse_transaction_filters(request.args, conditions, params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The response body is produced after the request has finished, so take
+    # over the request's connection for it
+    conn = take_request_connection()
+    try:
+        stream = QueryStream(conn, f'''
+            SELECT t.transaction_id, t.timestamp, t.user_id, u.full_name AS user_name,
+                   t.transaction_type, t.description, t.value
+            FROM tenant_transactions t
+            LEFT JOIN tenant_users u ON t.user_id = u.user_id AND t.tenant_id = u.tenant_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY t.timestamp DESC, t.transaction_id DESC
+        ''', params, itersize=TRANSACTION_EXPORT_BATCH_SIZE)
+    except Exception:
         conn.close()
+        raise
 
-    if result and result.get('setting_value') is not None:
-        return result.get('setting_value') == '1'
-    return False
+    positions = [TRANSACTION_EXPORT_COLUMNS.index(c) for c in columns]
+    timestamp_position = TRANSACTION_EXPORT_COLUMNS.index('timestamp')
+
+    def generate():
+        # Timestamps are stored as naive local system time (see make_timezone_aware)
+        local_tz = get_local_timezone()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        rows = 0
+        try:
+            if export_format == 'csv':
+                writer.writerow(columns)
+            for row in stream:
+                row = list(row)
+                if row[timestamp_position] is not None:
+                    row[timestamp_position] = row[timestamp_position].replace(tzinfo=local_tz).isoformat()
+                if export_format == 'csv':
+                    writer.writerow([row[i] for i in positions])
+                else:
+                    buffer.write(json.dumps({c: row[i] for c, i in zip(columns, positions)}))
+                    buffer.write('\n')
+                rows += 1
+                if buffer.tell() >= STREAM_CHUNK_SIZE:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+            try:
+                log_system_event('transactions_exported', f'Exported {rows} transaction(s) as {export_format}',
+                                 {'tenant_id': str(tenant_id), 'rows': rows}, 'success')
+            except Exception:
+                pass
+        finally:
+            stream.close()
+            conn.close()
+
+    extension, mimetype = ('csv', 'text/csv') if export_format == 'csv' else ('ndjson', 'application/x-ndjson')
+    filename = f"transactions_{datetime.now().strftime('%Y%m%d')}.{extension}"
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no',
+    })
+
+@app.route('/history')
+@kid_permission_required('kid_allowed_view_history')
+def history_page():
+    """Page to view transaction history."""
+    return render_template('history.html')
+
+def enqueue_notification_email(cursor, tenant_id, notification_type, user_name, description, value=None, user_id=None):
+    """Queue a notification email in the caller's transaction.
+
+    Nothing is queued unless the tenant has the notification type enabled.
+    The user's balances are captured as of this transaction; recipients are
+    resolved and the email is rendered when the outbox worker sends it, so
+    the request never waits on SMTP.
 
-def send_notification_email(notification_type, user_name, description, value=None, user_id=None):
-    """Send email notification based on transaction type.
-    
     Args:
+        cursor: Cursor of the transaction recording the event (caller commits)
+        tenant_id: Tenant the event belongs to
         notification_type: 'chore_completed', 'points_redeemed', or 'cash_withdrawn'
         user_name: Name of the user who performed the action
         description: Description of the transaction
         value: Optional value (points or cash amount)
-        user_id: Optional user ID to fetch current balances
+        user_id: Optional user ID to include current balances
+    """
+    payload = {'notification_type': notification_type, 'user_name': user_name,
+               'description': description, 'value': value, 'user_id': user_id}
+    cursor.execute('''
+        INSERT INTO email_outbox (tenant_id, kind, payload)
+        SELECT s.tenant_id, 'notification', %(payload)s::jsonb || jsonb_build_object(
+                   'point_balance', CASE WHEN %(user_id)s::integer IS NULL THEN NULL ELSE COALESCE(u.points_balance, 0) END,
+                   'cash_balance', CASE WHEN %(user_id)s::integer IS NULL THEN NULL ELSE COALESCE(u.cash_balance, 0) END)
+        FROM tenant_settings s
+        LEFT JOIN tenant_users u ON u.user_id = %(user_id)s::integer AND u.tenant_id = s.tenant_id
+        WHERE s.tenant_id = %(tenant_id)s AND s.setting_key = %(setting_key)s AND s.setting_value = '1'
+    ''', {'payload': Json(payload), 'user_id': user_id, 'tenant_id': tenant_id,
+          'setting_key': f'email_notify_{notification_type}'})
+    if has_request_context():
+        g._email_queued = True
+
+
+def build_notification_email(notification_type, user_name, description, value=None, point_balance=None, cash_balance=None):
+    """Render a notification email.
+
+    Returns:
+        (subject, body_html, body_text), or None for an unknown notification type
     """
-    # Check if notification is enabled for this type
-    setting_key = f'email_notify_{notification_type}'
-    if not get_email_notification_setting(setting_key):
-        return
-    
-    # Get parent email addresses from tenant settings
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    # Tenant-scoped email settings only
-    tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-    if not tenant_id:
-        cursor.close()
-        conn.close()
-        return
-    cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, 'parent_email_addresses'))
-    result = cursor.fetchone()
-    
-    # Get user's current balances if user_id is provided (tenant-scoped)
-    point_balance = None
-    cash_balance = None
-    if user_id:
-        cursor.execute('SELECT points_balance, cash_balance FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (user_id, tenant_id))
-        user_result = cursor.fetchone()
-        if user_result:
-            point_balance = user_result.get('points_balance') or 0
-            cash_balance = user_result.get('cash_balance') or 0
-        else:
-            point_balance = 0
-            cash_balance = 0
-    
-    cursor.close()
-    conn.close()
-    
-    # Determine recipient emails from parent_email_addresses setting
-    parent_emails_str = result['setting_value'].strip() if result and result.get('setting_value') else ''
-    
-    if parent_emails_str:
-        email_list = [e.strip() for e in parent_emails_str.split(',') if e.strip()]
-    else:
-        return  # No email configured
-    
-    if not email_list:
-        return
-    
     # Format balance information for email
     balance_info_html = ""
     balance_info_text = ""
@@ -2265,17 +4134,9 @@ Amount: ${abs(value) if value else 'N/A'}
 {balance_info_text}Sent from Family Chores application
         """
     else:
-        return
-    
-    # Send email to all parent addresses (ignore errors - don't fail transaction if email fails)
-    try:
-        for email in email_list:
-            try:
-                send_email(email, subject, body_html, body_text)
-            except Exception:
-                pass  # Silently ignore individual email errors
-    except Exception:
-        pass  # Silently ignore email errors
+        return None
+
+    return subject, body_html, body_text
 
 
 
@@ -2290,37 +4151,19 @@ def settings_page():
 @parent_required
 def get_settings():
     """Get all settings."""
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
-        cursor.close()
-        conn.close()
         return jsonify({}), 200
-    cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s', (tenant_id,))
-    settings = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    
-    settings_dict = {row['setting_key']: row['setting_value'] for row in settings}
-    
-    # Convert string values to appropriate types
-    # Fetch kid role permissions from roles table if available (roles table now authoritative)
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    # Tenant-scoped roles lookup
-    tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-    if tenant_id:
-        cursor.execute("SELECT can_record_chore, can_redeem_points, can_withdraw_cash, can_view_history FROM tenant_roles WHERE tenant_id = %s AND role_name = %s", (tenant_id, 'kid'))
-        kid_role = cursor.fetchone()
-    else:
-        kid_role = None
-    cursor.close()
-    conn.close()
+    # Settings plus kid role permissions (roles table now authoritative) in one cached lookup
+    config = tenant_config_cache.get(tenant_id)
+    settings_dict = config['settings']
+    kid_role = config['kid_role']
 
+    # Convert string values to appropriate types
     result = {
         'automatic_daily_cash_out': settings_dict.get('automatic_daily_cash_out', '1') == '1',
         'max_rollover_points': int(settings_dict.get('max_rollover_points', '4')),
+        'daily_job_time': parse_daily_job_time(settings_dict.get('daily_job_time')),
         'daily_cooldown_hours': int(settings_dict.get('daily_cooldown_hours', '12')),
         'weekly_cooldown_days': int(settings_dict.get('weekly_cooldown_days', '4')),
         'monthly_cooldown_days': int(settings_dict.get('monthly_cooldown_days', '14')),
@@ -2339,141 +4182,131 @@ def get_settings():
     
     return jsonify(result)
 
+# Whole settings PUT in one statement. All CTEs read the same snapshot, so
+# old_settings / old_role see the values from before the writes.
+UPSERT_SETTINGS_SQL = '''
+    WITH new_settings AS (
+        SELECT * FROM unnest(%(keys)s::varchar[], %(values)s::text[]) AS n(setting_key, setting_value)
+    ),
+    old_settings AS (
+        SELECT s.setting_key, s.setting_value
+        FROM tenant_settings s JOIN new_settings n USING (setting_key)
+        WHERE s.tenant_id = %(tenant_id)s
+    ),
+    upserted AS (
+        INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
+        SELECT %(tenant_id)s::uuid, setting_key, setting_value FROM new_settings
+        ON CONFLICT (tenant_id, setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value
+        RETURNING setting_key
+    ),
+    old_role AS (
+        SELECT can_record_chore, can_redeem_points, can_withdraw_cash, can_view_history
+        FROM tenant_roles WHERE tenant_id = %(tenant_id)s AND role_name = 'kid'
+    ),
+    role_updated AS (
+        UPDATE tenant_roles SET
+            can_record_chore = COALESCE(%(can_record_chore)s, can_record_chore),
+            can_redeem_points = COALESCE(%(can_redeem_points)s, can_redeem_points),
+            can_withdraw_cash = COALESCE(%(can_withdraw_cash)s, can_withdraw_cash),
+            can_view_history = COALESCE(%(can_view_history)s, can_view_history)
+        WHERE tenant_id = %(tenant_id)s AND role_name = 'kid' AND %(update_role)s
+        RETURNING role_name
+    ),
+''' + TENANT_CONFIG_BUMP_CTES + '''
+    SELECT
+        (SELECT COALESCE(json_object_agg(setting_key, setting_value), '{}'::json) FROM old_settings) AS old_settings,
+        (SELECT row_to_json(old_role) FROM old_role) AS old_role,
+        (SELECT COUNT(*) FROM upserted) AS upserted,
+        (SELECT COUNT(*) FROM role_updated) AS role_updated,
+        (SELECT COUNT(*) FROM config_notified) AS notified
+'''
+
+
 @app.route('/api/settings', methods=['PUT'])
 @parent_required
 def update_settings():
-    """Update settings."""
+    """Update settings.
+
+    Input is validated first; then every provided setting and kid permission
+    is written by a single statement (UPSERT_SETTINGS_SQL) that also returns
+    the previous values for change logging, followed by one commit.
+    """
     data = request.get_json()
-    
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    # Get current tenant-scoped settings to compare for logging
+
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
-        cursor.close()
-        conn.close()
         return jsonify({'error': 'Tenant context required'}), 400
-    cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s', (tenant_id,))
-    current_settings = {row['setting_key']: row['setting_value'] for row in cursor.fetchall()}
-    cursor.close()
-    
-    # Track changed settings for logging
-    changed_settings = {}
-    
-    # Helper function to update a boolean setting
-    def update_bool_setting(key, default='0'):
+    tenant_id = str(tenant_id)
+
+    # Settings to write, in logging order: (key, stored value, default, kind, value for the log)
+    setting_writes = []
+
+    def bool_setting(key, default='0'):
         if key in data:
-            value = '1' if data[key] else '0'
-            old_value = current_settings.get(key, default)
-            if str(value) != str(old_value):
-                changed_settings[key] = {'old': old_value == '1', 'new': data[key]}
-            cursor.execute('''
-                INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (tenant_id, setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value
-            ''', (tenant_id, key, value))
-    
-    # Helper function to update an integer setting with validation
-    def update_int_setting(key, default, min_value=0, error_msg=None):
+            setting_writes.append((key, '1' if data[key] else '0', default, 'bool', data[key]))
+
+    def int_setting(key, default, min_value=0, error_msg=None):
         if key in data:
             try:
                 int_value = int(data[key])
-                if int_value < min_value:
-                    cursor.close()
-                    conn.close()
-                    msg = error_msg or f'{key} must be non-negative'
-                    return jsonify({'error': msg}), 400
-                old_value = current_settings.get(key, str(default))
-                if str(int_value) != str(old_value):
-                    changed_settings[key] = {'old': int(old_value), 'new': int_value}
-                cursor.execute('''
-                    INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (tenant_id, setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value
-                ''', (tenant_id, key, str(int_value)))
             except (ValueError, TypeError):
-                cursor.close()
-                conn.close()
-                msg = error_msg or f'{key} must be a number'
-                return jsonify({'error': msg}), 400
+                return jsonify({'error': error_msg or f'{key} must be a number'}), 400
+            if int_value < min_value:
+                return jsonify({'error': error_msg or f'{key} must be non-negative'}), 400
+            setting_writes.append((key, str(int_value), str(default), 'int', int_value))
         return None
-    
-    # Helper function to update a string setting
-    def update_string_setting(key, default=''):
+
+    def string_setting(key, default=''):
         if key in data:
             new_value = data[key] or default
-            old_value = current_settings.get(key, default)
-            if new_value != old_value:
-                changed_settings[key] = {'old': old_value, 'new': new_value}
-            cursor.execute('''
-                INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (tenant_id, setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value
-            ''', (tenant_id, key, new_value))
-    
-    # Switch to regular cursor for updates
-    cursor = conn.cursor()
-    
-    # Fetch current kid role permissions from roles table for comparison and updates
-    try:
-        cursor.execute("SELECT can_record_chore, can_redeem_points, can_withdraw_cash, can_view_history FROM tenant_roles WHERE tenant_id = %s AND role_name = %s", (tenant_id, 'kid'))
-        current_role_perms = cursor.fetchone()
-    except Exception:
-        current_role_perms = None
-    
-    # Update boolean settings
-    update_bool_setting('automatic_daily_cash_out', '1')
-    
-    # Update integer settings with validation
-    result = update_int_setting('max_rollover_points', 4, 0, 'Max rollover points must be non-negative')
+            setting_writes.append((key, new_value, default, 'string', new_value))
+
+    bool_setting('automatic_daily_cash_out', '1')
+
+    result = int_setting('max_rollover_points', 4, 0, 'Max rollover points must be non-negative')
     if result:
         return result
-    
-    result = update_int_setting('daily_cooldown_hours', 12, 0, 'Daily cooldown hours must be non-negative')
+
+    result = int_setting('daily_cooldown_hours', 12, 0, 'Daily cooldown hours must be non-negative')
     if result:
         return result
-    
-    result = update_int_setting('weekly_cooldown_days', 4, 0, 'Weekly cooldown days must be non-negative')
+
+    if 'daily_job_time' in data:
+        job_time = str(data['daily_job_time'] or '').strip()
+        if not DAILY_JOB_TIME_RE.match(job_time):
+            return jsonify({'error': 'Daily run time must be in HH:MM format'}), 400
+        data['daily_job_time'] = job_time
+        string_setting('daily_job_time', DEFAULT_DAILY_JOB_TIME)
+
+    result = int_setting('weekly_cooldown_days', 4, 0, 'Weekly cooldown days must be non-negative')
     if result:
         return result
-    
-    result = update_int_setting('monthly_cooldown_days', 14, 0, 'Monthly cooldown days must be non-negative')
+
+    result = int_setting('monthly_cooldown_days', 14, 0, 'Monthly cooldown days must be non-negative')
     if result:
         return result
-    
-    # Helper function to update kid permission settings
-    def update_kid_permission(key, db_column, perm_index):
-        if key in data:
-            new_bool = bool(data[key])
-            old_bool = False
-            if current_role_perms:
-                try:
-                    old_bool = bool(current_role_perms[perm_index])
-                except Exception:
-                    old_bool = False
-            if new_bool != old_bool:
-                changed_settings[key] = {'old': old_bool, 'new': new_bool}
-            cursor.execute(f'''
-                UPDATE tenant_roles SET {db_column} = %s WHERE role_name = 'kid' AND tenant_id = %s
-            ''', (new_bool, tenant_id))
-    
-    # Update kid permission settings
-    update_kid_permission('kid_allowed_record_chore', 'can_record_chore', 0)
-    update_kid_permission('kid_allowed_redeem_points', 'can_redeem_points', 1)
-    update_kid_permission('kid_allowed_withdraw_cash', 'can_withdraw_cash', 2)
-    update_kid_permission('kid_allowed_view_history', 'can_view_history', 3)
-    
+
+    # Kid permissions live in tenant_roles; None leaves a column unchanged
+    kid_permission_keys = [
+        ('kid_allowed_record_chore', 'can_record_chore'),
+        ('kid_allowed_redeem_points', 'can_redeem_points'),
+        ('kid_allowed_withdraw_cash', 'can_withdraw_cash'),
+        ('kid_allowed_view_history', 'can_view_history'),
+    ]
+    role_updates = {col: (bool(data[key]) if key in data else None) for key, col in kid_permission_keys}
+    role_log_position = len(setting_writes)
+
     # Handle email settings (only parent_email_addresses is tenant-scoped)
-    update_string_setting('parent_email_addresses', '')
-    
+    string_setting('parent_email_addresses', '')
+
     # Handle email notification toggles
-    update_bool_setting('email_notify_chore_completed', '0')
-    update_bool_setting('email_notify_points_redeemed', '0')
-    update_bool_setting('email_notify_cash_withdrawn', '0')
-    update_bool_setting('email_notify_daily_digest', '0')
+    bool_setting('email_notify_chore_completed', '0')
+    bool_setting('email_notify_points_redeemed', '0')
+    bool_setting('email_notify_cash_withdrawn', '0')
+    bool_setting('email_notify_daily_digest', '0')
 
     # Handle parent PIN: only update if provided (non-empty). Accept only exactly 4 digits.
+    pin_changed = False
     if 'parent_pin' in data:
         try:
             pin_value = str(data['parent_pin'] or '').strip()
@@ -2484,32 +4317,69 @@ def update_settings():
         if pin_value:
             # Validate exactly 4 digits
             if not (len(pin_value) == 4 and pin_value.isdigit()):
-                cursor.close()
-                conn.close()
                 return jsonify({'error': 'Parent PIN must be exactly 4 digits or left empty to keep existing'}), 400
+            # Encrypt the PIN before storing for security
+            setting_writes.append(('parent_pin', encrypt_password(pin_value), None, 'pin', None))
+            pin_changed = True
+
+    params = {
+        'tenant_id': tenant_id,
+        'config_channel': TENANT_CONFIG_CHANNEL,
+        'keys': [w[0] for w in setting_writes],
+        'values': [w[1] for w in setting_writes],
+        'update_role': any(v is not None for v in role_updates.values()),
+    }
+    params.update(role_updates)
 
-            # Determine tenant context. Parent PIN is tenant-scoped.
-            tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-            if not tenant_id:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Tenant context required to set parent PIN'}), 400
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute(UPSERT_SETTINGS_SQL, params)
+        row = cursor.fetchone()
+        if 'daily_job_time' in data:
+            record_schedule_slot(cursor, data['daily_job_time'])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    tenant_config_cache.invalidate(tenant_id)
 
-            # Log that PIN was changed (don't report old/new values for security)
-            changed_settings['parent_pin'] = 'changed'
+    # Track changed settings for logging (same diff as the per-key updates produced)
+    current_settings = row['old_settings'] or {}
+    current_role_perms = row['old_role']
+    changed_settings = {}
+
+    def log_role_changes():
+        for key, col in kid_permission_keys:
+            new_bool = role_updates[col]
+            if new_bool is None:
+                continue
+            old_bool = bool(current_role_perms.get(col)) if current_role_perms else False
+            if new_bool != old_bool:
+                changed_settings[key] = {'old': old_bool, 'new': new_bool}
+
+    for index, (key, value, default, kind, logged) in enumerate(setting_writes):
+        if index == role_log_position:
+            log_role_changes()
+        if kind == 'pin':
+            continue
+        old_value = current_settings.get(key, default)
+        if str(value) != str(old_value):
+            if kind == 'bool':
+                changed_settings[key] = {'old': old_value == '1', 'new': logged}
+            elif kind == 'int':
+                try:
+                    changed_settings[key] = {'old': int(old_value), 'new': logged}
+                except (ValueError, TypeError):
+                    changed_settings[key] = {'old': old_value, 'new': logged}
+            else:
+                changed_settings[key] = {'old': old_value, 'new': logged}
+    if role_log_position == len(setting_writes):
+        log_role_changes()
+    if pin_changed:
+        # Log that PIN was changed (don't report old/new values for security)
+        changed_settings['parent_pin'] = 'changed'
 
-            # Encrypt the PIN before storing for security
-            encrypted_pin = encrypt_password(pin_value)
-            cursor.execute('''
-                INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (tenant_id, setting_key) DO UPDATE SET setting_value = EXCLUDED.setting_value
-            ''', (tenant_id, 'parent_pin', encrypted_pin))
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
-    
     # Log settings save with only changed settings
     try:
         if changed_settings:
@@ -2533,12 +4403,8 @@ def get_kid_permissions():
     to legacy settings keys in the `settings` table.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
         tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
         if not tenant_id:
-            cursor.close()
-            conn.close()
             return jsonify({
                 'kid_allowed_record_chore': False,
                 'kid_allowed_redeem_points': False,
@@ -2547,10 +4413,8 @@ def get_kid_permissions():
             })
 
         # Check tenant-scoped roles first
-        cursor.execute("SELECT can_record_chore, can_redeem_points, can_withdraw_cash, can_view_history FROM tenant_roles WHERE tenant_id = %s AND role_name = %s", (tenant_id, 'kid'))
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        config = tenant_config_cache.get(tenant_id)
+        row = config['kid_role']
 
         if row:
             return jsonify({
@@ -2561,24 +4425,7 @@ def get_kid_permissions():
             })
 
         # Fallback to tenant-scoped settings if roles row not present
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-        if not tenant_id:
-            cursor.close()
-            conn.close()
-            return jsonify({
-                'kid_allowed_record_chore': False,
-                'kid_allowed_redeem_points': False,
-                'kid_allowed_withdraw_cash': False,
-                'kid_allowed_view_history': False,
-            })
-        cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s, %s, %s)', (
-            tenant_id, 'kid_allowed_record_chore', 'kid_allowed_redeem_points', 'kid_allowed_withdraw_cash', 'kid_allowed_view_history'))
-        settings = {r['setting_key']: r['setting_value'] for r in cursor.fetchall()}
-        cursor.close()
-        conn.close()
-
+        settings = config['settings']
         return jsonify({
             'kid_allowed_record_chore': settings.get('kid_allowed_record_chore', '0') == '1',
             'kid_allowed_redeem_points': settings.get('kid_allowed_redeem_points', '0') == '1',
@@ -2684,6 +4531,7 @@ def set_kid_permissions():
                 external_key = next((k for k, v in allowed_keys.items() if v == col), col)
                 changed[external_key] = {'old': old_val, 'new': bool(new_val)}
 
+        bump_tenant_config_version(cursor, tenant_id)
         conn.commit()
         cursor.close()
         conn.close()
@@ -2709,6 +4557,8 @@ def set_kid_permissions():
 @parent_required
 def manual_daily_cash_out():
     """Manually trigger daily cash out process."""
+    if not (getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')):
+        return jsonify({'error': 'tenant context required'}), 401
     try:
         # Log manual trigger (process_daily_cash_out will also log with trigger_type)
         try:
@@ -2716,7 +4566,9 @@ def manual_daily_cash_out():
         except Exception:
             pass  # Don't fail if logging fails
         
-        process_daily_cash_out(triggered_manually=True)
+        processed = process_daily_cash_out(triggered_manually=True)
+        if processed is None:
+            return jsonify({'message': 'Daily cash out was already run manually today', 'already_processed': True}), 200
         return jsonify({'message': 'Daily cash out processed successfully'}), 200
     except Exception as e:
         error_msg = str(e)
@@ -2741,6 +4593,7 @@ def reset_points():
 
         conn = get_db_connection()
         cursor = conn.cursor()
+        set_balance_reason(cursor, 'points_reset')
         cursor.execute('UPDATE tenant_users SET points_balance = 0 WHERE tenant_id = %s', (tenant_id,))
         affected_users = cursor.rowcount
         conn.commit()
@@ -2778,6 +4631,7 @@ def reset_cash():
 
         conn = get_db_connection()
         cursor = conn.cursor()
+        set_balance_reason(cursor, 'cash_reset')
         cursor.execute('UPDATE tenant_users SET cash_balance = 0.0 WHERE tenant_id = %s', (tenant_id,))
         affected_users = cursor.rowcount
         conn.commit()
@@ -2821,6 +4675,7 @@ def reset_transactions():
         total_transactions = count_result[0] if count_result else 0
 
         cursor.execute('DELETE FROM tenant_transactions WHERE tenant_id = %s', (tenant_id,))
+        cursor.execute(REBASE_BALANCE_LEDGER_SQL, {'tenant_id': tenant_id})
         conn.commit()
         cursor.close()
         conn.close()
@@ -2845,81 +4700,273 @@ def reset_transactions():
         
         return jsonify({'error': f'Error deleting transactions: {error_msg}'}), 500
 
-def send_email(to_email, subject, body_html, body_text=None):
-    """Send an email using global SMTP settings from environment variables.
-    
+# --- Pooled SMTP delivery ---
+# Authenticated SMTP sessions are kept open and reused across messages instead
+# of paying a TCP + STARTTLS + AUTH round trip for every email, and a message
+# goes to all of its recipients over one session. Delivery is paced to the
+# provider's rate limit.
+SMTP_POOL_SIZE = max(1, int(os.environ.get('SMTP_POOL_SIZE', 4)))
+# Messages sent over one session before it is recycled (many providers cap this)
+SMTP_MAX_MESSAGES_PER_SESSION = int(os.environ.get('SMTP_MAX_MESSAGES_PER_SESSION', 100))
+# Idle sessions older than this (seconds) are closed rather than reused
+SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', 60))
+# Maximum recipients per second across this process (0 = unlimited)
+SMTP_RATE_LIMIT = float(os.environ.get('SMTP_RATE_LIMIT', 0))
+# Set to 0 for relays that do not support STARTTLS (e.g. a local test sink)
+SMTP_STARTTLS = os.environ.get('SMTP_STARTTLS', '1') == '1'
+
+
+def get_smtp_config():
+    """Return the global SMTP settings from environment variables."""
+    return {
+        'server': os.environ.get('SMTP_SERVER', '').strip(),
+        'port': os.environ.get('SMTP_PORT', '587').strip(),
+        'username': os.environ.get('SMTP_USERNAME', '').strip(),
+        'password': os.environ.get('SMTP_PASSWORD', '').strip(),
+        'sender_name': os.environ.get('SMTP_SENDER_NAME', 'Family Chores').strip(),
+    }
+
+
+class RateLimiter:
+    """Thread-safe pacer allowing `rate` units per second with a small burst.
+
+    Generic cell rate algorithm: each acquire pushes a theoretical arrival
+    time forward by units / rate and waits while it runs more than `burst`
+    units ahead of the clock.
+    """
+
+    def __init__(self, rate, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tat = 0.0
+
+    def acquire(self, units=1):
+        """Block until `units` may be spent."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time_module.monotonic()
+            self._tat = max(self._tat, now) + units / self.rate
+            wait = self._tat - self.burst / self.rate - now
+        if wait > 0:
+            time_module.sleep(wait)
+
+
+class SMTPSession:
+    """An open, authenticated SMTP connection plus its usage counters."""
+
+    def __init__(self, config):
+        self.key = (config['server'], config['port'], config['username'], config['password'])
+        self.server = smtplib.SMTP(config['server'], int(config['port']), timeout=10)
+        try:
+            if SMTP_STARTTLS:
+                self.server.starttls()  # Enable encryption
+            if config['username'] and config['password']:
+                self.server.login(config['username'], config['password'])
+        except Exception:
+            self.close()
+            raise
+        self.messages = 0
+        self.last_used = time_module.monotonic()
+
+    def close(self):
+        try:
+            self.server.quit()
+        except Exception:
+            try:
+                self.server.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """Bounded pool of reusable SMTP sessions for the global SMTP settings.
+
+    At most `size` sessions are open at once; callers wait for one to free up.
+    Idle sessions are reused while fresh, recycled after
+    SMTP_MAX_MESSAGES_PER_SESSION messages and dropped if the configuration
+    changes or the server disconnects.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._opened = 0
+        self._reused = 0
+        self._messages = 0
+
+    def acquire(self, config):
+        """Borrow a session for config, reusing an idle one when possible."""
+        self._slots.acquire()
+        key = (config['server'], config['port'], config['username'], config['password'])
+        stale = []
+        session = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.key == key and time_module.monotonic() - candidate.last_used < SMTP_IDLE_TIMEOUT:
+                    session = candidate
+                    self._reused += 1
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if session is not None:
+            return session
+        try:
+            session = SMTPSession(config)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._opened += 1
+        return session
+
+    def release(self, session, discard=False):
+        """Return a session, closing it if broken or used up."""
+        session.last_used = time_module.monotonic()
+        if discard or session.messages >= SMTP_MAX_MESSAGES_PER_SESSION:
+            session.close()
+        else:
+            with self._lock:
+                self._idle.append(session)
+        self._slots.release()
+
+    def record_message(self, session):
+        session.messages += 1
+        with self._lock:
+            self._messages += 1
+
+    def stats(self):
+        """Return session reuse counters for metrics reporting."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'sessions_opened': self._opened,
+                'sessions_reused': self._reused,
+                'messages_sent': self._messages,
+            }
+
+
+smtp_pool = SMTPPool(SMTP_POOL_SIZE)
+smtp_rate_limiter = RateLimiter(SMTP_RATE_LIMIT)
+
+
+def _smtp_error_message(e, config):
+    """Translate an SMTP exception into the user-facing error string."""
+    if isinstance(e, smtplib.SMTPAuthenticationError):
+        return "SMTP authentication failed. Please check your username and password."
+    if isinstance(e, (smtplib.SMTPConnectError, ConnectionRefusedError, socket.gaierror)):
+        return f"Could not connect to SMTP server {config['server']}:{config['port']}. Please check your SMTP settings."
+    if isinstance(e, smtplib.SMTPException):
+        return f"SMTP error: {str(e)}"
+    return f"Error sending email: {str(e)}"
+
+
+def send_email_to_many(recipients, subject, body_html, body_text=None, log_events=True):
+    """Send one message to several recipients over a pooled SMTP session.
+
     Args:
-        to_email: Recipient email address
+        recipients: Recipient email addresses
         subject: Email subject
         body_html: HTML body content
         body_text: Plain text body content (optional)
-    
+        log_events: Log email_sent / email_error events per recipient
+
     Returns:
-        tuple: (success: bool, message: str) - success indicates if email was sent, message contains status or error
+        list of (email, success: bool, message: str) tuples, one per recipient
     """
-    try:
-        # Use global SMTP settings from environment variables only
-        smtp_server = os.environ.get('SMTP_SERVER', '').strip()
-        smtp_port = os.environ.get('SMTP_PORT', '587').strip()
-        username = os.environ.get('SMTP_USERNAME', '').strip()
-        password = os.environ.get('SMTP_PASSWORD', '').strip()
-        sender_name = os.environ.get('SMTP_SENDER_NAME', 'Family Chores').strip()
-        
-        # Validate required settings
-        if not all([smtp_server, smtp_port, username, password]):
-            return False, "Email settings are not configured. Please set SMTP environment variables."
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = formataddr((sender_name, username))
-        msg['To'] = to_email
-        
-        # Add text and HTML parts
-        if body_text:
-            text_part = MIMEText(body_text, 'plain')
-            msg.attach(text_part)
-        
-        html_part = MIMEText(body_html, 'html')
-        msg.attach(html_part)
-        
-        # Connect to SMTP server and send
+    recipients = [r for r in recipients if r]
+    if not recipients:
+        return []
+    config = get_smtp_config()
+
+    # Validate required settings
+    if not all([config['server'], config['port'], config['username'], config['password']]):
+        return [(r, False, "Email settings are not configured. Please set SMTP environment variables.") for r in recipients]
+
+    # Create message
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = formataddr((config['sender_name'], config['username']))
+    msg['To'] = ', '.join(recipients)
+
+    # Add text and HTML parts
+    if body_text:
+        msg.attach(MIMEText(body_text, 'plain'))
+    msg.attach(MIMEText(body_html, 'html'))
+
+    smtp_rate_limiter.acquire(len(recipients))
+    refused = None
+    error_msg = None
+    # A pooled session may have been dropped by the server; retry once on a fresh one
+    for attempt in range(2):
         try:
-            smtp_port_int = int(smtp_port)
-            server = smtplib.SMTP(smtp_server, smtp_port_int, timeout=10)
-            server.starttls()  # Enable encryption
-            server.login(username, password)
-            server.send_message(msg)
-            server.quit()
-            
-            # Log successful email send
-            try:
-                log_system_event('email_sent', f'Email sent to {to_email}', {'to': to_email, 'subject': subject}, 'success')
-            except Exception:
-                pass  # Don't fail if logging fails
-            
-            return True, "Email sent successfully"
-        except smtplib.SMTPAuthenticationError:
-            return False, "SMTP authentication failed. Please check your username and password."
-        except smtplib.SMTPConnectError:
-            return False, f"Could not connect to SMTP server {smtp_server}:{smtp_port}. Please check your SMTP settings."
-        except smtplib.SMTPException as e:
-            error_msg = f"SMTP error: {str(e)}"
-            # Log email error
-            try:
-                log_system_event('email_error', f'Failed to send email to {to_email}', {'to': to_email, 'subject': subject, 'error': error_msg}, 'error')
-            except Exception:
-                pass
-            return False, error_msg
+            session = smtp_pool.acquire(config)
+        except Exception as e:
+            error_msg = _smtp_error_message(e, config)
+            break
+        try:
+            refused = session.server.send_message(msg, to_addrs=recipients)
+            smtp_pool.record_message(session)
+            smtp_pool.release(session)
+            break
+        except smtplib.SMTPServerDisconnected as e:
+            smtp_pool.release(session, discard=True)
+            error_msg = _smtp_error_message(e, config)
+        except smtplib.SMTPRecipientsRefused as e:
+            smtp_pool.release(session)
+            refused = e.recipients
+            break
         except Exception as e:
-            error_msg = f"Error sending email: {str(e)}"
-            # Log email error
+            smtp_pool.release(session, discard=True)
+            error_msg = _smtp_error_message(e, config)
+            break
+
+    results = []
+    for email in recipients:
+        if refused is None:
+            results.append((email, False, error_msg))
+        elif email in refused:
+            code, reason = refused[email]
+            results.append((email, False, f"SMTP error: recipient refused ({code} {reason.decode(errors='replace') if isinstance(reason, bytes) else reason})"))
+        else:
+            results.append((email, True, "Email sent successfully"))
+
+    if log_events:
+        for email, success, message in results:
             try:
-                log_system_event('email_error', f'Failed to send email to {to_email}', {'to': to_email, 'subject': subject, 'error': error_msg}, 'error')
+                if success:
+                    log_system_event('email_sent', f'Email sent to {email}', {'to': email, 'subject': subject}, 'success')
+                else:
+                    log_system_event('email_error', f'Failed to send email to {email}', {'to': email, 'subject': subject, 'error': message}, 'error')
             except Exception:
-                pass
-            return False, error_msg
+                pass  # Don't fail if logging fails
+    return results
+
+
+def send_email(to_email, subject, body_html, body_text=None):
+    """Send an email using global SMTP settings from environment variables.
+    
+    Args:
+        to_email: Recipient email address
+        subject: Email subject
+        body_html: HTML body content
+        body_text: Plain text body content (optional)
     
+    Returns:
+        tuple: (success: bool, message: str) - success indicates if email was sent, message contains status or error
+    """
+    try:
+        results = send_email_to_many([to_email], subject, body_html, body_text)
+        if not results:
+            return False, "No recipient email address"
+        _, success, message = results[0]
+        return success, message
     except Exception as e:
         error_msg = f"Error: {str(e)}"
         # Log email error
@@ -2930,6 +4977,200 @@ def send_email(to_email, subject, body_html, body_text=None):
         return False, error_msg
 
 
+# --- Email outbox ---
+# Notification emails are inserted into `email_outbox` by the same transaction
+# that records the event, and delivered by background sender threads in every
+# worker process. Rows are claimed with FOR UPDATE SKIP LOCKED, so senders in
+# different processes never pick up the same email; failed sends are retried
+# with exponential backoff.
+EMAIL_OUTBOX_WORKERS = int(os.environ.get('EMAIL_OUTBOX_WORKERS', 1))
+# Seconds an idle sender waits before polling the outbox again
+EMAIL_OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', 2))
+EMAIL_OUTBOX_BATCH_SIZE = 20
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+# Delay before the first retry in seconds; doubles per attempt up to an hour
+EMAIL_OUTBOX_RETRY_BASE = float(os.environ.get('EMAIL_OUTBOX_RETRY_BASE', 30))
+EMAIL_OUTBOX_RETRY_MAX = 3600
+# Claimed rows not finished within this many seconds (sender died) are retried
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300
+# Sent, failed and skipped rows are deleted after this many days
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('EMAIL_OUTBOX_RETENTION_DAYS', 7))
+
+# Set after a request queued an email so a sender wakes up without waiting for the next poll
+email_outbox_wakeup = threading.Event()
+
+
+def claim_outbox_emails(limit):
+    """Claim up to `limit` due outbox rows for sending."""
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('''
+            UPDATE email_outbox o
+            SET status = 'sending', claimed_at = CURRENT_TIMESTAMP, attempts = o.attempts + 1
+            FROM (
+                SELECT outbox_id FROM email_outbox
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'sending' AND claimed_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                ORDER BY next_attempt_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) due
+            WHERE o.outbox_id = due.outbox_id
+            RETURNING o.outbox_id, o.tenant_id, o.kind, o.payload, o.recipients, o.attempts
+        ''', (EMAIL_OUTBOX_CLAIM_TIMEOUT, limit))
+        rows = cursor.fetchall()
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return rows
+
+
+def render_outbox_email(row):
+    """Resolve recipients and render a claimed outbox row.
+
+    Returns:
+        (recipients, subject, body_html, body_text), or None if there is nothing to send
+    """
+    if row['kind'] != 'notification':
+        raise ValueError(f"Unknown outbox email kind: {row['kind']}")
+    recipients = row['recipients']
+    if not recipients:
+        parent_emails_str = (get_tenant_settings(row['tenant_id']).get('parent_email_addresses') or '').strip()
+        recipients = [e.strip() for e in parent_emails_str.split(',') if e.strip()]
+    if not recipients:
+        return None  # No email configured
+    payload = row['payload']
+    content = build_notification_email(payload['notification_type'], payload.get('user_name'), payload.get('description'),
+                                       payload.get('value'), payload.get('point_balance'), payload.get('cash_balance'))
+    if content is None:
+        return None
+    return (recipients,) + content
+
+
+def _finish_outbox_email(outbox_id, status, error=None, recipients=None, retry_in=None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            UPDATE email_outbox
+            SET status = %s, last_error = %s, recipients = COALESCE(%s, recipients),
+                sent_at = CASE WHEN %s = 'sent' THEN CURRENT_TIMESTAMP ELSE sent_at END,
+                next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+            WHERE outbox_id = %s
+        ''', (status, error, recipients, status, retry_in or 0, outbox_id))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def deliver_outbox_email(row):
+    """Send one claimed outbox row and record the outcome.
+
+    Recipients that fail are retried on their own with exponential backoff
+    until EMAIL_OUTBOX_MAX_ATTEMPTS is reached.
+    """
+    try:
+        rendered = render_outbox_email(row)
+        if rendered is None:
+            _finish_outbox_email(row['outbox_id'], 'skipped')
+            return
+        recipients, subject, body_html, body_text = rendered
+        config = get_smtp_config()
+        if not all([config['server'], config['port'], config['username'], config['password']]):
+            # Retrying cannot help until the SMTP environment variables are set
+            _finish_outbox_email(row['outbox_id'], 'failed', "Email settings are not configured. Please set SMTP environment variables.")
+            return
+        failed = [(email, message) for email, success, message in send_email_to_many(recipients, subject, body_html, body_text) if not success]
+    except Exception as e:
+        logger.error(f"Error delivering outbox email {row['outbox_id']}: {e}", exc_info=True)
+        recipients, failed = None, [(None, str(e))]
+
+    if not failed:
+        _finish_outbox_email(row['outbox_id'], 'sent')
+        return
+    error = '; '.join(f'{email}: {message}' if email else message for email, message in failed)
+    failed_recipients = [email for email, _ in failed if email] or None
+    if row['attempts'] >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+        _finish_outbox_email(row['outbox_id'], 'failed', error, failed_recipients)
+        return
+    retry_in = min(EMAIL_OUTBOX_RETRY_MAX, EMAIL_OUTBOX_RETRY_BASE * 2 ** (row['attempts'] - 1))
+    _finish_outbox_email(row['outbox_id'], 'pending', error, failed_recipients, retry_in)
+
+
+def purge_email_outbox():
+    """Delete finished outbox rows older than EMAIL_OUTBOX_RETENTION_DAYS."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            DELETE FROM email_outbox
+            WHERE status IN ('sent', 'failed', 'skipped')
+              AND created_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+        ''', (EMAIL_OUTBOX_RETENTION_DAYS,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_email_outbox_stats():
+    """Return outbox queue depth and delivery latency over the last hour."""
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('''
+            SELECT
+                COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                COUNT(*) FILTER (WHERE status = 'sending') AS sending,
+                COUNT(*) FILTER (WHERE status = 'failed') AS failed,
+                EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - MIN(created_at) FILTER (WHERE status IN ('pending', 'sending'))) AS oldest_queued_seconds,
+                COUNT(*) FILTER (WHERE status = 'sent' AND sent_at >= CURRENT_TIMESTAMP - INTERVAL '1 hour') AS sent_last_hour,
+                AVG(EXTRACT(EPOCH FROM sent_at - created_at)) FILTER (WHERE status = 'sent' AND sent_at >= CURRENT_TIMESTAMP - INTERVAL '1 hour') AS latency_avg_seconds,
+                PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM sent_at - created_at))
+                    FILTER (WHERE status = 'sent' AND sent_at >= CURRENT_TIMESTAMP - INTERVAL '1 hour') AS latency_p95_seconds
+            FROM email_outbox
+        ''')
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    return {key: round(float(value), 3) if value is not None and not isinstance(value, int) else value
+            for key, value in row.items()}
+
+
+def email_outbox_worker():
+    """Background sender that drains the email outbox."""
+    last_purge = 0.0
+    while True:
+        try:
+            rows = claim_outbox_emails(EMAIL_OUTBOX_BATCH_SIZE)
+            for row in rows:
+                deliver_outbox_email(row)
+            if time_module.monotonic() - last_purge > 3600:
+                purge_email_outbox()
+                purge_idempotency_keys()
+                last_purge = time_module.monotonic()
+            if len(rows) < EMAIL_OUTBOX_BATCH_SIZE:
+                email_outbox_wakeup.wait(EMAIL_OUTBOX_POLL_SECONDS)
+                email_outbox_wakeup.clear()
+        except Exception as e:
+            logger.error(f"Error in email_outbox_worker: {e}", exc_info=True)
+            time_module.sleep(EMAIL_OUTBOX_POLL_SECONDS * 5)
+
+
+def start_email_outbox_workers():
+    """Start the background email sender threads for this worker process."""
+    for i in range(EMAIL_OUTBOX_WORKERS):
+        try:
+            threading.Thread(target=email_outbox_worker, daemon=True, name=f"EmailOutboxWorker-{i}").start()
+        except Exception as e:
+            logger.error(f"Failed to start email outbox worker: {e}", exc_info=True)
+    logger.info(f"{EMAIL_OUTBOX_WORKERS} email outbox worker(s) started")
+
+
 def send_tenant_verification_email(tenant_id, tenant_email, verification_token):
     """Send tenant email verification link.
     
@@ -2976,53 +5217,21 @@ If you did not create this account, please ignore this email.
     """
     
     # Use global SMTP settings from environment variables only
-    smtp_server = os.environ.get('SMTP_SERVER', '').strip()
-    smtp_port = os.environ.get('SMTP_PORT', '587').strip()
-    smtp_username = os.environ.get('SMTP_USERNAME', '').strip()
-    smtp_password = os.environ.get('SMTP_PASSWORD', '').strip()
-    smtp_sender_name = os.environ.get('SMTP_SENDER_NAME', 'Family Chores').strip()
+    config = get_smtp_config()
     
     # Validate required settings
-    if not all([smtp_server, smtp_username, smtp_password]):
+    if not all([config['server'], config['username'], config['password']]):
         raise Exception("Email settings are not configured. Please set SMTP environment variables.")
     
-    try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = formataddr((smtp_sender_name, smtp_username))
-        msg['To'] = tenant_email
-        
-        # Add text and HTML parts
-        if body_text:
-            text_part = MIMEText(body_text, 'plain')
-            msg.attach(text_part)
-        
-        html_part = MIMEText(body_html, 'html')
-        msg.attach(html_part)
-        
-        # Connect to SMTP server and send
-        smtp_port_int = int(smtp_port)
-        server = smtplib.SMTP(smtp_server, smtp_port_int, timeout=10)
-        server.starttls()  # Enable encryption
-        server.login(smtp_username, smtp_password)
-        server.send_message(msg)
-        server.quit()
-        
-        # Log successful email send
-        try:
-            log_system_event('tenant_verification_email_sent', f'Verification email sent to {tenant_email}', {'to': tenant_email, 'tenant_id': str(tenant_id)}, 'success')
-        except Exception:
-            pass
+    _, success, message = send_email_to_many([tenant_email], subject, body_html, body_text, log_events=False)[0]
+    if not success:
+        raise Exception(message)
     
-    except smtplib.SMTPAuthenticationError:
-        raise Exception("SMTP authentication failed. Please check your username and password.")
-    except smtplib.SMTPConnectError:
-        raise Exception(f"Could not connect to SMTP server {smtp_server}:{smtp_port}. Please check your SMTP settings.")
-    except smtplib.SMTPException as e:
-        raise Exception(f"SMTP error: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Error sending verification email: {str(e)}")
+    # Log successful email send
+    try:
+        log_system_event('tenant_verification_email_sent', f'Verification email sent to {tenant_email}', {'to': tenant_email, 'tenant_id': str(tenant_id)}, 'success')
+    except Exception:
+        pass
 
 @app.route('/api/send-test-email', methods=['POST'])
 @parent_required
@@ -3033,20 +5242,11 @@ def send_test_email():
     # Get parent email addresses from request
     parent_emails = data.get('parent_email_addresses', [])
     
-    # Get tenant-scoped parent email addresses from database
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    # Get tenant-scoped parent email addresses from settings
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
-        cursor.close()
-        conn.close()
         return jsonify({'error': 'Tenant context required'}), 400
-    cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, 'parent_email_addresses'))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    
-    stored_parent_emails = result['setting_value'].strip() if result and result.get('setting_value') else ''
+    stored_parent_emails = (get_tenant_settings(tenant_id).get('parent_email_addresses') or '').strip()
     
     # Determine recipient emails
     if parent_emails and len(parent_emails) > 0:
@@ -3086,11 +5286,10 @@ If you received this email, your SMTP settings are working properly!
 Sent from Family Chores application
     """
     
-    # Send email to each address
+    # Send one email to all addresses
     success_count = 0
     error_messages = []
-    for email in email_list:
-        success, message = send_email(email, subject, body_html, body_text)
+    for email, success, message in send_email_to_many(email_list, subject, body_html, body_text):
         if success:
             success_count += 1
         else:
@@ -3135,6 +5334,7 @@ def send_daily_digest_manual():
 
 @app.route('/api/withdraw-cash', methods=['POST'])
 @kid_permission_required('kid_allowed_withdraw_cash')
+@idempotent
 def withdraw_cash():
     """Withdraw cash from a user's cash balance."""
     data = request.get_json()
@@ -3161,31 +5361,31 @@ def withdraw_cash():
     conn = get_db_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    # Check user exists and get cash balance (tenant-scoped)
-    cursor.execute('''
-        SELECT user_id, cash_balance
-        FROM tenant_users
-        WHERE user_id = %s AND tenant_id = %s
-    ''', (data['user_id'], tenant_id))
-    user = cursor.fetchone()
-    
-    if not user:
+    # Subtract the amount only if the balance covers it, atomically (tenant-scoped)
+    try:
+        user = update_balance(conn, cursor, 'cash_withdrawal', '''
+            UPDATE tenant_users
+            SET cash_balance = cash_balance - %(amount)s
+            WHERE user_id = %(user_id)s AND tenant_id = %(tenant_id)s
+              AND COALESCE(cash_balance, 0) >= %(amount)s
+            RETURNING full_name, cash_balance
+        ''', {'amount': float(amount), 'user_id': data['user_id'], 'tenant_id': tenant_id})
+    except BALANCE_RETRYABLE_ERRORS:
         cursor.close()
         conn.close()
-        return jsonify({'error': 'User not found'}), 404
-    
-    current_cash = user.get('cash_balance') or 0.0
-    if current_cash < amount:
+        return jsonify({'error': 'The balance is being updated by another request. Please try again.'}), 409
+
+    if not user:
+        cursor.execute('SELECT cash_balance FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
+        current = cursor.fetchone()
         cursor.close()
         conn.close()
-        return jsonify({'error': f'Insufficient cash balance. User has ${current_cash:.2f}.'}), 400
+        if not current:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify({'error': f"Insufficient cash balance. User has ${current.get('cash_balance') or 0.0:.2f}."}), 400
 
-    # Update cash_balance (subtract amount)
-    cursor.execute('''
-        UPDATE tenant_users 
-        SET cash_balance = cash_balance - %s 
-        WHERE user_id = %s AND tenant_id = %s
-    ''', (float(amount), data['user_id'], tenant_id))
+    new_cash = user['cash_balance']
+    user_name = user['full_name']
 
     # Create transaction record for the withdrawal (tenant-scoped)
     # Store amount as negative value in tenant_transactions table
@@ -3197,10 +5397,8 @@ def withdraw_cash():
     result = cursor.fetchone()
     transaction_id = result['transaction_id'] if result else None
 
-    # Get user name for email notification (tenant-scoped)
-    cursor.execute('SELECT full_name FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
-    user_result = cursor.fetchone()
-    user_name = user_result.get('full_name') if user_result else 'Unknown User'
+    # Queue email notification (if enabled) with the withdrawal
+    enqueue_notification_email(cursor, tenant_id, 'cash_withdrawn', user_name, f'Cash withdrawal of ${amount:.2f}', amount, data['user_id'])
     
     conn.commit()
     cursor.close()
@@ -3210,215 +5408,395 @@ def withdraw_cash():
     try:
         log_system_event('cash_withdrawn', f'{user_name} withdrew ${amount:.2f}', 
                         {'user_id': data['user_id'], 'user_name': user_name, 'amount': amount, 
-                         'old_balance': current_cash, 'new_balance': current_cash - amount, 'transaction_id': transaction_id}, 'success')
+                         'old_balance': new_cash + amount, 'new_balance': new_cash, 'transaction_id': transaction_id}, 'success')
     except Exception:
         pass  # Don't fail if logging fails
     
-    # Send email notification if enabled
-    send_notification_email('cash_withdrawn', user_name, f'Cash withdrawal of ${amount:.2f}', amount, data['user_id'])
-    
     return jsonify({
         'transaction_id': transaction_id,
         'message': f'Successfully withdrew ${amount:.2f}',
-        'new_balance': current_cash - amount
+        'new_balance': new_cash
     }), 200
 
 def get_setting(key, default):
-    """Get a setting value from the database."""
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    """Get a setting value for the current tenant (from the tenant config cache)."""
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
-    result = None
-    try:
-        if tenant_id:
-            cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, key))
-            result = cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
+    value = get_tenant_settings(tenant_id).get(key) if tenant_id else None
 
-    if result and result.get('setting_value') is not None:
+    if value is not None:
         if key == 'automatic_daily_cash_out':
-            return result.get('setting_value') == '1'
+            return value == '1'
         elif key == 'max_rollover_points':
             try:
-                return int(result.get('setting_value'))
+                return int(value)
             except Exception:
                 return default
-        return result.get('setting_value')
+        return value
     return default
 
-def process_daily_cash_out(triggered_manually=False):
+# Set-based daily cash out. One statement locks the users in scope, reads each
+# tenant's automatic_daily_cash_out / max_rollover_points settings, converts or
+# caps point balances and writes the conversion transactions.
+# Conversion rules (5 points = $1):
+#   automatic on:  balance > max_rollover -> cash += balance // 5,
+#                  points = min(max_rollover, balance % 5)
+#   automatic off: balance > max_rollover -> points = max_rollover
+DAILY_CASH_OUT_SQL = '''
+    WITH users_in_scope AS (
+        SELECT u.tenant_id, u.user_id, COALESCE(u.points_balance, 0) AS balance
+        FROM tenant_users u
+        WHERE {scope}
+        FOR UPDATE
+    ),
+    tenant_config AS (
+        SELECT t.tenant_id,
+               COALESCE(MAX(s.setting_value) FILTER (WHERE s.setting_key = 'automatic_daily_cash_out'), '1') = '1' AS automatic,
+               MAX(TRIM(s.setting_value)) FILTER (WHERE s.setting_key = 'max_rollover_points') AS raw_max_rollover
+        FROM (SELECT DISTINCT tenant_id FROM users_in_scope) t
+        LEFT JOIN tenant_settings s
+               ON s.tenant_id = t.tenant_id
+              AND s.setting_key IN ('automatic_daily_cash_out', 'max_rollover_points')
+        GROUP BY t.tenant_id
+    ),
+    to_convert AS (
+        SELECT us.tenant_id, us.user_id, us.balance, c.automatic,
+               CASE WHEN c.raw_max_rollover ~ '^[-+]?[0-9]{{1,9}}$' THEN c.raw_max_rollover::integer ELSE 4 END AS max_rollover
+        FROM users_in_scope us
+        JOIN tenant_config c ON c.tenant_id = us.tenant_id
+    ),
+    updated AS (
+        UPDATE tenant_users u
+        SET cash_balance = CASE WHEN tc.automatic THEN u.cash_balance + tc.balance / 5 ELSE u.cash_balance END,
+            points_balance = CASE WHEN tc.automatic THEN LEAST(tc.max_rollover, tc.balance %% 5) ELSE tc.max_rollover END
+        FROM to_convert tc
+        WHERE u.tenant_id = tc.tenant_id AND u.user_id = tc.user_id
+          AND tc.balance > tc.max_rollover
+        RETURNING u.tenant_id, u.user_id, tc.balance, tc.automatic
+    ),
+    inserted AS (
+        INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
+        SELECT tenant_id, user_id,
+               'Daily cash out: Redeemed ' || (balance / 5 * 5) || ' points for $' || to_char(balance / 5, 'FM999999999990.00'),
+               -(balance / 5 * 5), 'points_redemption', %(timestamp)s
+        FROM updated
+        WHERE automatic
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM users_in_scope) AS user_count,
+           (SELECT COUNT(*) FROM updated) AS updated_count,
+           (SELECT COUNT(*) FROM inserted) AS converted_count
+'''
+
+
+def cash_out_tenants(cursor, tenant_ids=None):
+    """Run the set-based daily cash out for the given tenants (all tenants if None).
+
+    The caller owns the transaction and must commit.
+
+    Returns:
+        dict with user_count (users in scope), updated_count (balances changed)
+        and converted_count (conversion transactions written)
+    """
+    params = {'timestamp': get_system_timestamp()}
+    if tenant_ids is None:
+        scope = 'TRUE'
+    else:
+        scope = 'u.tenant_id = ANY(%(tenant_ids)s::uuid[])'
+        params['tenant_ids'] = [str(t) for t in tenant_ids]
+    set_balance_reason(cursor, 'daily_cash_out')
+    cursor.execute(DAILY_CASH_OUT_SQL.format(scope=scope), params)
+    user_count, updated_count, converted_count = cursor.fetchone()
+    return {'user_count': user_count, 'updated_count': updated_count, 'converted_count': converted_count}
+
+
+# --- Sharded midnight processing ---
+# The automatic midnight jobs split tenants into shards and process the shards
+# on a small thread pool. Every tenant is handled (and committed) on its own,
+# so one slow or failing tenant neither holds a long transaction open nor
+# blocks the rest of the run. Failed tenant ids are recorded with the job run
+# and can be retried with `flask --app app resume-job <run_id>`.
+MIDNIGHT_JOB_CONCURRENCY = max(1, int(os.environ.get('MIDNIGHT_JOB_CONCURRENCY', 4)))
+MIDNIGHT_SHARD_SIZE = max(1, int(os.environ.get('MIDNIGHT_SHARD_SIZE', 100)))
+
+# Each tenant picks the time of day ('HH:MM', server local time) its daily
+# jobs run at via the daily_job_time setting, which spreads the load instead
+# of every tenant running at midnight.
+DEFAULT_DAILY_JOB_TIME = '00:00'
+DAILY_JOB_TIME_RE = re.compile(r'^([01][0-9]|2[0-3]):[0-5][0-9]$')
+# Selects a tenant's effective daily_job_time; expects tenant_settings joined as `jt`
+DAILY_JOB_TIME_SQL = f"""COALESCE(CASE WHEN TRIM(jt.setting_value) ~ '{DAILY_JOB_TIME_RE.pattern}'
+                                 THEN TRIM(jt.setting_value) END, '{DEFAULT_DAILY_JOB_TIME}')"""
+
+
+def parse_daily_job_time(value):
+    """Return value if it is a valid 'HH:MM' run time, else the default."""
+    value = (value or '').strip()
+    return value if DAILY_JOB_TIME_RE.match(value) else DEFAULT_DAILY_JOB_TIME
+
+
+def get_all_tenant_ids(slot=None):
+    """Return the ids of every tenant that has at least one user.
+
+    Args:
+        slot: Optional 'HH:MM' daily run time; only tenants scheduled at it are returned
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            SELECT DISTINCT u.tenant_id FROM tenant_users u
+            LEFT JOIN tenant_settings jt ON jt.tenant_id = u.tenant_id AND jt.setting_key = 'daily_job_time'
+            WHERE %(slot)s IS NULL OR {DAILY_JOB_TIME_SQL} = %(slot)s
+            ORDER BY u.tenant_id
+        ''', {'slot': slot})
+        return [str(row[0]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def run_tenant_shards(job_name, tenant_ids, process_tenant):
+    """Run `process_tenant(tenant_id)` for every tenant, sharded across a thread pool.
+
+    Args:
+        job_name: Name used in progress logging
+        tenant_ids: Tenants to process
+        process_tenant: Callable handling (and committing) one tenant. It may
+                        return a count of processed items (e.g. users).
+
+    Returns:
+        dict report with tenant/shard counts, the summed processed count and
+        the failed tenant ids with their errors
+    """
+    shards = [tenant_ids[i:i + MIDNIGHT_SHARD_SIZE] for i in range(0, len(tenant_ids), MIDNIGHT_SHARD_SIZE)]
+
+    def run_shard(index, shard):
+        started = time_module.monotonic()
+        processed = 0
+        failed = []
+        for tenant_id in shard:
+            try:
+                processed += process_tenant(tenant_id) or 0
+            except Exception as e:
+                logger.error(f"{job_name}: tenant {tenant_id} failed: {e}", exc_info=True)
+                failed.append({'tenant_id': str(tenant_id), 'error': str(e)})
+        duration_ms = int((time_module.monotonic() - started) * 1000)
+        logger.info(f"{job_name}: shard {index + 1}/{len(shards)} finished in {duration_ms} ms "
+                    f"({len(shard) - len(failed)}/{len(shard)} tenant(s) succeeded)")
+        return {'shard': index, 'tenants': len(shard), 'processed': processed, 'failed': failed, 'duration_ms': duration_ms}
+
+    results = []
+    if shards:
+        workers = min(MIDNIGHT_JOB_CONCURRENCY, len(shards))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{job_name}-shard') as executor:
+            futures = [executor.submit(run_shard, index, shard) for index, shard in enumerate(shards)]
+            for future in as_completed(futures):
+                results.append(future.result())
+    results.sort(key=lambda r: r['shard'])
+
+    failed = [f for r in results for f in r['failed']]
+    return {
+        'job': job_name,
+        'tenant_count': len(tenant_ids),
+        'shard_count': len(shards),
+        'succeeded': len(tenant_ids) - len(failed),
+        'processed': sum(r['processed'] for r in results),
+        'failed_tenants': failed,
+        'shards': [{k: r[k] for k in ('shard', 'tenants', 'duration_ms')} | {'failed': len(r['failed'])} for r in results],
+    }
+
+
+def daily_run_date(scheduled_for=None):
+    """Return the business date a daily cash out or digest belongs to.
+
+    A scheduled run on day D (at any daily run time) closes out day D-1; a
+    manual run closes out the current day.
+    """
+    if scheduled_for is None:
+        return datetime.now().date()
+    return (scheduled_for - timedelta(days=1)).date()
+
+
+def get_pending_cash_out_tenant_ids(run_date, slot=None):
+    """Return tenants with users that have no automatic `cash_out_runs` entry for run_date yet.
+
+    Args:
+        run_date: Business date being closed out
+        slot: Optional 'HH:MM' daily run time; only tenants scheduled at it are returned
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            SELECT DISTINCT u.tenant_id FROM tenant_users u
+            LEFT JOIN tenant_settings jt ON jt.tenant_id = u.tenant_id AND jt.setting_key = 'daily_job_time'
+            WHERE NOT EXISTS (
+                SELECT 1 FROM cash_out_runs r
+                WHERE r.run_date = %(run_date)s AND r.tenant_id = u.tenant_id AND r.trigger_type = 'automatic'
+            )
+            AND (%(slot)s IS NULL OR {DAILY_JOB_TIME_SQL} = %(slot)s)
+            ORDER BY u.tenant_id
+        ''', {'run_date': run_date, 'slot': slot})
+        return [str(row[0]) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def cash_out_tenant(tenant_id, run_date, trigger_type='automatic'):
+    """Run and commit the daily cash out for a single tenant and business date.
+
+    The `cash_out_runs` ledger row is claimed in the same transaction as the
+    conversion, so the tenant is converted at most once per run_date and
+    trigger_type even if runs overlap or are retried after a crash. Manual and
+    automatic runs have separate entries: a manual cash out during the day does
+    not stand in for that night's scheduled one, which then converts only the
+    points earned since.
+
+    Returns:
+        The number of users processed, or None if run_date was already processed
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO cash_out_runs (run_date, tenant_id, processed_at, trigger_type)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (run_date, tenant_id, trigger_type) DO NOTHING
+            RETURNING tenant_id
+        ''', (run_date, tenant_id, datetime.now(), trigger_type))
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return None
+        result = cash_out_tenants(cursor, [tenant_id])
+        cursor.execute('''
+            UPDATE cash_out_runs SET user_count = %s, converted_count = %s
+            WHERE run_date = %s AND tenant_id = %s AND trigger_type = %s
+        ''', (result['user_count'], result['converted_count'], run_date, tenant_id, trigger_type))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+    return result['user_count']
+
+
+def process_daily_cash_out(triggered_manually=False, tenant_ids=None, run_date=None, slot=None):
     """Process daily cash out for all users at midnight.
+
+    Idempotent per business date: tenants already recorded in `cash_out_runs`
+    for run_date (and the same trigger type) are skipped.
     
     Args:
         triggered_manually: True if triggered manually (process only active tenant), 
                            False if triggered by timer (process all tenants)
+        tenant_ids: Optional list of tenants for the automatic path (used to
+                    resume the failed tenants of a partial run)
+        run_date: Business date being closed out (defaults to today)
+        slot: Optional 'HH:MM' daily run time; the automatic path only
+              processes tenants scheduled at it
+
+    Returns:
+        The shard report for the automatic path; for a manual run, the number
+        of users processed or None if the tenant was already cashed out
+        manually today
+
+    Raises:
+        ValueError: a manual run without a tenant context
     """
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
+    if run_date is None:
+        run_date = daily_run_date()
+    report = None
     if triggered_manually:
         # Manual trigger: only process users for the active tenant using that tenant's settings
         tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
         if not tenant_id:
-            cursor.close()
-            conn.close()
-            logger.warning("Manual cash out triggered without tenant context")
-            return
-        
-        # Get settings for this specific tenant
-        cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s)', 
-                      (tenant_id, 'automatic_daily_cash_out', 'max_rollover_points'))
-        settings = cursor.fetchall()
-        settings_dict = {row['setting_key']: row['setting_value'] for row in settings}
-        
-        automatic_cash_out = settings_dict.get('automatic_daily_cash_out', '1') == '1'
-        try:
-            max_rollover = int(settings_dict.get('max_rollover_points', '4'))
-        except (ValueError, TypeError):
-            max_rollover = 4
-        
-        # Get users only for this tenant
-        cursor.execute('SELECT tenant_id, user_id, points_balance FROM tenant_users WHERE tenant_id = %s', (tenant_id,))
-        users = cursor.fetchall()
-        
-        # Process users with tenant-specific settings
-        for user in users:
-            tenant_id_row = user.get('tenant_id')
-            user_id = user.get('user_id')
-            balance = user.get('points_balance') or 0
-
-            if automatic_cash_out:
-                # Convert (balance - max_rollover) to cash, keep max_rollover points
-                if balance > max_rollover:
-                    cash_amount = balance // 5
-                    points_to_convert = cash_amount * 5
-                    remainder = balance % 5
-                    rollover = min(max_rollover, remainder)
-                    
-                    # Update cash_balance
-                    cursor.execute('''
-                        UPDATE tenant_users 
-                        SET cash_balance = cash_balance + %s 
-                        WHERE user_id = %s AND tenant_id = %s
-                    ''', (cash_amount, user_id, tenant_id_row))
-                    
-                    # Update point balance to rollover amount
-                    cursor.execute('''
-                        UPDATE tenant_users 
-                        SET points_balance = %s 
-                        WHERE user_id = %s AND tenant_id = %s
-                    ''', (rollover, user_id, tenant_id_row))
-                    
-                    # Create transaction record for the conversion
-                    description = f'Daily cash out: Redeemed {points_to_convert} points for ${cash_amount:.2f}'
-                    cursor.execute('''
-                        INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
-                        VALUES (%s, %s, %s, %s, 'points_redemption', %s)
-                    ''', (tenant_id_row, user_id, description, -points_to_convert, get_system_timestamp()))
-            else:
-                # Just cap the balance at max_rollover if it exceeds it
-                if balance > max_rollover:
-                    cursor.execute('''
-                        UPDATE tenant_users 
-                        SET points_balance = %s 
-                        WHERE user_id = %s AND tenant_id = %s
-                    ''', (max_rollover, user_id, tenant_id_row))
-        
-        processed_count = len(users)
-        
+            raise ValueError('No tenant context for manual cash out')
+        processed_count = cash_out_tenant(tenant_id, run_date, 'manual')
+        if processed_count is None:
+            logger.info(f"Daily cash out for {run_date} already processed for tenant {tenant_id}")
+            return None
     else:
-        # Automatic trigger: process all users across all tenants, each with their own settings
-        # First get all unique tenants
-        cursor.execute('SELECT DISTINCT tenant_id FROM tenant_users')
-        all_tenants = cursor.fetchall()
-        
-        processed_count = 0
-        
-        for tenant_row in all_tenants:
-            tenant_id = tenant_row.get('tenant_id')
-            
-            # Get settings for this tenant
-            cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s)', 
-                          (tenant_id, 'automatic_daily_cash_out', 'max_rollover_points'))
-            settings = cursor.fetchall()
-            settings_dict = {row['setting_key']: row['setting_value'] for row in settings}
-            
-            automatic_cash_out = settings_dict.get('automatic_daily_cash_out', '1') == '1'
-            try:
-                max_rollover = int(settings_dict.get('max_rollover_points', '4'))
-            except (ValueError, TypeError):
-                max_rollover = 4
-            
-            # Get users for this tenant
-            cursor.execute('SELECT tenant_id, user_id, points_balance FROM tenant_users WHERE tenant_id = %s', (tenant_id,))
-            users = cursor.fetchall()
-            
-            # Process each user with this tenant's settings
-            for user in users:
-                tenant_id_row = user.get('tenant_id')
-                user_id = user.get('user_id')
-                balance = user.get('points_balance') or 0
-
-                if automatic_cash_out:
-                    # Convert (balance - max_rollover) to cash, keep max_rollover points
-                    if balance > max_rollover:
-                        cash_amount = balance // 5
-                        points_to_convert = cash_amount * 5
-                        remainder = balance % 5
-                        rollover = min(max_rollover, remainder)
-                        
-                        # Update cash_balance
-                        cursor.execute('''
-                            UPDATE tenant_users 
-                            SET cash_balance = cash_balance + %s 
-                            WHERE user_id = %s AND tenant_id = %s
-                        ''', (cash_amount, user_id, tenant_id_row))
-                        
-                        # Update point balance to rollover amount
-                        cursor.execute('''
-                            UPDATE tenant_users 
-                            SET points_balance = %s 
-                            WHERE user_id = %s AND tenant_id = %s
-                        ''', (rollover, user_id, tenant_id_row))
-                        
-                        # Create transaction record for the conversion
-                        description = f'Daily cash out: Redeemed {points_to_convert} points for ${cash_amount:.2f}'
-                        cursor.execute('''
-                            INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
-                            VALUES (%s, %s, %s, %s, 'points_redemption', %s)
-                        ''', (tenant_id_row, user_id, description, -points_to_convert, get_system_timestamp()))
-                else:
-                    # Just cap the balance at max_rollover if it exceeds it
-                    if balance > max_rollover:
-                        cursor.execute('''
-                            UPDATE tenant_users 
-                            SET points_balance = %s 
-                            WHERE user_id = %s AND tenant_id = %s
-                        ''', (max_rollover, user_id, tenant_id_row))
-                
-                processed_count += 1
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+        # Automatic trigger: process every pending tenant (each with its own settings) in parallel shards
+        if tenant_ids is None:
+            tenant_ids = get_pending_cash_out_tenant_ids(run_date, slot)
+        report = run_tenant_shards('cash_out', tenant_ids, lambda tenant_id: cash_out_tenant(tenant_id, run_date))
+        report['run_date'] = run_date.isoformat()
+        processed_count = report['processed']
     
     # Log cash out processing
     try:
         trigger_type = 'manual' if triggered_manually else 'automatic (timer)'
+        details = {'user_count': processed_count, 'triggered_manually': triggered_manually, 'trigger_type': trigger_type}
+        status = 'success'
+        if report:
+            details.update({'tenant_count': report['tenant_count'], 'failed_tenants': report['failed_tenants']})
+            if report['failed_tenants']:
+                status = 'error'
         log_system_event('cash_out_run', f'Daily cash out processed for {processed_count} user(s) ({trigger_type})', 
-                        {'user_count': processed_count, 'triggered_manually': triggered_manually, 'trigger_type': trigger_type}, 'success')
+                        details, status)
     except Exception:
         pass  # Don't fail if logging fails
     
     logger.info(f"Daily cash out processed at {datetime.now()}")
-
-
+    return report if report is not None else processed_count
+
+
+
+
+# Everything /api/record-chore writes, in one statement: stamps the chore's
+# last_completed, credits the points (tagged 'chore_completed' in the balance
+# ledger), records the transaction and queues the notification email if the
+# tenant has it enabled. All CTEs share one snapshot, so the new balance is
+# taken from the UPDATE's RETURNING rather than re-read. Returns no row when the
+# chore does not exist and a row with NULL user columns when the user does not.
+RECORD_CHORE_SQL = '''
+    WITH ledger_reason AS (
+        SELECT set_config('familychores.balance_reason', 'chore_completed', true)
+    ),
+    chore AS (
+        UPDATE tenant_chores
+        SET last_completed = %(timestamp)s
+        WHERE chore_id = %(chore_id)s AND tenant_id = %(tenant_id)s
+        RETURNING chore
+    ),
+    credited AS (
+        UPDATE tenant_users u
+        SET points_balance = COALESCE(u.points_balance, 0) + %(points)s
+        FROM chore, ledger_reason
+        WHERE u.user_id = %(user_id)s AND u.tenant_id = %(tenant_id)s
+        RETURNING u.user_id, u.full_name, u.points_balance, u.cash_balance
+    ),
+    recorded AS (
+        INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
+        SELECT %(tenant_id)s, credited.user_id, chore.chore, %(points)s, 'chore_completed', %(timestamp)s
+        FROM credited, chore
+        RETURNING transaction_id
+    ),
+    queued AS (
+        INSERT INTO email_outbox (tenant_id, kind, payload)
+        SELECT s.tenant_id, 'notification', jsonb_build_object(
+                   'notification_type', 'chore_completed', 'user_name', credited.full_name,
+                   'description', chore.chore, 'value', %(points)s, 'user_id', credited.user_id,
+                   'point_balance', COALESCE(credited.points_balance, 0),
+                   'cash_balance', COALESCE(credited.cash_balance, 0))
+        FROM tenant_settings s, credited, chore
+        WHERE s.tenant_id = %(tenant_id)s AND s.setting_key = 'email_notify_chore_completed' AND s.setting_value = '1'
+        RETURNING 1
+    )
+    SELECT chore.chore AS description, credited.full_name AS user_name, credited.points_balance AS new_balance,
+           (SELECT transaction_id FROM recorded) AS transaction_id,
+           EXISTS (SELECT 1 FROM queued) AS email_queued
+    FROM chore
+    LEFT JOIN credited ON TRUE
+'''
 
 
 @app.route('/api/record-chore', methods=['POST'])
 @kid_permission_required('kid_allowed_record_chore')
+@idempotent
 def record_chore():
     """Record a chore completion as a transaction (kids can call this if permitted)."""
     data = request.get_json() or {}
@@ -3431,74 +5809,46 @@ def record_chore():
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
 
+    if not chore_id:
+        return jsonify({'error': 'chore_id with points is required'}), 400
+    try:
+        points = int(data.get('points'))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'points must be an integer'}), 400
+    if points <= 0:
+        return jsonify({'error': 'Points must be greater than 0'}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
 
-    description = None
-    points = None
-
     try:
-        if chore_id:
-            # Lookup stored chore (tenant-scoped)
-            cursor.execute('SELECT chore, point_value FROM tenant_chores WHERE chore_id = %s AND tenant_id = %s', (chore_id, tenant_id))
-            chore = cursor.fetchone()
-            if not chore:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Chore not found'}), 404
-            description = chore.get('chore')
-            points = int(chore.get('point_value') or 0)
-            try:
-                points = int(data.get('points'))
-            except (ValueError, TypeError):
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'points must be an integer'}), 400
-        else:
-            cursor.close()
-            conn.close()
-            return jsonify({'error': 'chore_id with points is required'}), 400
-
-        if points is None or points <= 0:
+        cursor.execute(RECORD_CHORE_SQL, {'tenant_id': tenant_id, 'chore_id': chore_id, 'user_id': data['user_id'],
+                                          'points': points, 'timestamp': get_system_timestamp()})
+        result = cursor.fetchone()
+        if not result or result['user_name'] is None:
+            conn.rollback()
             cursor.close()
             conn.close()
-            return jsonify({'error': 'Points must be greater than 0'}), 400
-
-        # Insert transaction and update balance (tenant-scoped)
-        timestamp = get_system_timestamp()
-        cursor.execute(
-            'INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp) VALUES (%s, %s, %s, %s, %s, %s) RETURNING transaction_id',
-            (tenant_id, data['user_id'], description, points, 'chore_completed', timestamp)
-        )
-        res = cursor.fetchone()
-        transaction_id = res['transaction_id'] if res else None
-
-        cursor.execute('UPDATE tenant_users SET points_balance = points_balance + %s WHERE user_id = %s AND tenant_id = %s', (points, data['user_id'], tenant_id))
-
-        # Track when this chore was last completed
-        cursor.execute('UPDATE tenant_chores SET last_completed = %s WHERE chore_id = %s AND tenant_id = %s', (timestamp, chore_id, tenant_id))
-
-        # Get user name for notification/logging (tenant-scoped)
-        cursor.execute('SELECT full_name FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
-        user_result = cursor.fetchone()
-        user_name = user_result.get('full_name') if user_result else 'Unknown User'
+            return jsonify({'error': 'Chore not found' if not result else 'User not found'}), 404
 
         conn.commit()
         cursor.close()
         conn.close()
+        if result['email_queued']:
+            g._email_queued = True
 
-        # Log and notify
-        try:
-            log_system_event('chore_completed', f'{user_name} completed chore', {'user_id': data['user_id'], 'description': description, 'points': points}, 'success')
-        except Exception:
-            pass
+        description = result['description']
+        user_name = result['user_name']
+        transaction_id = result['transaction_id']
 
+        # Log
         try:
-            send_notification_email('chore_completed', user_name, description, points, data['user_id'])
+            log_system_event('chore_completed', f'{user_name} completed chore', {'user_id': data['user_id'], 'description': description, 'points': points}, 'success')
         except Exception:
             pass
 
-        return jsonify({'transaction_id': transaction_id, 'message': f'Chore recorded: {description}', 'points': points}), 200
+        return jsonify({'transaction_id': transaction_id, 'message': f'Chore recorded: {description}', 'points': points,
+                        'new_balance': result['new_balance']}), 200
     except Exception as e:
         error_msg = str(e)
         try:
@@ -3515,6 +5865,7 @@ def record_chore():
 
 @app.route('/api/redeem-points', methods=['POST'])
 @kid_permission_required('kid_allowed_redeem_points')
+@idempotent
 def redeem_points():
     """Redeem points for rewards or cash (kids can call this if permitted)."""
     data = request.get_json() or {}
@@ -3534,6 +5885,13 @@ def redeem_points():
     redemption_type = data.get('redemption_type')  # e.g. 'money' or other
     description = data.get('description') or (f'Redemed {points} points' + (f' for {redemption_type}' if redemption_type else ''))
 
+    # If redeeming for money, require multiples of 5 points (5 points = $1)
+    cash_amount = 0
+    if redemption_type == 'money':
+        if points % 5 != 0:
+            return jsonify({'error': 'Points must be a multiple of 5 to redeem for money (5 points = $1)'}), 400
+        cash_amount = points // 5
+
     tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
     if not tenant_id:
         return jsonify({'error': 'tenant context required'}), 401
@@ -3542,29 +5900,32 @@ def redeem_points():
     cursor = conn.cursor(cursor_factory=RealDictCursor)
 
     try:
-        # Verify user balance (tenant-scoped)
-        cursor.execute('SELECT points_balance FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
-        user_row = cursor.fetchone()
-        if not user_row:
+        # Deduct the points (and credit the cash) only if the balance covers them, atomically (tenant-scoped)
+        try:
+            user_row = update_balance(conn, cursor, 'points_redemption', '''
+                UPDATE tenant_users
+                SET points_balance = points_balance - %(points)s,
+                    cash_balance = COALESCE(cash_balance, 0) + %(cash_amount)s
+                WHERE user_id = %(user_id)s AND tenant_id = %(tenant_id)s
+                  AND COALESCE(points_balance, 0) >= %(points)s
+                RETURNING full_name, points_balance
+            ''', {'points': points, 'cash_amount': float(cash_amount), 'user_id': data['user_id'], 'tenant_id': tenant_id})
+        except BALANCE_RETRYABLE_ERRORS:
             cursor.close()
             conn.close()
-            return jsonify({'error': 'User not found'}), 404
+            return jsonify({'error': 'The balance is being updated by another request. Please try again.'}), 409
 
-        current_balance = int(user_row.get('points_balance') or 0)
-        if current_balance < points:
+        if not user_row:
+            cursor.execute('SELECT points_balance FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
+            current = cursor.fetchone()
             cursor.close()
             conn.close()
-            return jsonify({'error': f'Insufficient points balance. User has {current_balance} points.'}), 400
+            if not current:
+                return jsonify({'error': 'User not found'}), 404
+            return jsonify({'error': f"Insufficient points balance. User has {int(current.get('points_balance') or 0)} points."}), 400
 
-        # If redeeming for money, require multiples of 5 points (5 points = $1)
-        if redemption_type == 'money':
-            if points % 5 != 0:
-                cursor.close()
-                conn.close()
-                return jsonify({'error': 'Points must be a multiple of 5 to redeem for money (5 points = $1)'}), 400
-            cash_amount = points // 5
-            # Update cash_balance in tenant_users
-            cursor.execute('UPDATE tenant_users SET cash_balance = cash_balance + %s WHERE user_id = %s AND tenant_id = %s', (float(cash_amount), data['user_id'], tenant_id))
+        new_balance = user_row['points_balance']
+        user_name = user_row['full_name']
 
         # Insert transaction (store negative points)
         timestamp = get_system_timestamp()
@@ -3575,30 +5936,20 @@ def redeem_points():
         res = cursor.fetchone()
         transaction_id = res['transaction_id'] if res else None
 
-        # Subtract points from user balance (tenant-scoped)
-        cursor.execute('UPDATE tenant_users SET points_balance = points_balance - %s WHERE user_id = %s AND tenant_id = %s', (points, data['user_id'], tenant_id))
-
-        # Get user name for notification/logging
-        cursor.execute('SELECT full_name FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (data['user_id'], tenant_id))
-        user_result = cursor.fetchone()
-        user_name = user_result.get('full_name') if user_result else 'Unknown User'
+        # Queue email notification (if enabled) with the redemption
+        enqueue_notification_email(cursor, tenant_id, 'points_redeemed', user_name, description, points, data['user_id'])
 
         conn.commit()
         cursor.close()
         conn.close()
 
-        # Log and notify
+        # Log
         try:
             log_system_event('points_redeemed', f'{user_name} redeemed points', {'user_id': data['user_id'], 'points': points, 'redemption_type': redemption_type}, 'success')
         except Exception:
             pass
 
-        try:
-            send_notification_email('points_redeemed', user_name, description, points, data['user_id'])
-        except Exception:
-            pass
-
-        return jsonify({'transaction_id': transaction_id, 'message': f'Redeemed {points} points', 'new_balance': current_balance - points}), 200
+        return jsonify({'transaction_id': transaction_id, 'message': f'Redeemed {points} points', 'new_balance': new_balance}), 200
     except Exception as e:
         error_msg = str(e)
         try:
@@ -3612,208 +5963,209 @@ def redeem_points():
             pass
         return jsonify({'error': f'Error redeeming points: {error_msg}'}), 500
 
-def send_daily_digest_email(triggered_manually=False):
+DIGEST_EMAIL_SETTING_KEYS = ('parent_email_addresses', 'email_username', 'email_smtp_server', 'email_smtp_port', 'email_password', 'email_sender_name')
+
+
+def _load_digest_data(cursor, tenant_id, day_start, day_end):
+    """Fetch a tenant's email settings, parent addresses, transactions in [day_start, day_end] and users.
+
+    Transactions are streamed through a server-side cursor and rendered as
+    they arrive (see _format_digest_transactions), so the day's rows are
+    never all held in memory at once.
+
+    Returns:
+        (settings_dict, parent_emails, (transactions_html, transactions_text), users)
+    """
+    cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = ANY(%s)',
+                  (tenant_id, list(DIGEST_EMAIL_SETTING_KEYS)))
+    settings_dict = {row['setting_key']: row['setting_value'] for row in cursor.fetchall()}
+
+    parent_emails_str = (settings_dict.get('parent_email_addresses') or '').strip()
+    parent_emails = [e.strip() for e in parent_emails_str.split(',') if e.strip()]
+    if not parent_emails:
+        return settings_dict, [], _format_digest_transactions(()), []
+
+    stream = QueryStream(cursor.connection, '''
+        SELECT 
+            t.transaction_id,
+            t.user_id,
+            t.description,
+            t.value,
+            t.transaction_type,
+            t.timestamp,
+            u.full_name as user_name
+        FROM tenant_transactions t
+        LEFT JOIN tenant_users u ON t.user_id = u.user_id AND t.tenant_id = u.tenant_id
+        WHERE t.tenant_id = %s AND t.timestamp >= %s AND t.timestamp <= %s
+        ORDER BY t.timestamp DESC
+    ''', (tenant_id, day_start, day_end))
+    transactions = _format_digest_transactions(stream.dicts())
+
+    cursor.execute('''
+        SELECT 
+            u.user_id,
+            u.full_name,
+            u.points_balance as point_balance,
+            u.cash_balance
+        FROM tenant_users u
+        WHERE u.tenant_id = %s
+        ORDER BY u.user_id
+    ''', (tenant_id,))
+    users = cursor.fetchall()
+    return settings_dict, parent_emails, transactions, users
+
+
+def _digest_day(digest_date=None):
+    """Return (day_start, day_end, date_str) for digest_date in local time (defaults to yesterday)."""
+    if digest_date is None:
+        digest_date = (datetime.now() - timedelta(days=1)).date()
+    day_start = datetime.combine(digest_date, datetime.min.time())
+    return (day_start,
+            day_start.replace(hour=23, minute=59, second=59, microsecond=999999),
+            day_start.strftime('%B %d, %Y'))
+
+
+def send_digest_for_tenant_id(tenant_id, digest_date=None):
+    """Send the automatic daily digest of digest_date for one tenant if it has the digest enabled.
+
+    The tenant's `digest_runs` row for the day is claimed before sending and
+    released again if sending fails, so replayed or resumed runs never send
+    the same day's digest twice.
+
+    Returns 1 if a digest was sent, 0 if the tenant was skipped or already got
+    it. Raises if every recipient failed so the shard runner records the
+    tenant as failed.
+    """
+    day_start, day_end, date_str = _digest_day(digest_date)
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        # Check if daily digest is enabled for this tenant
+        cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, 'email_notify_daily_digest'))
+        digest_enabled_result = cursor.fetchone()
+        if not (digest_enabled_result and digest_enabled_result.get('setting_value') == '1'):
+            return 0
+        cursor.execute('''
+            INSERT INTO digest_runs (digest_date, tenant_id, sent_at) VALUES (%s, %s, %s)
+            ON CONFLICT (digest_date, tenant_id) DO NOTHING
+            RETURNING tenant_id
+        ''', (day_start.date(), tenant_id, datetime.now()))
+        if cursor.fetchone() is None:
+            conn.rollback()
+            return 0
+        settings_dict, parent_emails, transactions, users = _load_digest_data(cursor, tenant_id, day_start, day_end)
+        if not parent_emails:
+            conn.rollback()
+            return 0  # Skip this tenant if no valid emails configured
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    try:
+        _send_digest_for_tenant(parent_emails, transactions, users, date_str, False, settings_dict)
+    except Exception:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM digest_runs WHERE digest_date = %s AND tenant_id = %s', (day_start.date(), tenant_id))
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        raise
+    return 1
+
+
+def send_daily_digest_email(triggered_manually=False, tenant_ids=None, digest_date=None, slot=None):
     """Generate and send daily digest email with today's history and current balances.
     
     Args:
         triggered_manually: If True, send digest only for active tenant using that tenant's settings.
                            If False, send digests for all tenants using each tenant's settings.
+        tenant_ids: Optional list of tenants for the automatic path (used to
+                    resume the failed tenants of a partial run)
+        digest_date: Day the digest covers (defaults to yesterday)
+        slot: Optional 'HH:MM' daily run time; the automatic path only
+              processes tenants scheduled at it
+
+    Returns:
+        The shard report for the automatic path, None for a manual run
     """
     
     try:
-        # Get yesterday's date in local timezone (since digest triggers at midnight)
-        now = datetime.now()
-        yesterday = now - timedelta(days=1)
-        yesterday_start = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-        yesterday_end = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-        date_str = yesterday.strftime('%B %d, %Y')
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
         if triggered_manually:
             # Manual trigger: only process the active tenant using that tenant's settings
             tenant_id = getattr(g, 'tenant_id', None) or request.cookies.get('tenant_id')
             if not tenant_id:
                 raise ValueError('No tenant context for daily digest')
-            
-            # Get this tenant's email settings
-            cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s, %s, %s, %s, %s)', 
-                          (tenant_id, 'parent_email_addresses', 'email_username', 'email_smtp_server', 'email_smtp_port', 'email_password', 'email_sender_name'))
-            results = cursor.fetchall()
-            settings_dict = {row['setting_key']: row['setting_value'] for row in results}
-            
-            parent_emails_str = settings_dict.get('parent_email_addresses', '').strip()
-            if not parent_emails_str:
+
+            day_start, day_end, date_str = _digest_day(digest_date)
+            conn = get_db_connection()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                settings_dict, parent_emails, transactions, users = _load_digest_data(cursor, tenant_id, day_start, day_end)
+            finally:
                 cursor.close()
                 conn.close()
-                raise ValueError("No parent email addresses configured")
-            
-            parent_emails = [e.strip() for e in parent_emails_str.split(',') if e.strip()]
+
             if not parent_emails:
-                cursor.close()
-                conn.close()
                 raise ValueError("No parent email addresses configured")
             
-            # Get transactions and users for this tenant
-            cursor.execute('''
-                SELECT 
-                    t.transaction_id,
-                    t.user_id,
-                    t.description,
-                    t.value,
-                    t.transaction_type,
-                    t.timestamp,
-                    u.full_name as user_name
-                FROM tenant_transactions t
-                LEFT JOIN tenant_users u ON t.user_id = u.user_id AND t.tenant_id = u.tenant_id
-                WHERE t.tenant_id = %s AND t.timestamp >= %s AND t.timestamp <= %s
-                ORDER BY t.timestamp DESC
-            ''', (tenant_id, yesterday_start, yesterday_end))
-            transactions = cursor.fetchall()
-
-            cursor.execute('''
-                SELECT 
-                    u.user_id,
-                    u.full_name,
-                    u.points_balance as point_balance,
-                    u.cash_balance
-                FROM tenant_users u
-                WHERE u.tenant_id = %s
-                ORDER BY u.user_id
-            ''', (tenant_id,))
-            users = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
             # Generate and send digest for this tenant
             _send_digest_for_tenant(parent_emails, transactions, users, date_str, triggered_manually, settings_dict)
         
         else:
-            # Automatic trigger: process all tenants with their own settings
-            cursor.execute('SELECT DISTINCT tenant_id FROM tenant_users')
-            all_tenants = cursor.fetchall()
-            cursor.close()
-            
-            for tenant_row in all_tenants:
-                tenant_id = tenant_row.get('tenant_id')
-                
-                # Get this tenant's email settings
-                conn = get_db_connection()
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                
-                # Check if daily digest is enabled for this tenant
-                cursor.execute('SELECT setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key = %s', (tenant_id, 'email_notify_daily_digest'))
-                digest_enabled_result = cursor.fetchone()
-                digest_enabled = digest_enabled_result and digest_enabled_result.get('setting_value') == '1'
-                
-                if not digest_enabled:
-                    cursor.close()
-                    conn.close()
-                    continue  # Skip this tenant if daily digest is not enabled
-                
-                cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s, %s, %s, %s, %s)', 
-                              (tenant_id, 'parent_email_addresses', 'email_username', 'email_smtp_server', 'email_smtp_port', 'email_password', 'email_sender_name'))
-                results = cursor.fetchall()
-                settings_dict = {row['setting_key']: row['setting_value'] for row in results}
-                
-                parent_emails_str = settings_dict.get('parent_email_addresses', '').strip()
-                if not parent_emails_str:
-                    cursor.close()
-                    conn.close()
-                    continue  # Skip this tenant if no emails configured
-                
-                parent_emails = [e.strip() for e in parent_emails_str.split(',') if e.strip()]
-                if not parent_emails:
-                    cursor.close()
-                    conn.close()
-                    continue  # Skip this tenant if no valid emails
-                
-                # Get transactions and users for this tenant
-                cursor.execute('''
-                    SELECT 
-                        t.transaction_id,
-                        t.user_id,
-                        t.description,
-                        t.value,
-                        t.transaction_type,
-                        t.timestamp,
-                        u.full_name as user_name
-                    FROM tenant_transactions t
-                    LEFT JOIN tenant_users u ON t.user_id = u.user_id AND t.tenant_id = u.tenant_id
-                    WHERE t.tenant_id = %s AND t.timestamp >= %s AND t.timestamp <= %s
-                    ORDER BY t.timestamp DESC
-                ''', (tenant_id, yesterday_start, yesterday_end))
-                transactions = cursor.fetchall()
-
-                cursor.execute('''
-                    SELECT 
-                        u.user_id,
-                        u.full_name,
-                        u.points_balance as point_balance,
-                        u.cash_balance
-                    FROM tenant_users u
-                    WHERE u.tenant_id = %s
-                    ORDER BY u.user_id
-                ''', (tenant_id,))
-                users = cursor.fetchall()
-                
-                cursor.close()
-                conn.close()
-                
-                # Generate and send digest for this tenant
-                _send_digest_for_tenant(parent_emails, transactions, users, date_str, triggered_manually, settings_dict)
+            # Automatic trigger: process all tenants with their own settings, in parallel shards
+            if tenant_ids is None:
+                tenant_ids = get_all_tenant_ids(slot)
+            report = run_tenant_shards('daily_digest', tenant_ids, lambda tenant_id: send_digest_for_tenant_id(tenant_id, digest_date))
+            logger.info(f"Daily digest sent for {report['processed']} of {report['tenant_count']} tenant(s), "
+                        f"{len(report['failed_tenants'])} failed")
+            return report
     
     except Exception as e:
         logger.error(f"Error sending daily digest email: {e}", exc_info=True)
 
 
-def _send_digest_for_tenant(parent_emails, transactions, users, date_str, triggered_manually, settings_dict=None):
-    """Helper function to generate and send digest email for a specific tenant.
-    
-    Args:
-        parent_emails: List of email addresses to send to
-        transactions: Transactions for the tenant
-        users: Users for the tenant
-        date_str: Formatted date string for the email
-        triggered_manually: Whether this was manually triggered
-        settings_dict: Optional pre-fetched email settings dict. If not provided, settings will be fetched from request context.
+def _format_digest_transactions(transactions):
+    """Render digest transaction rows as (html_rows, text_lines).
+
+    `transactions` may be any iterable of row dicts (such as a QueryStream);
+    it is consumed once.
     """
-    # Format transactions for email
-    transactions_html = ""
-    transactions_text = ""
-    if transactions:
-        for t in transactions:
-            transaction_type = t.get('transaction_type', '')
-            value = t.get('value', 0)
-            description = t.get('description', '')
-            user_name = t.get('user_name', 'Unknown')
-            timestamp = t.get('timestamp')
-            
-            if timestamp:
-                timestamp_aware = make_timezone_aware(timestamp)
-                time_str = timestamp_aware.strftime('%I:%M %p')
-            else:
-                time_str = 'N/A'
-            
-            if transaction_type == 'chore_completed':
-                type_label = "Chore Completed"
+    html_parts = []
+    text_parts = []
+    for t in transactions:
+        transaction_type = t.get('transaction_type', '')
+        value = t.get('value', 0)
+        description = t.get('description', '')
+        user_name = t.get('user_name', 'Unknown')
+        timestamp = t.get('timestamp')
+        
+        if timestamp:
+            timestamp_aware = make_timezone_aware(timestamp)
+            time_str = timestamp_aware.strftime('%I:%M %p')
+        else:
+            time_str = 'N/A'
+        
+        if transaction_type == 'chore_completed':
+            type_label = "Chore Completed"
+            value_display = f"+{value} points"
+        elif transaction_type == 'points_redemption':
+            type_label = "Points Redeemed"
+            value_display = f"-{abs(value)} points"
+        elif transaction_type == 'cash_withdrawal':
+            type_label = "Cash Withdrawn"
+            value_display = f"-${abs(value):.2f}"
+        else:
+            type_label = "Transaction"
+            if value >= 0:
                 value_display = f"+{value} points"
-            elif transaction_type == 'points_redemption':
-                type_label = "Points Redeemed"
-                value_display = f"-{abs(value)} points"
-            elif transaction_type == 'cash_withdrawal':
-                type_label = "Cash Withdrawn"
-                value_display = f"-${abs(value):.2f}"
             else:
-                type_label = "Transaction"
-                if value >= 0:
-                    value_display = f"+{value} points"
-                else:
-                    value_display = f"{value} points"
-            
-            transactions_html += f"""
+                value_display = f"{value} points"
+        
+        html_parts.append(f"""
             <tr>
                 <td style="padding: 8px; border-bottom: 1px solid #eee;">{time_str}</td>
                 <td style="padding: 8px; border-bottom: 1px solid #eee;">{user_name}</td>
@@ -3821,11 +6173,26 @@ def _send_digest_for_tenant(parent_emails, transactions, users, date_str, trigge
                 <td style="padding: 8px; border-bottom: 1px solid #eee;">{description}</td>
                 <td style="padding: 8px; border-bottom: 1px solid #eee; text-align: right;">{value_display}</td>
             </tr>
-            """
-            transactions_text += f"{time_str} - {user_name}: {type_label} - {description} ({value_display})\n"
-    else:
-        transactions_html = "<tr><td colspan='5' style='padding: 8px; text-align: center; color: #666;'>No transactions yesterday</td></tr>"
-        transactions_text = "No transactions yesterday\n"
+            """)
+        text_parts.append(f"{time_str} - {user_name}: {type_label} - {description} ({value_display})\n")
+    if not html_parts:
+        return ("<tr><td colspan='5' style='padding: 8px; text-align: center; color: #666;'>No transactions yesterday</td></tr>",
+                "No transactions yesterday\n")
+    return ''.join(html_parts), ''.join(text_parts)
+
+
+def _send_digest_for_tenant(parent_emails, transactions, users, date_str, triggered_manually, settings_dict=None):
+    """Helper function to generate and send digest email for a specific tenant.
+    
+    Args:
+        parent_emails: List of email addresses to send to
+        transactions: (html_rows, text_lines) from _format_digest_transactions
+        users: Users for the tenant
+        date_str: Formatted date string for the email
+        triggered_manually: Whether this was manually triggered
+        settings_dict: Optional pre-fetched email settings dict. If not provided, settings will be fetched from request context.
+    """
+    transactions_html, transactions_text = transactions
     
     # Format user balances
     balances_html = ""
@@ -3899,11 +6266,10 @@ Current Balances:
 Sent from Family Chores application
     """
     
-    # Send email to all parent addresses
+    # Send one email to all parent addresses
     success_count = 0
     error_messages = []
-    for email in parent_emails:
-        success, message = send_email(email, subject, body_html, body_text)
+    for email, success, message in send_email_to_many(parent_emails, subject, body_html, body_text):
         if success:
             logger.info(f"Daily digest email sent to {email}")
             success_count += 1
@@ -3911,8 +6277,8 @@ Sent from Family Chores application
             logger.error(f"Failed to send daily digest email to {email}: {message}")
             error_messages.append(f"{email}: {message}")
     
-    # If manual send, raise exception if all failed
-    if triggered_manually and success_count == 0:
+    # Raise if every recipient failed (or nothing was sent on a manual run)
+    if success_count == 0 and (triggered_manually or error_messages):
         raise Exception(f"Failed to send daily digest to any address: {'; '.join(error_messages) if error_messages else 'Unknown error'}")
 
 
@@ -3921,36 +6287,356 @@ Sent from Family Chores application
 
 ################################
 
+# Jobs run by the scheduler at each daily run time, in order. Each is called
+# with the occurrence it runs for (whose time of day selects the tenants) and
+# an optional tenant_ids list (used by resume_job_run), and returns its shard
+# report.
+DAILY_JOBS = [
+    ('cash_out', lambda scheduled_for, tenant_ids=None: process_daily_cash_out(
+        tenant_ids=tenant_ids, run_date=daily_run_date(scheduled_for), slot=scheduled_for.strftime('%H:%M'))),
+    ('daily_digest', lambda scheduled_for, tenant_ids=None: send_daily_digest_email(
+        tenant_ids=tenant_ids, digest_date=daily_run_date(scheduled_for), slot=scheduled_for.strftime('%H:%M'))),
+    ('refresh_token_compaction', lambda scheduled_for, tenant_ids=None: compact_refresh_tokens()),
+]
+# Jobs that skip already-processed tenants and can safely be re-run in full
+RERUNNABLE_JOBS = {'cash_out', 'daily_digest', 'refresh_token_compaction'}
+# Jobs that are not per tenant run once a day at a fixed time instead of at every daily run time
+FIXED_SLOT_JOBS = {'refresh_token_compaction': DEFAULT_DAILY_JOB_TIME}
+
+# Set ENABLE_JOB_SCHEDULER=0 on replicas that should only serve HTTP traffic
+ENABLE_JOB_SCHEDULER = os.environ.get('ENABLE_JOB_SCHEDULER', '1') == '1'
+# Advisory lock key shared by every worker competing for scheduler leadership
+SCHEDULER_LOCK_KEY = 7305823461
+# Longest the scheduler sleeps between checks, in seconds
+SCHEDULER_MAX_SLEEP = int(os.environ.get('SCHEDULER_MAX_SLEEP', 300))
+# How many days back missed runs are replayed when a leader (re)starts
+SCHEDULER_CATCHUP_DAYS = int(os.environ.get('SCHEDULER_CATCHUP_DAYS', 2))
+
+
+class SchedulerLeadership:
+    """Leader election for the job scheduler using a PostgreSQL advisory lock.
+
+    Every worker runs a job_timer thread, but only the one holding the
+    session-level advisory lock triggers jobs. The lock lives on a dedicated
+    connection (outside the request pool) and is released automatically by
+    PostgreSQL if the leader process or its connection dies, letting another
+    worker take over on its next attempt.
+    """
+
+    def __init__(self, lock_key):
+        self.lock_key = lock_key
+        self._conn = None
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+
+    def ensure(self):
+        """Return True if this worker holds leadership, trying to acquire it if not."""
+        if self._conn is not None:
+            try:
+                cur = self._conn.cursor()
+                cur.execute('SELECT 1')
+                cur.close()
+                return True
+            except Exception:
+                logger.warning(f"Scheduler leader connection lost on {self.worker}")
+                self._drop()
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute('SELECT pg_try_advisory_lock(%s)', (self.lock_key,))
+            acquired = cur.fetchone()[0]
+            cur.close()
+        except Exception as e:
+            logger.error(f"Scheduler leader election failed: {e}")
+            return False
+        if not acquired:
+            conn.close()
+            return False
+        self._conn = conn
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        logger.info(f"Scheduler leadership acquired by {self.worker}")
+        return True
+
+    @property
+    def is_leader(self):
+        return self._conn is not None
+
+    def _drop(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+scheduler_leadership = SchedulerLeadership(SCHEDULER_LOCK_KEY)
+
+
+def run_scheduled_job(job_name, scheduled_for, job):
+    """Claim and run one occurrence of a scheduled job, recording it in `job_runs`.
+
+    Returns False without running the job if another worker already claimed
+    this (job_name, scheduled_for) occurrence. A job that returns a shard
+    report with failed tenants is recorded as 'partial' and keeps the report
+    in `details` so the failed tenants can be resumed.
+    """
+    worker = scheduler_leadership.worker
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            INSERT INTO job_runs (job_name, scheduled_for, started_at, status, worker)
+            VALUES (%s, %s, %s, 'running', %s)
+            ON CONFLICT (job_name, scheduled_for) DO NOTHING
+            RETURNING run_id
+        ''', (job_name, scheduled_for, datetime.now(), worker))
+        claimed = cursor.fetchone()
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not claimed:
+        logger.info(f"Job {job_name} for {scheduled_for} already claimed; skipping")
+        return False
+
+    run_id = claimed[0]
+    started = time_module.monotonic()
+    status, error, report = _run_job(job_name, job, scheduled_for=scheduled_for)
+    duration_ms = int((time_module.monotonic() - started) * 1000)
+    _finish_job_run(run_id, duration_ms, status, error, report)
+
+    try:
+        log_system_event('job_run', f'Job {job_name} finished in {duration_ms} ms',
+                        {'job': job_name, 'scheduled_for': scheduled_for.isoformat(), 'duration_ms': duration_ms,
+                         'worker': worker, 'error': error}, status)
+    except Exception:
+        pass
+    return True
+
+
+def _run_job(job_name, job, **kwargs):
+    """Run a job and return (status, error, report)."""
+    try:
+        report = job(**kwargs)
+    except Exception as e:
+        logger.error(f"Scheduled job {job_name} failed: {e}", exc_info=True)
+        return 'error', str(e), None
+    if not isinstance(report, dict):
+        report = None
+    if report and report.get('failed_tenants'):
+        return 'partial', f"{len(report['failed_tenants'])} tenant(s) failed", report
+    return 'success', None, report
+
+
+def _finish_job_run(run_id, duration_ms, status, error, report):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''
+            UPDATE job_runs SET finished_at = %s, duration_ms = %s, status = %s, error = %s, details = %s
+            WHERE run_id = %s
+        ''', (datetime.now(), duration_ms, status, error, Json(report) if report else None, run_id))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def resume_job_run(run_id):
+    """Resume an incomplete job run.
+
+    A 'partial' run re-runs only its failed tenants. A run of a RERUNNABLE_JOBS
+    job that failed outright or never finished (e.g. its worker crashed) is
+    re-run in full; the job itself skips tenants that were already processed.
+    The run's status, error and report are updated in place.
+
+    Returns:
+        The new status ('success', 'partial' or 'error')
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('SELECT job_name, scheduled_for, status, duration_ms, details FROM job_runs WHERE run_id = %s', (run_id,))
+        run = cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+    if not run:
+        raise ValueError(f'Job run {run_id} not found')
+    jobs = dict(DAILY_JOBS)
+    job_name = run['job_name']
+    if job_name not in jobs:
+        raise ValueError(f"Job {job_name} cannot be resumed")
+    failed = (run['details'] or {}).get('failed_tenants') or []
+
+    if run['status'] == 'partial' and failed:
+        tenant_ids = [f['tenant_id'] for f in failed]
+        logger.info(f"Resuming job run {run_id} ({job_name}) for {len(tenant_ids)} failed tenant(s)")
+    elif run['status'] in ('error', 'running') and job_name in RERUNNABLE_JOBS:
+        tenant_ids = None
+        logger.info(f"Re-running job run {run_id} ({job_name}) for unprocessed tenants")
+    else:
+        return run['status']
+
+    started = time_module.monotonic()
+    status, error, report = _run_job(job_name, jobs[job_name], scheduled_for=run['scheduled_for'], tenant_ids=tenant_ids)
+    duration_ms = (run['duration_ms'] or 0) + int((time_module.monotonic() - started) * 1000)
+    if report and tenant_ids is not None:
+        # Keep the original run's totals; only the failed list reflects the retry
+        report = dict(run['details'], failed_tenants=report['failed_tenants'],
+                      succeeded=run['details'].get('tenant_count', 0) - len(report['failed_tenants']))
+    _finish_job_run(run_id, duration_ms, status, error, report or run['details'])
+    return status
+
+
+@app.cli.command('resume-job')
+@click.argument('run_id', type=int)
+def resume_job_command(run_id):
+    """Retry the failed tenants of a partial (or crashed) scheduler run."""
+    try:
+        click.echo(f'Job run {run_id}: {resume_job_run(run_id)}')
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+
+def get_recent_job_runs(limit=10):
+    """Return the most recent scheduler runs for metrics reporting."""
+    conn = get_db_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        cursor.execute('''
+            SELECT run_id, job_name, scheduled_for, started_at, finished_at, duration_ms, status, worker,
+                   COALESCE(jsonb_array_length(details->'failed_tenants'), 0) AS failed_tenants
+            FROM job_runs ORDER BY run_id DESC LIMIT %s
+        ''', (limit,))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    runs = []
+    for row in rows:
+        run = dict(row)
+        for key in ('scheduled_for', 'started_at', 'finished_at'):
+            if run.get(key):
+                run[key] = run[key].isoformat()
+        runs.append(run)
+    return runs
+
+
+# Records daily run times in `job_schedule_slots` the first time they are used
+RECORD_SCHEDULE_SLOTS_SQL = '''
+    INSERT INTO job_schedule_slots (slot, first_seen_at)
+    SELECT unnest(%s::text[]), %s
+    ON CONFLICT (slot) DO NOTHING
+'''
+
+
+def record_schedule_slot(cursor, slot):
+    """Note that a tenant now runs its daily jobs at slot (in the caller's transaction)."""
+    cursor.execute(RECORD_SCHEDULE_SLOTS_SQL, ([parse_daily_job_time(slot)], datetime.now()))
+
+
+def get_schedule_slots():
+    """Return {slot: first_seen_at} for the daily run times ('HH:MM') in use, always including the default.
+
+    Slots set without going through the settings API are recorded as first
+    seen now.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT DISTINCT setting_value FROM tenant_settings WHERE setting_key = 'daily_job_time'")
+        slots = {parse_daily_job_time(row[0]) for row in cursor.fetchall()}
+        slots.add(DEFAULT_DAILY_JOB_TIME)
+        cursor.execute(RECORD_SCHEDULE_SLOTS_SQL, (sorted(slots), datetime.now()))
+        cursor.execute('SELECT slot, first_seen_at FROM job_schedule_slots WHERE slot = ANY(%s)', (sorted(slots),))
+        first_seen = dict(cursor.fetchall())
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return {slot: first_seen[slot] for slot in sorted(slots)}
+
+
+def slot_occurrences(slots, start, end):
+    """Return the occurrences of the daily slots between start and end (inclusive), in order."""
+    occurrences = []
+    day = start.date()
+    while day <= end.date():
+        for slot in slots:
+            occurrence = datetime.combine(day, datetime.strptime(slot, '%H:%M').time())
+            if start <= occurrence <= end:
+                occurrences.append(occurrence)
+        day += timedelta(days=1)
+    return occurrences
+
+
+def next_fire_time(slots, now):
+    """Return the first slot occurrence strictly after now."""
+    return min(o for o in slot_occurrences(slots, now, now + timedelta(days=1)) if o > now)
+
+
+def get_due_job_runs(now, slots):
+    """Return (scheduled_for, job_name, job) for every due occurrence without a `job_runs` row.
+
+    Occurrences are looked up as far back as SCHEDULER_CATCHUP_DAYS, but never
+    before the slot was first used (slots maps each slot to that time), so a
+    tenant moving to a new run time does not replay that slot's past days.
+    FIXED_SLOT_JOBS only run at their own slot.
+    """
+    floor = now - timedelta(days=SCHEDULER_CATCHUP_DAYS)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT job_name, scheduled_for FROM job_runs WHERE scheduled_for >= %s', (floor,))
+        recorded = set(cursor.fetchall())
+    finally:
+        cursor.close()
+        conn.close()
+    occurrences = sorted(occurrence
+                         for slot, first_seen in slots.items()
+                         for occurrence in slot_occurrences([slot], max(floor, first_seen), now))
+    return [(scheduled_for, job_name, job)
+            for scheduled_for in occurrences
+            for job_name, job in DAILY_JOBS
+            if FIXED_SLOT_JOBS.get(job_name, scheduled_for.strftime('%H:%M')) == scheduled_for.strftime('%H:%M')
+            and (job_name, scheduled_for) not in recorded]
+
+
 def job_timer():
-    """Background worker that runs the job timer."""
+    """Background worker that runs the job timer.
+
+    Every worker runs this loop, but jobs only fire on the elected leader.
+    Instead of polling for an exact minute, the loop runs every due occurrence
+    that has not been recorded yet (replaying runs missed while no leader was
+    up), then sleeps until the next daily run time.
+    """
     thread_id = threading.current_thread().ident
     thread_name = threading.current_thread().name
     logger.debug(f"Job_timer worker thread started (thread_id={thread_id}, name={thread_name})")
     
     while True:
         try:
-            # Automatic jobs trigger at midnight
-            trigger_hour = 0
-            trigger_minute = 0
-
-            # Get current time in local system timezone
+            slots = get_schedule_slots()
             now = datetime.now()
 
-            jobs_to_trigger = []
-            if now.hour == trigger_hour and now.minute == trigger_minute:
-                jobs_to_trigger.append("cash_out")
-                jobs_to_trigger.append("daily_digest")
-
-            if "cash_out" in jobs_to_trigger:
-                logger.info(f"Triggering automatic daily cash out.")
-                process_daily_cash_out()
-            if "daily_digest" in jobs_to_trigger:
-                logger.info(f"Sending daily digest email.)")
-                send_daily_digest_email()
-            #if not jobs_to_trigger:
-            #    logger.debug(f"No jobs to trigger at {now.strftime('%H:%M')}.")
-            # Sleep for 1 minute and check again
-            time_module.sleep(60)
+            if scheduler_leadership.ensure():
+                for scheduled_for, job_name, job in get_due_job_runs(now, slots):
+                    if now - scheduled_for > timedelta(minutes=1):
+                        logger.warning(f"Replaying missed job {job_name} for {scheduled_for}.")
+                    else:
+                        logger.info(f"Triggering scheduled job {job_name} for {scheduled_for}.")
+                    run_scheduled_job(job_name, scheduled_for, job)
+                now = datetime.now()
+
+            # Sleep until the next run time; wake up at least every
+            # SCHEDULER_MAX_SLEEP seconds to retry leadership and pick up
+            # changed run times
+            next_run = next_fire_time(slots, now)
+            sleep_seconds = min(SCHEDULER_MAX_SLEEP, max(1, (next_run - now).total_seconds() + 1))
+            logger.debug(f"job_timer sleeping {sleep_seconds:.0f}s (next run at {next_run})")
+            time_module.sleep(sleep_seconds)
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Error in job_timer: {error_msg}", exc_info=True)
@@ -3959,6 +6645,9 @@ def job_timer():
 
 def start_job_timer():
     """Start the background thread for automatic daily cash out and daily digest emails."""
+    if not ENABLE_JOB_SCHEDULER:
+        logger.info("job_timer disabled (ENABLE_JOB_SCHEDULER=0)")
+        return
     try:
         thread = threading.Thread(target=job_timer, daemon=True, name="JobTimerWorker")
         thread.start()
@@ -3968,8 +6657,29 @@ def start_job_timer():
 
 ################################
 
-# Start the job timer for automatic daily cash out and daily digest emails
-start_job_timer()
+_background_workers_started = False
+
+
+def start_background_workers():
+    """Start this process's background threads.
+
+    Only serving processes call this (gunicorn's post_worker_init hook in
+    gunicorn.conf.py, or `python app.py`), so importing the app for a
+    `flask --app app ...` command or a benchmark neither claims outbox emails
+    nor competes for scheduler leadership.
+    """
+    global _background_workers_started
+    if _background_workers_started:
+        return
+    _background_workers_started = True
+    # Fork the password hashing processes while this is still the only thread
+    password_hash_pool.start()
+    # Start the job timer for automatic daily cash out and daily digest emails
+    start_job_timer()
+    # Start the senders for queued notification emails
+    start_email_outbox_workers()
+    # Listen for cache invalidations (e.g. revoked refresh tokens) from other processes
+    invalidation_listener.start()
 
 
 if __name__ == '__main__':    
@@ -3993,6 +6703,7 @@ if __name__ == '__main__':
         init_database()
     except Exception as e:
         logger.info(f"Database initialization check failed (this is OK if tables already exist): {e}")
-    
+
+    start_background_workers()
     app.run(host='0.0.0.0', port=8000, debug=False)
 
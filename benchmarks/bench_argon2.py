@@ -0,0 +1,103 @@
+"""
+bench_argon2.py
+
+Measures Argon2 verification cost on this machine for a grid of hash
+parameters, to pick ARGON2_TIME_COST / ARGON2_MEMORY_COST / ARGON2_PARALLELISM
+(and PASSWORD_HASH_WORKERS) for the login worker pool.
+
+For each setting it times --samples sequential verifications (p50/p95 latency)
+and then runs --workers processes verifying concurrently (throughput). The
+recommended setting is the most expensive one (time x memory) whose p95 stays
+within --target-ms. Prints the results as JSON; touches no database.
+
+Usage (inside the app container, on the production hardware):
+    python benchmarks/bench_argon2.py --workers 1 --target-ms 300
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from argon2 import PasswordHasher  # noqa: E402
+
+import password_hashing  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def _verify_many(stored, count):
+    hasher = PasswordHasher()
+    for _ in range(count):
+        hasher.verify(stored, PASSWORD)
+    return count
+
+
+def measure(time_cost, memory_cost, parallelism, samples, workers):
+    stored = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism).hash(PASSWORD)
+    hasher = PasswordHasher()
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.verify(stored, PASSWORD)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    with ProcessPoolExecutor(workers) as pool:
+        list(pool.map(_verify_many, [stored] * workers, [1] * workers))  # warm up
+        started = time.perf_counter()
+        verified = sum(pool.map(_verify_many, [stored] * workers, [samples] * workers))
+        seconds = time.perf_counter() - started
+
+    return {
+        'time_cost': time_cost,
+        'memory_cost_kib': memory_cost,
+        'parallelism': parallelism,
+        'p50_ms': round(statistics.median(latencies), 1),
+        'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1),
+        'verifications_per_second': round(verified / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--time-costs', default='1,2,3,4')
+    parser.add_argument('--memory-costs', default='19456,47104,65536,131072', help='KiB')
+    parser.add_argument('--parallelism', default='1,2,4')
+    parser.add_argument('--samples', type=int, default=10, help='verifications per setting')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('PASSWORD_HASH_WORKERS', 1)) or 1,
+                        help='concurrent verifying processes')
+    parser.add_argument('--target-ms', type=float, default=300, help='p95 latency budget per verification')
+    args = parser.parse_args()
+
+    results = [
+        measure(t, m, p, args.samples, args.workers)
+        for t in map(int, args.time_costs.split(','))
+        for m in map(int, args.memory_costs.split(','))
+        for p in map(int, args.parallelism.split(','))
+    ]
+    within = [r for r in results if r['p95_ms'] <= args.target_ms]
+    recommended = max(within, key=lambda r: (r['time_cost'] * r['memory_cost_kib'], -r['p95_ms']), default=None)
+
+    print(json.dumps({
+        'benchmark': 'argon2_verify',
+        'cpu_count': os.cpu_count(),
+        'workers': args.workers,
+        'target_ms': args.target_ms,
+        'current': {
+            'time_cost': password_hashing.ARGON2_TIME_COST,
+            'memory_cost_kib': password_hashing.ARGON2_MEMORY_COST,
+            'parallelism': password_hashing.ARGON2_PARALLELISM,
+        },
+        'recommended': recommended,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
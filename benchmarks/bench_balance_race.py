@@ -0,0 +1,195 @@
+"""
+bench_balance_race.py
+
+Stress test for concurrent spending of one balance: the previous
+read-check-update flow of /api/redeem-points and /api/withdraw-cash against
+the atomic conditional UPDATE the endpoints use now.
+
+Seeds a throwaway tenant with one user holding a known balance, then has N
+threads hammer it with redemptions (and, in a second round, cash
+withdrawals) that together ask for more than the balance holds. A correct
+implementation grants exactly balance // amount requests, never lets the
+balance go negative and leaves the balance ledger reconciled. Prints the
+results as JSON and deletes the tenant afterwards.
+
+Usage (inside the app container or with POSTGRES_* pointing at a test DB):
+    python benchmarks/bench_balance_race.py --threads 8 --requests 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ENABLE_JOB_SCHEDULER', '0')
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+
+def seed(cursor, points, cash):
+    """Create a benchmark tenant with a single user."""
+    cursor.execute('''
+        INSERT INTO tenants (tenant_name, tenant_password)
+        VALUES ('bench_balance_race_' || md5(random()::text), 'x')
+        RETURNING tenant_id
+    ''')
+    tenant_id = cursor.fetchone()[0]
+    cursor.execute('''
+        INSERT INTO tenant_users (tenant_id, full_name, points_balance, cash_balance)
+        VALUES (%s, 'Race Kid', %s, %s)
+        RETURNING user_id
+    ''', (tenant_id, points, cash))
+    return str(tenant_id), cursor.fetchone()[0]
+
+
+def legacy_redeem(tenant_id, user_id, points):
+    """The read-check-update flow redeem_points used before, on its own connection."""
+    conn = psycopg2.connect(app.DATABASE_URL)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT points_balance FROM tenant_users WHERE user_id = %s AND tenant_id = %s', (user_id, tenant_id))
+        if cursor.fetchone()[0] < points:
+            return False
+        cursor.execute('''
+            INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
+            VALUES (%s, %s, 'bench', %s, 'points_redemption', %s)
+        ''', (tenant_id, user_id, -points, app.get_system_timestamp()))
+        cursor.execute('UPDATE tenant_users SET points_balance = points_balance - %s WHERE user_id = %s AND tenant_id = %s',
+                       (points, user_id, tenant_id))
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def hammer(threads, requests, attempt):
+    """Run attempt() requests times on each of threads threads, all released at once.
+
+    Returns (granted, status_counts, seconds).
+    """
+    barrier = threading.Barrier(threads)
+    lock = threading.Lock()
+    outcomes = {}
+
+    def worker():
+        barrier.wait()
+        for _ in range(requests):
+            outcome = attempt()
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    seconds = time.perf_counter() - started
+    return outcomes, seconds
+
+
+def endpoint_attempt(tenant_id, url, payload):
+    """Return a callable that posts payload to url as the tenant's parent and reports the status code."""
+    headers = {'Authorization': 'Bearer ' + app.create_access_token(tenant_id)}
+    local = threading.local()
+
+    def attempt():
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.app.test_client()
+            with client.session_transaction() as session:
+                session['user_role'] = 'parent'
+        return client.post(url, json=payload, headers=headers).status_code
+
+    return attempt
+
+
+def balances(cursor, tenant_id, user_id):
+    cursor.execute('SELECT points_balance, cash_balance FROM tenant_users WHERE user_id = %s', (user_id,))
+    points, cash = cursor.fetchone()
+    cursor.execute('''
+        SELECT COUNT(*) FILTER (WHERE transaction_type = 'points_redemption'),
+               COUNT(*) FILTER (WHERE transaction_type = 'cash_withdrawal')
+        FROM tenant_transactions WHERE tenant_id = %s
+    ''', (tenant_id,))
+    redemptions, withdrawals = cursor.fetchone()
+    return {'points_balance': points, 'cash_balance': cash, 'redemptions': redemptions, 'withdrawals': withdrawals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+    parser.add_argument('--points', type=int, default=5, help='points per redemption')
+    args = parser.parse_args()
+
+    total = args.threads * args.requests
+    # Enough balance for half of the requests, so they have to compete for it
+    start_points = args.points * (total // 2)
+    start_cash = float(total // 2)
+    expected_grants = total // 2
+
+    conn = psycopg2.connect(app.DATABASE_URL)
+    cursor = conn.cursor()
+    results = {'benchmark': 'balance_race', 'threads': args.threads, 'requests': total,
+               'starting_points': start_points, 'starting_cash': start_cash, 'expected_grants': expected_grants}
+    tenant_ids = []
+    try:
+        # Legacy flow
+        tenant_id, user_id = seed(cursor, start_points, start_cash)
+        tenant_ids.append(tenant_id)
+        conn.commit()
+        outcomes, seconds = hammer(args.threads, args.requests,
+                                   lambda: legacy_redeem(tenant_id, user_id, args.points))
+        final = balances(cursor, tenant_id, user_id)
+        conn.commit()
+        results['legacy_redeem'] = {
+            'granted': outcomes.get(True, 0),
+            'final_points': final['points_balance'],
+            'overspent': final['points_balance'] < 0 or outcomes.get(True, 0) > expected_grants,
+            'seconds': round(seconds, 3),
+        }
+
+        # Current endpoints
+        tenant_id, user_id = seed(cursor, start_points, start_cash)
+        tenant_ids.append(tenant_id)
+        conn.commit()
+        for name, url, payload in (
+            ('redeem_points', '/api/redeem-points', {'user_id': user_id, 'points': args.points, 'redemption_type': 'toy'}),
+            ('withdraw_cash', '/api/withdraw-cash', {'user_id': user_id, 'amount': 1}),
+        ):
+            outcomes, seconds = hammer(args.threads, args.requests, endpoint_attempt(tenant_id, url, payload))
+            results[name] = {
+                'status_codes': {str(k): v for k, v in sorted(outcomes.items())},
+                'granted': outcomes.get(200, 0),
+                'seconds': round(seconds, 3),
+                'requests_per_second': round(total / seconds, 1) if seconds else None,
+            }
+        final = balances(cursor, tenant_id, user_id)
+        report = app.verify_balances(cursor, tenant_id)
+        conn.commit()
+        results['final'] = final
+        results['correct'] = (
+            results['redeem_points']['granted'] == expected_grants == final['redemptions']
+            and results['withdraw_cash']['granted'] == expected_grants == final['withdrawals']
+            and final['points_balance'] == 0 and abs(final['cash_balance']) < 0.005
+            and not report['drift']
+        )
+    finally:
+        conn.rollback()
+        cursor.execute('DELETE FROM tenants WHERE tenant_id = ANY(%s::uuid[])', (tenant_ids,))
+        conn.commit()
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+    return 0 if results.get('correct') else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
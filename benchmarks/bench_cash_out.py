@@ -0,0 +1,144 @@
+"""
+bench_cash_out.py
+
+Benchmarks the daily cash out: the previous per-user UPDATE/INSERT loop
+against the set-based statement in app.cash_out_tenants().
+
+Seeds N tenants x M users inside a single transaction, runs both
+implementations on identical data (rolling back to a savepoint in between),
+checks that they produce the same balances and transactions, prints the
+timings as JSON and finally rolls everything back so the database is left
+untouched.
+
+Usage (inside the app container or with POSTGRES_* pointing at a test DB):
+    python benchmarks/bench_cash_out.py --tenants 1000 --users 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ENABLE_JOB_SCHEDULER', '0')
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+
+
+def seed(cursor, tenants, users):
+    """Create benchmark tenants and users with varied balances and settings."""
+    cursor.execute('''
+        INSERT INTO tenants (tenant_name, tenant_password)
+        SELECT 'bench_cash_out_' || i || '_' || md5(random()::text), 'x'
+        FROM generate_series(1, %s) AS i
+        RETURNING tenant_id
+    ''', (tenants,))
+    tenant_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute('''
+        INSERT INTO tenant_users (tenant_id, full_name, points_balance, cash_balance)
+        SELECT t.tenant_id, 'Kid ' || n, (random() * 40)::int, 0.0
+        FROM unnest(%s::uuid[]) AS t(tenant_id), generate_series(1, %s) AS n
+    ''', (tenant_ids, users))
+    # Every third tenant disables automatic cash out; rollover varies 0-6
+    cursor.execute('''
+        INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
+        SELECT tenant_id, 'automatic_daily_cash_out', CASE WHEN ord %% 3 = 0 THEN '0' ELSE '1' END
+        FROM unnest(%s::uuid[]) WITH ORDINALITY AS t(tenant_id, ord)
+        UNION ALL
+        SELECT tenant_id, 'max_rollover_points', (ord %% 7)::text
+        FROM unnest(%s::uuid[]) WITH ORDINALITY AS t(tenant_id, ord)
+    ''', (tenant_ids, tenant_ids))
+    return tenant_ids
+
+
+def legacy_cash_out(cursor, tenant_ids):
+    """The per-tenant, per-user loop that process_daily_cash_out used before."""
+    for tenant_id in tenant_ids:
+        cursor.execute('SELECT setting_key, setting_value FROM tenant_settings WHERE tenant_id = %s AND setting_key IN (%s, %s)',
+                       (tenant_id, 'automatic_daily_cash_out', 'max_rollover_points'))
+        settings_dict = dict(cursor.fetchall())
+        automatic_cash_out = settings_dict.get('automatic_daily_cash_out', '1') == '1'
+        try:
+            max_rollover = int(settings_dict.get('max_rollover_points', '4'))
+        except (ValueError, TypeError):
+            max_rollover = 4
+
+        cursor.execute('SELECT tenant_id, user_id, points_balance FROM tenant_users WHERE tenant_id = %s', (tenant_id,))
+        for tenant_id_row, user_id, balance in cursor.fetchall():
+            balance = balance or 0
+            if balance <= max_rollover:
+                continue
+            if automatic_cash_out:
+                cash_amount = balance // 5
+                points_to_convert = cash_amount * 5
+                rollover = min(max_rollover, balance % 5)
+                cursor.execute('UPDATE tenant_users SET cash_balance = cash_balance + %s WHERE user_id = %s AND tenant_id = %s',
+                               (cash_amount, user_id, tenant_id_row))
+                cursor.execute('UPDATE tenant_users SET points_balance = %s WHERE user_id = %s AND tenant_id = %s',
+                               (rollover, user_id, tenant_id_row))
+                description = f'Daily cash out: Redeemed {points_to_convert} points for ${cash_amount:.2f}'
+                cursor.execute('''
+                    INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
+                    VALUES (%s, %s, %s, %s, 'points_redemption', %s)
+                ''', (tenant_id_row, user_id, description, -points_to_convert, app.get_system_timestamp()))
+            else:
+                cursor.execute('UPDATE tenant_users SET points_balance = %s WHERE user_id = %s AND tenant_id = %s',
+                               (max_rollover, user_id, tenant_id_row))
+
+
+def snapshot(cursor, tenant_ids):
+    """Return balances and conversion transactions for comparison."""
+    cursor.execute('''
+        SELECT user_id, points_balance, cash_balance FROM tenant_users
+        WHERE tenant_id = ANY(%s::uuid[]) ORDER BY user_id
+    ''', (tenant_ids,))
+    balances = cursor.fetchall()
+    cursor.execute('''
+        SELECT user_id, description, value FROM tenant_transactions
+        WHERE tenant_id = ANY(%s::uuid[]) ORDER BY user_id
+    ''', (tenant_ids,))
+    return balances, cursor.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=4, help='users per tenant')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(app.DATABASE_URL)
+    cursor = conn.cursor()
+    try:
+        tenant_ids = [str(t) for t in seed(cursor, args.tenants, args.users)]
+        cursor.execute('SAVEPOINT seeded')
+
+        started = time.perf_counter()
+        legacy_cash_out(cursor, tenant_ids)
+        legacy_seconds = time.perf_counter() - started
+        legacy_result = snapshot(cursor, tenant_ids)
+        cursor.execute('ROLLBACK TO SAVEPOINT seeded')
+
+        started = time.perf_counter()
+        app.cash_out_tenants(cursor, tenant_ids)
+        bulk_seconds = time.perf_counter() - started
+        bulk_result = snapshot(cursor, tenant_ids)
+
+        print(json.dumps({
+            'benchmark': 'daily_cash_out',
+            'tenants': args.tenants,
+            'users_per_tenant': args.users,
+            'legacy_seconds': round(legacy_seconds, 4),
+            'bulk_seconds': round(bulk_seconds, 4),
+            'speedup': round(legacy_seconds / bulk_seconds, 1) if bulk_seconds else None,
+            'results_match': legacy_result == bulk_result,
+        }, indent=2))
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
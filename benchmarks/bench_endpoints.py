@@ -0,0 +1,236 @@
+"""
+bench_endpoints.py
+
+Load test of the hot API endpoints and the daily jobs, for catching
+performance regressions between releases.
+
+Seeds --tenants families with --users kids, --chores chores and
+--transactions transactions per kid (dated yesterday, so they show up in
+the digest), then starts the app under gunicorn (gunicorn.conf.py) and drives
+each endpoint in turn with --concurrency closed-loop clients for --duration
+seconds:
+
+    record_chore      POST /api/record-chore
+    transactions      GET  /api/transactions
+    users             GET  /api/users
+    chores            GET  /api/chores
+    settings          GET  /api/settings
+    auth_login        POST /api/auth/login
+    tenant_login      POST /api/tenant-login
+
+Every client works on its own tenant (round robin). Logins run with
+--login-concurrency clients, since each one costs a full Argon2
+verification; the per-IP login limit is disabled for the run. Afterwards
+process_daily_cash_out and send_daily_digest_email run in-process over all
+seeded tenants, the digest against a local SMTP sink. Prints throughput and
+latency percentiles per endpoint and job timings as JSON, and deletes the
+seeded tenants afterwards.
+
+Usage (inside the app container or with POSTGRES_* pointing at a test DB):
+    python benchmarks/bench_endpoints.py --tenants 100 --users 4 --transactions 50 --concurrency 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ENABLE_JOB_SCHEDULER', '0')
+os.environ.setdefault('EMAIL_OUTBOX_WORKERS', '0')
+# The digest goes to the local SMTP sink, which has no STARTTLS (read when app is imported)
+os.environ['SMTP_STARTTLS'] = '0'
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+from benchmarks.bench_worker_modes import parent_headers  # noqa: E402
+from benchmarks.http_load import Client, run_load, start_gunicorn, stop_gunicorn  # noqa: E402
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+from password_hashing import hash_password  # noqa: E402
+
+ENDPOINTS = ['record_chore', 'transactions', 'users', 'chores', 'settings', 'auth_login', 'tenant_login']
+LOGIN_ENDPOINTS = {'auth_login', 'tenant_login'}
+PASSWORD = 'bench-password'
+
+
+def seed(cursor, tenants, users, chores, transactions, day_start):
+    """Create benchmark tenants with kids, chores, yesterday's transactions and digest settings.
+
+    Returns:
+        [(tenant_id, tenant_name, [user_ids], [chore_ids])]
+    """
+    prefix = 'bench_endpoints_' + os.urandom(4).hex() + '_'
+    cursor.execute('''
+        INSERT INTO tenants (tenant_name, tenant_password)
+        SELECT %s || i, %s FROM generate_series(1, %s) AS i
+        RETURNING tenant_id, tenant_name
+    ''', (prefix, hash_password(PASSWORD), tenants))
+    tenant_rows = cursor.fetchall()
+    tenant_ids = [str(tenant_id) for tenant_id, _ in tenant_rows]
+    cursor.execute('''
+        INSERT INTO tenant_users (tenant_id, full_name, points_balance, cash_balance)
+        SELECT t.tenant_id, 'Kid ' || n, (random() * 40)::int, 0.0
+        FROM unnest(%s::uuid[]) AS t(tenant_id), generate_series(1, %s) AS n
+    ''', (tenant_ids, users))
+    cursor.execute('''
+        INSERT INTO tenant_chores (tenant_id, chore, point_value)
+        SELECT t.tenant_id, 'Chore ' || n, 1 + n %% 5
+        FROM unnest(%s::uuid[]) AS t(tenant_id), generate_series(1, %s) AS n
+    ''', (tenant_ids, chores))
+    # K transactions per kid spread over yesterday
+    cursor.execute('''
+        INSERT INTO tenant_transactions (tenant_id, user_id, description, value, transaction_type, timestamp)
+        SELECT u.tenant_id, u.user_id, 'Chore ' || (1 + n %% 5), 1 + n %% 5, 'chore_completed',
+               %s::timestamp + (n * interval '1 second' * 86399 / %s)
+        FROM tenant_users u, generate_series(1, %s) AS n
+        WHERE u.tenant_id = ANY(%s::uuid[])
+    ''', (day_start, transactions, transactions, tenant_ids))
+    cursor.execute('''
+        INSERT INTO tenant_settings (tenant_id, setting_key, setting_value)
+        SELECT tenant_id, 'email_notify_daily_digest', '1' FROM unnest(%s::uuid[]) AS t(tenant_id)
+        UNION ALL
+        SELECT tenant_id, 'parent_email_addresses', 'bench@example.com' FROM unnest(%s::uuid[]) AS t(tenant_id)
+    ''', (tenant_ids, tenant_ids))
+
+    cursor.execute('SELECT tenant_id, user_id FROM tenant_users WHERE tenant_id = ANY(%s::uuid[])', (tenant_ids,))
+    tenant_users = {}
+    for tenant_id, user_id in cursor.fetchall():
+        tenant_users.setdefault(str(tenant_id), []).append(user_id)
+    cursor.execute('SELECT tenant_id, chore_id FROM tenant_chores WHERE tenant_id = ANY(%s::uuid[])', (tenant_ids,))
+    tenant_chores = {}
+    for tenant_id, chore_id in cursor.fetchall():
+        tenant_chores.setdefault(str(tenant_id), []).append(chore_id)
+    return [(str(tenant_id), name, tenant_users[str(tenant_id)], tenant_chores[str(tenant_id)])
+            for tenant_id, name in tenant_rows]
+
+
+def make_step(endpoint):
+    """Return step(client, n) for run_load; clients carry their tenant in client.tenant."""
+    def step(client, n):
+        tenant_id, tenant_name, user_ids, chore_ids = client.tenant
+        if endpoint == 'record_chore':
+            status, _ = client.request('POST', '/api/record-chore', {
+                'user_id': user_ids[n % len(user_ids)], 'chore_id': chore_ids[n % len(chore_ids)], 'points': 1,
+            })
+        elif endpoint == 'transactions':
+            status, _ = client.request('GET', '/api/transactions')
+        elif endpoint == 'auth_login':
+            status, _ = client.request('POST', '/api/auth/login', {'tenant_name': tenant_name, 'password': PASSWORD})
+        elif endpoint == 'tenant_login':
+            status, _ = client.request('POST', '/api/tenant-login', {'tenant': tenant_name, 'password': PASSWORD})
+        else:
+            status, _ = client.request('GET', '/api/' + endpoint)
+        return endpoint, status
+    return step
+
+
+def time_job(run):
+    started = time.perf_counter()
+    report = run()
+    return time.perf_counter() - started, report or {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=100)
+    parser.add_argument('--users', type=int, default=4, help='kids per tenant')
+    parser.add_argument('--chores', type=int, default=20, help='chores per tenant')
+    parser.add_argument('--transactions', type=int, default=50, help='transactions per kid')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, default=8, help='clients per endpoint')
+    parser.add_argument('--login-concurrency', type=int, default=2, help='clients per login endpoint')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--worker-class', default='sync', help='sync or gevent')
+    parser.add_argument('--port', type=int, default=8060)
+    parser.add_argument('--skip-jobs', action='store_true', help='only run the HTTP load')
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(',') if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+    digest_date = (datetime.now() - timedelta(days=1)).date()
+    conn = psycopg2.connect(app.DATABASE_URL)
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    tenants = seed(cursor, args.tenants, args.users, args.chores, args.transactions,
+                   datetime.combine(digest_date, datetime.min.time()))
+    conn.commit()
+    seed_seconds = time.perf_counter() - started
+    tenant_ids = [tenant[0] for tenant in tenants]
+    sink = SMTPSink().start()
+
+    results = {
+        'benchmark': 'endpoints',
+        'tenants': args.tenants,
+        'users_per_tenant': args.users,
+        'chores_per_tenant': args.chores,
+        'transactions_per_user': args.transactions,
+        'seed_seconds': round(seed_seconds, 2),
+        'concurrency': args.concurrency,
+        'login_concurrency': args.login_concurrency,
+        'duration_seconds': args.duration,
+        'workers': args.workers,
+        'worker_class': args.worker_class,
+        'cpu_count': os.cpu_count(),
+        'endpoints': {},
+        'jobs': {},
+    }
+    try:
+        base_url = f'http://127.0.0.1:{args.port}'
+        headers = {tenant[0]: parent_headers(tenant[0]) for tenant in tenants}
+        next_tenant = iter(range(10 ** 9))
+
+        def make_client():
+            tenant = tenants[next(next_tenant) % len(tenants)]
+            client = Client(base_url, headers[tenant[0]])
+            client.tenant = tenant
+            return client
+
+        if endpoints:
+            server = start_gunicorn(args.port, dict(sink.env(), LOGIN_ATTEMPTS_PER_IP='0'),
+                                    worker_class=args.worker_class, workers=args.workers)
+            try:
+                for endpoint in endpoints:
+                    clients = args.login_concurrency if endpoint in LOGIN_ENDPOINTS else args.concurrency
+                    report = run_load([(clients, make_client, make_step(endpoint))], args.duration)
+                    report[endpoint]['clients'] = clients
+                    results['endpoints'][endpoint] = report[endpoint]
+            finally:
+                stop_gunicorn(server)
+
+        if not args.skip_jobs:
+            os.environ.update(sink.env())
+            seconds, report = time_job(lambda: app.process_daily_cash_out(tenant_ids=tenant_ids))
+            results['jobs']['daily_cash_out'] = {
+                'seconds': round(seconds, 3),
+                'tenants_per_second': round(args.tenants / seconds, 1),
+                'users_processed': report.get('processed'),
+                'failed_tenants': len(report.get('failed_tenants', [])),
+            }
+            sent_before = sink.messages
+            seconds, report = time_job(lambda: app.send_daily_digest_email(tenant_ids=tenant_ids, digest_date=digest_date))
+            results['jobs']['daily_digest'] = {
+                'seconds': round(seconds, 3),
+                'tenants_per_second': round(args.tenants / seconds, 1),
+                'digests_sent': report.get('processed'),
+                'smtp_messages': sink.messages - sent_before,
+                'failed_tenants': len(report.get('failed_tenants', [])),
+            }
+            results['jobs']['midnight_job_concurrency'] = app.MIDNIGHT_JOB_CONCURRENCY
+    finally:
+        sink.stop()
+        cursor.execute('DELETE FROM tenants WHERE tenant_id = ANY(%s::uuid[])', (tenant_ids,))
+        conn.commit()
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+bench_worker_modes.py
+
+Compares concurrent-request capacity of the sync and gevent gunicorn worker
+classes (GUNICORN_WORKER_CLASS in gunicorn.conf.py).
+
+Starts the app under gunicorn once per mode with the same number of worker
+processes, pointed at a local SMTP sink that takes --smtp-delay seconds per
+message (a slow mail provider). Some clients keep sending test emails while
+the others read /api/chores and /api/users; with sync workers every pending
+email occupies a whole worker, so the readers queue behind them. Prints
+throughput and latency percentiles per endpoint and mode as JSON. Seeds a
+throwaway tenant and deletes it afterwards.
+
+Usage (inside the app container or with POSTGRES_* pointing at a test DB):
+    python benchmarks/bench_worker_modes.py --workers 4 --email-clients 8 --read-clients 16
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ENABLE_JOB_SCHEDULER', '0')
+os.environ.setdefault('EMAIL_OUTBOX_WORKERS', '0')
+
+import psycopg2  # noqa: E402
+
+import app  # noqa: E402
+from benchmarks.http_load import Client, run_load, start_gunicorn, stop_gunicorn  # noqa: E402
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+
+
+def seed(cursor, users, chores):
+    """Create a benchmark tenant with some users and chores."""
+    cursor.execute('''
+        INSERT INTO tenants (tenant_name, tenant_password)
+        VALUES ('bench_worker_modes_' || md5(random()::text), 'x')
+        RETURNING tenant_id
+    ''')
+    tenant_id = cursor.fetchone()[0]
+    cursor.execute('''
+        INSERT INTO tenant_users (tenant_id, full_name, points_balance, cash_balance)
+        SELECT %s, 'Kid ' || n, n, 0 FROM generate_series(1, %s) AS n
+    ''', (tenant_id, users))
+    cursor.execute('''
+        INSERT INTO tenant_chores (tenant_id, chore, point_value)
+        SELECT %s, 'Chore ' || n, 1 + n %% 5 FROM generate_series(1, %s) AS n
+    ''', (tenant_id, chores))
+    return str(tenant_id)
+
+
+def parent_headers(tenant_id):
+    """Bearer token plus a signed session cookie with the parent role."""
+    serializer = app.app.session_interface.get_signing_serializer(app.app)
+    session_cookie = serializer.dumps({'user_role': 'parent'})
+    return {
+        'Authorization': 'Bearer ' + app.create_access_token(tenant_id),
+        'Cookie': f"{app.app.config['SESSION_COOKIE_NAME']}={session_cookie}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--worker-connections', type=int, default=100)
+    parser.add_argument('--email-clients', type=int, default=8)
+    parser.add_argument('--read-clients', type=int, default=16)
+    parser.add_argument('--smtp-delay', type=float, default=1.0, help='seconds the SMTP sink takes per message')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(app.DATABASE_URL)
+    cursor = conn.cursor()
+    tenant_id = seed(cursor, users=4, chores=20)
+    conn.commit()
+    sink = SMTPSink(delay=args.smtp_delay).start()
+    base_url = f'http://127.0.0.1:{args.port}'
+    headers = parent_headers(tenant_id)
+
+    def make_client():
+        return Client(base_url, headers)
+
+    def send_email(client, n):
+        status, _ = client.request('POST', '/api/send-test-email', {'parent_email_addresses': ['bench@example.com']})
+        return 'send_test_email', status
+
+    def read(client, n):
+        path = '/api/chores' if n % 2 == 0 else '/api/users'
+        status, _ = client.request('GET', path)
+        return path.rsplit('/', 1)[1], status
+
+    results = {
+        'benchmark': 'worker_modes',
+        'workers': args.workers,
+        'worker_connections': args.worker_connections,
+        'email_clients': args.email_clients,
+        'read_clients': args.read_clients,
+        'smtp_delay_seconds': args.smtp_delay,
+        'duration_seconds': args.duration,
+        'cpu_count': os.cpu_count(),
+        'modes': {},
+    }
+    try:
+        for mode in args.modes.split(','):
+            server = start_gunicorn(args.port, sink.env(), worker_class=mode, workers=args.workers,
+                                    worker_connections=args.worker_connections)
+            try:
+                sent_before = sink.messages
+                report = run_load([
+                    (args.email_clients, make_client, send_email),
+                    (args.read_clients, make_client, read),
+                ], args.duration)
+                report['smtp_messages'] = sink.messages - sent_before
+                results['modes'][mode] = report
+            finally:
+                stop_gunicorn(server)
+    finally:
+        sink.stop()
+        cursor.execute('DELETE FROM tenants WHERE tenant_id = %s', (tenant_id,))
+        conn.commit()
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+http_load.py
+
+Small closed-loop HTTP load generator shared by the benchmarks: N client
+threads each send one request at a time over a keep-alive connection for a
+fixed duration, and latencies are summarized per endpoint. Standard library
+only, so it runs anywhere the app does.
+"""
+
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Client:
+    """One keep-alive HTTP connection with default headers."""
+
+    def __init__(self, base_url, headers=None, timeout=60):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self._conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and return (status, body bytes); status 0 on connection errors."""
+        payload = None
+        merged = dict(self.headers, **(headers or {}))
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            merged['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=payload, headers=merged)
+                response = self._conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                # Stale keep-alive connection (or server gone): retry once on a new one
+                self.close()
+                if attempt:
+                    return 0, b''
+        return 0, b''
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(samples, seconds):
+    """Summarize [(status, latency_seconds)] into throughput and latency percentiles (ms)."""
+    latencies = sorted(latency for _, latency in samples)
+    statuses = {}
+    for status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'requests': len(samples),
+        'requests_per_second': round(len(samples) / seconds, 1) if seconds else None,
+        'status_codes': statuses,
+        'errors': sum(1 for status, _ in samples if status == 0 or status >= 500),
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def run_load(workloads, duration):
+    """Run closed-loop clients for `duration` seconds.
+
+    Args:
+        workloads: list of (clients, make_client, step) tuples. make_client()
+            returns a Client; step(client, n) sends the n-th request of that
+            client and returns (endpoint_name, status).
+
+    Returns:
+        {endpoint_name: summary} plus '_total'
+    """
+    lock = threading.Lock()
+    samples = {}
+    barrier = threading.Barrier(sum(clients for clients, _, _ in workloads) + 1)
+    deadline = [None]
+
+    def worker(make_client, step):
+        client = make_client()
+        barrier.wait()
+        n = 0
+        try:
+            while time.perf_counter() < deadline[0]:
+                started = time.perf_counter()
+                name, status = step(client, n)
+                latency = time.perf_counter() - started
+                with lock:
+                    samples.setdefault(name, []).append((status, latency))
+                n += 1
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=worker, args=(make_client, step), daemon=True)
+               for clients, make_client, step in workloads for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    report = {name: summarize(endpoint_samples, seconds) for name, endpoint_samples in sorted(samples.items())}
+    report['_total'] = summarize([s for endpoint_samples in samples.values() for s in endpoint_samples], seconds)
+    return report
+
+
+def start_gunicorn(port, env, worker_class='sync', workers=4, worker_connections=100, timeout=60):
+    """Start the app under gunicorn (gunicorn.conf.py) and wait until it answers.
+
+    Returns the Popen; stop it with stop_gunicorn().
+    """
+    full_env = dict(os.environ, **env)
+    full_env.update({
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_WORKER_CONNECTIONS': str(worker_connections),
+    })
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'],
+        cwd=REPO_DIR, env=full_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    client = Client(f'http://127.0.0.1:{port}', timeout=5)
+    give_up = time.monotonic() + timeout
+    while time.monotonic() < give_up:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {process.returncode}')
+        status, _ = client.request('GET', '/api/version')
+        if status == 200:
+            client.close()
+            return process
+        time.sleep(0.5)
+    stop_gunicorn(process)
+    raise RuntimeError(f'gunicorn did not start within {timeout}s')
+
+
+def stop_gunicorn(process):
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
@@ -0,0 +1,94 @@
+"""
+smtp_sink.py
+
+Minimal local SMTP server for benchmarks: accepts AUTH PLAIN/LOGIN with any
+credentials, counts messages and discards them. An optional per-message delay
+simulates a slow mail provider. No STARTTLS, so run the app with
+SMTP_STARTTLS=0.
+
+    sink = SMTPSink(delay=1.0).start()
+    ... SMTP_SERVER=127.0.0.1 SMTP_PORT=sink.port ...
+    sink.stop()
+"""
+
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply('220 smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-smtp-sink')
+                self.reply('250-AUTH PLAIN LOGIN')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'AUTH':
+                if command.upper().startswith('AUTH LOGIN'):
+                    self.reply('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                self.reply('235 Authentication successful')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                if sink.delay:
+                    time.sleep(sink.delay)
+                with sink.lock:
+                    sink.messages += 1
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply('250 OK')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Threaded SMTP sink on 127.0.0.1; `messages` counts accepted messages."""
+
+    def __init__(self, delay=0.0, port=0):
+        self.delay = delay
+        self.messages = 0
+        self.lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', port), _Handler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True, name='SMTPSink').start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def env(self):
+        """Environment variables pointing the app at this sink."""
+        return {
+            'SMTP_SERVER': '127.0.0.1',
+            'SMTP_PORT': str(self.port),
+            'SMTP_USERNAME': 'bench@example.com',
+            'SMTP_PASSWORD': 'bench',
+            'SMTP_STARTTLS': '0',
+        }
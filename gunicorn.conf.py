@@ -0,0 +1,51 @@
+"""
+gunicorn.conf.py
+
+gunicorn settings for the container, configured through environment
+variables.
+
+With the default sync workers every request occupies a whole worker
+process until it finishes, including time spent waiting on PostgreSQL or
+an SMTP server. GUNICORN_WORKER_CLASS=gevent serves up to
+GUNICORN_WORKER_CONNECTIONS requests per worker concurrently on greenlets;
+app.py makes psycopg2 cooperative when it detects the gevent worker.
+Concurrent database work per worker is still capped by DB_POOL_MAX, so
+raise it together with the worker connections.
+
+Before any worker starts, the master creates missing tables and applies
+pending migrations (init_db.init_database(), which runs migrations.py under
+an advisory lock), so a container started from a newer image upgrades the
+schema before serving requests. Set INIT_DATABASE_ON_START=0 when
+migrations are run as a separate deployment step.
+
+Each worker forks its password hashing processes and then starts the app's
+background threads (job scheduler, email outbox senders, cache invalidation
+listener) once it has loaded the app; importing app.py elsewhere, e.g. for
+`flask --app app` commands, does neither.
+
+Usage:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+accesslog = '-'
+errorlog = '-'
+init_database_on_start = os.environ.get('INIT_DATABASE_ON_START', '1') == '1'
+
+
+def on_starting(server):
+    # Fail the start rather than serve against an outdated schema
+    if init_database_on_start:
+        from init_db import init_database
+        init_database()
+
+
+def post_worker_init(worker):
+    import app
+    app.start_background_workers()
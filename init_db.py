@@ -2,8 +2,9 @@
 init_db.py
 
 Creates the original database schema (tables) used by the application.
-This file intentionally contains only the original schema creation SQL
-and does not include migration logic.
+This file intentionally contains only the original schema creation SQL;
+versioned changes such as indexes live in migrations.py, which
+init_database() applies after creating the tables.
 """
 
 import os
@@ -245,6 +246,83 @@ def create_tenant_invites_table(cursor):
     """)
 
 
+def create_job_runs_table(cursor):
+    """Create the `job_runs` table used by the background job scheduler.
+
+    Each scheduled job occurrence is claimed by inserting a row keyed by
+    (job_name, scheduled_for); the unique constraint guarantees a job fires
+    once per occurrence no matter how many workers or containers are running.
+    The row also records start/end time and duration of the run, and in
+    `details` the shard report (including failed tenants) of sharded jobs.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            run_id SERIAL PRIMARY KEY,
+            job_name VARCHAR(100) NOT NULL,
+            scheduled_for TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER,
+            status VARCHAR(20) NOT NULL DEFAULT 'running',
+            error TEXT,
+            worker VARCHAR(255),
+            details JSONB,
+            UNIQUE (job_name, scheduled_for)
+        )
+    """)
+    cursor.execute("ALTER TABLE job_runs ADD COLUMN IF NOT EXISTS details JSONB")
+
+
+def create_cash_out_runs_table(cursor):
+    """Create the `cash_out_runs` ledger of completed daily cash outs.
+
+    One row per (run_date, tenant_id), inserted in the same transaction that
+    converts the tenant's balances, so a tenant can never be cashed out twice
+    for the same day and a rerun only touches tenants without a row.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS cash_out_runs (
+            run_date DATE NOT NULL,
+            tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            trigger_type VARCHAR(20),
+            user_count INTEGER,
+            converted_count INTEGER,
+            PRIMARY KEY (run_date, tenant_id)
+        )
+    """)
+
+
+def create_email_outbox_table(cursor):
+    """Create the `email_outbox` table of queued outbound emails.
+
+    Request handlers insert a row in the same transaction as the event being
+    notified; background workers claim due rows with FOR UPDATE SKIP LOCKED,
+    send them and retry failures with exponential backoff. `recipients` is
+    filled in when only some recipients of a send failed.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            outbox_id BIGSERIAL PRIMARY KEY,
+            tenant_id UUID REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            kind VARCHAR(50) NOT NULL,
+            payload JSONB NOT NULL,
+            recipients TEXT[],
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            claimed_at TIMESTAMP,
+            sent_at TIMESTAMP,
+            last_error TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_email_outbox_due
+        ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'sending')
+    """)
+
+
 def create_default_admin_if_missing(cursor):
     """Inserts the first tenant. This also migrates any existing
     global data into the new tenant-scoped tables and associates it to that tenant.
@@ -655,6 +733,8 @@ def create_initial_tables(cursor):
         """)
 
 def init_database():
+    from migrations import run_migrations, check_query_plans
+
     conn = psycopg2.connect(DATABASE_URL)
     try:
         cursor = conn.cursor()
@@ -671,6 +751,9 @@ def init_database():
         create_tenant_transactions_table(cursor)
         create_tenant_roles_table(cursor)
         create_tenant_invites_table(cursor)
+        create_job_runs_table(cursor)
+        create_cash_out_runs_table(cursor)
+        create_email_outbox_table(cursor)
 
         # Ensure email verification columns exist on tenants for older databases
         ensure_tenant_email_columns(cursor)
@@ -687,9 +770,12 @@ def init_database():
         # Drop legacy tables after migration
         drop_legacy_tables(cursor)
 
-
-
         conn.commit()
+
+        # Apply versioned migrations (indexes etc.) on top of the base schema
+        run_migrations(conn)
+        for failure in check_query_plans(conn):
+            print(f"Warning: hot query {failure['query']} uses a seq scan on {', '.join(failure['seq_scans'])}")
     finally:
         conn.close()
 
@@ -0,0 +1,555 @@
+"""
+migrations.py
+
+Versioned schema migrations applied on top of the base schema created by
+init_db.py, plus EXPLAIN-based checks that the hot tenant-scoped queries are
+served by an index.
+
+Each migration runs in its own transaction together with the insert of its
+row in `schema_migrations`, so a migration is either fully applied and
+recorded or not applied at all. A session advisory lock serializes
+concurrent runners (e.g. several containers starting at once).
+
+Usage:
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied and pending migrations
+    python migrations.py --check    # EXPLAIN hot queries, exit 1 on seq scans
+"""
+
+import argparse
+import json
+import sys
+
+import psycopg2
+
+from init_db import DATABASE_URL
+
+# Advisory lock key held while migrations run (distinct from the scheduler's)
+MIGRATION_LOCK_KEY = 7243015
+
+# Placeholder parameters for EXPLAIN; plan shape does not depend on the values
+_SAMPLE_TENANT_ID = '00000000-0000-0000-0000-000000000000'
+
+
+def _migration_001_hot_query_indexes(cursor):
+    """Indexes for the tenant-scoped hot queries."""
+    # Newest-first listing and keyset pagination of /api/transactions
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tenant_transactions_tenant_timestamp
+        ON tenant_transactions (tenant_id, timestamp DESC, transaction_id DESC)
+    """)
+    # Per-user history, balance checks and user deletion
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tenant_transactions_tenant_user
+        ON tenant_transactions (tenant_id, user_id, timestamp DESC, transaction_id DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tenant_users_tenant_user
+        ON tenant_users (tenant_id, user_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tenant_chores_tenant_chore
+        ON tenant_chores (tenant_id, chore_id)
+    """)
+    # Refresh token validation looks tokens up by hash; a hash identifies
+    # exactly one token, so drop any duplicate rows (keeping the newest)
+    # before enforcing it
+    cursor.execute("""
+        DELETE FROM refresh_tokens r
+        USING refresh_tokens newer
+        WHERE r.token_hash = newer.token_hash AND r.id < newer.id
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_tokens_token_hash
+        ON refresh_tokens (token_hash)
+    """)
+    # Login and signup match tenant names case-insensitively
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tenants_lower_tenant_name
+        ON tenants (LOWER(tenant_name))
+    """)
+
+
+def _migration_002_tenant_config_versions(cursor):
+    """Per-tenant version stamp of settings and roles, bumped on every change."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tenant_config_versions (
+            tenant_id UUID PRIMARY KEY REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _migration_003_balance_ledger(cursor):
+    """Append-only ledger of every points/cash balance change.
+
+    `tenant_users.points_balance` and `cash_balance` stay the O(1) balance
+    snapshots; a trigger appends one entry per change to them, tagged with
+    the reason the application set for the current transaction (see
+    app.set_balance_reason).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            entry_id BIGSERIAL PRIMARY KEY,
+            tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL REFERENCES tenant_users(user_id) ON DELETE CASCADE,
+            reason VARCHAR(50) NOT NULL,
+            points_delta INTEGER NOT NULL DEFAULT 0,
+            cash_delta DOUBLE PRECISION NOT NULL DEFAULT 0,
+            points_balance INTEGER NOT NULL DEFAULT 0,
+            cash_balance DOUBLE PRECISION NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_balance_ledger_tenant_user
+        ON balance_ledger (tenant_id, user_id, entry_id)
+    """)
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION record_balance_change() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO balance_ledger (tenant_id, user_id, reason, points_delta, cash_delta, points_balance, cash_balance)
+            VALUES (
+                NEW.tenant_id, NEW.user_id,
+                COALESCE(NULLIF(current_setting('familychores.balance_reason', true), ''),
+                         CASE TG_OP WHEN 'INSERT' THEN 'opening' ELSE 'adjustment' END),
+                COALESCE(NEW.points_balance, 0) - CASE TG_OP WHEN 'INSERT' THEN 0 ELSE COALESCE(OLD.points_balance, 0) END,
+                COALESCE(NEW.cash_balance, 0) - CASE TG_OP WHEN 'INSERT' THEN 0 ELSE COALESCE(OLD.cash_balance, 0) END,
+                COALESCE(NEW.points_balance, 0),
+                COALESCE(NEW.cash_balance, 0)
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute('DROP TRIGGER IF EXISTS tenant_users_balance_ledger_insert ON tenant_users')
+    cursor.execute("""
+        CREATE TRIGGER tenant_users_balance_ledger_insert
+        AFTER INSERT ON tenant_users
+        FOR EACH ROW EXECUTE FUNCTION record_balance_change()
+    """)
+    cursor.execute('DROP TRIGGER IF EXISTS tenant_users_balance_ledger_update ON tenant_users')
+    cursor.execute("""
+        CREATE TRIGGER tenant_users_balance_ledger_update
+        AFTER UPDATE OF points_balance, cash_balance ON tenant_users
+        FOR EACH ROW
+        WHEN (OLD.points_balance IS DISTINCT FROM NEW.points_balance
+              OR OLD.cash_balance IS DISTINCT FROM NEW.cash_balance)
+        EXECUTE FUNCTION record_balance_change()
+    """)
+    # Entries are never rewritten; they only go away with their user or tenant
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION reject_balance_ledger_update() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'balance_ledger is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    cursor.execute('DROP TRIGGER IF EXISTS balance_ledger_append_only ON balance_ledger')
+    cursor.execute("""
+        CREATE TRIGGER balance_ledger_append_only
+        BEFORE UPDATE ON balance_ledger
+        FOR EACH ROW EXECUTE FUNCTION reject_balance_ledger_update()
+    """)
+    # Seed each existing user with the chore points and withdrawals already in
+    # their history plus an opening entry for the remainder, so both the
+    # snapshots and the transaction history reconcile from the start
+    cursor.execute("""
+        WITH history AS (
+            SELECT user_id,
+                   COALESCE(SUM(value) FILTER (WHERE transaction_type = 'chore_completed'), 0)::integer AS chore_points,
+                   COALESCE(SUM(value) FILTER (WHERE transaction_type = 'cash_withdrawal'), 0) AS withdrawn_cash
+            FROM tenant_transactions
+            GROUP BY user_id
+        ),
+        balances AS (
+            SELECT u.tenant_id, u.user_id,
+                   COALESCE(u.points_balance, 0) AS points, COALESCE(u.cash_balance, 0) AS cash,
+                   COALESCE(h.chore_points, 0) AS chore_points, COALESCE(h.withdrawn_cash, 0) AS withdrawn_cash
+            FROM tenant_users u
+            LEFT JOIN history h ON h.user_id = u.user_id
+            WHERE NOT EXISTS (SELECT 1 FROM balance_ledger l WHERE l.user_id = u.user_id)
+        )
+        INSERT INTO balance_ledger (tenant_id, user_id, reason, points_delta, cash_delta, points_balance, cash_balance)
+        SELECT b.tenant_id, b.user_id, e.reason, e.points_delta, e.cash_delta, e.points_balance, e.cash_balance
+        FROM balances b
+        CROSS JOIN LATERAL (VALUES
+            (1, 'opening', b.points - b.chore_points, b.cash - b.withdrawn_cash, b.points - b.chore_points, b.cash - b.withdrawn_cash),
+            (2, 'chore_completed', b.chore_points, 0, b.points, b.cash - b.withdrawn_cash),
+            (3, 'cash_withdrawal', 0, b.withdrawn_cash, b.points, b.cash)
+        ) AS e(ord, reason, points_delta, cash_delta, points_balance, cash_balance)
+        WHERE e.ord = 1 OR e.points_delta <> 0 OR e.cash_delta <> 0
+        ORDER BY b.user_id, e.ord
+    """)
+
+
+def _migration_004_idempotency_keys(cursor):
+    """Results of mutating requests sent with an Idempotency-Key header."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            idempotency_key VARCHAR(255) NOT NULL,
+            request_hash CHAR(64) NOT NULL,
+            status_code SMALLINT,
+            response_body TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (tenant_id, idempotency_key)
+        )
+    """)
+    # Expired keys are purged in created_at order
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at
+        ON idempotency_keys (created_at)
+    """)
+
+
+def _migration_005_refresh_token_partitions(cursor):
+    """Range-partition `refresh_tokens` by month of `expires_at`.
+
+    A partition whose month has passed only holds expired tokens, so the
+    compaction job (app.compact_refresh_tokens) drops it whole instead of
+    deleting row by row. A unique index on a partitioned table has to include
+    the partition key, so `token_hash` gets a plain index; hashes of 512-bit
+    random tokens do not collide. Only live tokens are carried over.
+    """
+    cursor.execute('ALTER TABLE refresh_tokens RENAME TO refresh_tokens_unpartitioned')
+    cursor.execute('ALTER TABLE refresh_tokens_unpartitioned RENAME CONSTRAINT refresh_tokens_pkey TO refresh_tokens_unpartitioned_pkey')
+    cursor.execute('ALTER SEQUENCE refresh_tokens_id_seq OWNED BY NONE')
+    cursor.execute("""
+        CREATE TABLE refresh_tokens (
+            id INTEGER NOT NULL DEFAULT nextval('refresh_tokens_id_seq'),
+            tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            token_hash VARCHAR(255) NOT NULL,
+            issued_at TIMESTAMP NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            revoked BOOLEAN NOT NULL DEFAULT FALSE,
+            user_agent VARCHAR(1000),
+            ip_address VARCHAR(100),
+            PRIMARY KEY (id, expires_at)
+        ) PARTITION BY RANGE (expires_at)
+    """)
+    cursor.execute('ALTER SEQUENCE refresh_tokens_id_seq OWNED BY refresh_tokens.id')
+    # Catches tokens expiring in a month that has no partition yet; the
+    # compaction job moves them out when it creates that month's partition
+    cursor.execute('CREATE TABLE refresh_tokens_default PARTITION OF refresh_tokens DEFAULT')
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION create_refresh_token_partition(month_start TIMESTAMP) RETURNS BOOLEAN AS $$
+        DECLARE
+            lower_bound TIMESTAMP := date_trunc('month', month_start);
+            upper_bound TIMESTAMP := date_trunc('month', month_start) + INTERVAL '1 month';
+            partition_name TEXT := 'refresh_tokens_' || to_char(date_trunc('month', month_start), 'YYYYMM');
+        BEGIN
+            IF to_regclass(partition_name) IS NOT NULL THEN
+                RETURN FALSE;
+            END IF;
+            EXECUTE format('CREATE TABLE %I (LIKE refresh_tokens)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM refresh_tokens_default WHERE expires_at >= $1 AND expires_at < $2 RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', partition_name
+            ) USING lower_bound, upper_bound;
+            EXECUTE format('ALTER TABLE refresh_tokens ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                           partition_name, lower_bound, upper_bound);
+            RETURN TRUE;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # One partition per month from now until the last live token expires
+    # (at least two months ahead); the compaction job keeps extending this
+    cursor.execute("""
+        SELECT create_refresh_token_partition(month)
+        FROM generate_series(
+            date_trunc('month', now() AT TIME ZONE 'UTC'),
+            GREATEST(
+                (SELECT MAX(expires_at) FROM refresh_tokens_unpartitioned WHERE NOT COALESCE(revoked, FALSE)),
+                (now() AT TIME ZONE 'UTC') + INTERVAL '2 months'
+            ),
+            INTERVAL '1 month'
+        ) AS month
+    """)
+    cursor.execute("""
+        INSERT INTO refresh_tokens (id, tenant_id, token_hash, issued_at, expires_at, revoked, user_agent, ip_address)
+        SELECT id, tenant_id, token_hash, COALESCE(issued_at, now() AT TIME ZONE 'UTC'), expires_at, FALSE, user_agent, ip_address
+        FROM refresh_tokens_unpartitioned
+        WHERE NOT COALESCE(revoked, FALSE) AND expires_at > now() AT TIME ZONE 'UTC'
+    """)
+    cursor.execute('DROP TABLE refresh_tokens_unpartitioned')
+    cursor.execute('CREATE INDEX idx_refresh_tokens_token_hash ON refresh_tokens (token_hash)')
+    # Per-tenant active token cap and tenant-wide revocation
+    cursor.execute('CREATE INDEX idx_refresh_tokens_tenant_issued ON refresh_tokens (tenant_id, issued_at DESC)')
+
+
+def _migration_006_schedule_slots_and_digest_runs(cursor):
+    """Per-slot scheduler history and a ledger of sent daily digests.
+
+    `job_schedule_slots` records when each daily run time ('HH:MM') was first
+    used, so the scheduler only replays missed occurrences of a slot from
+    then on; existing slots start at their first recorded run. `digest_runs`
+    holds one row per (digest_date, tenant_id) sent by the scheduler, like
+    `cash_out_runs`, so a replayed or resumed digest run skips tenants that
+    already got that day's digest.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_schedule_slots (
+            slot VARCHAR(5) PRIMARY KEY,
+            first_seen_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO job_schedule_slots (slot, first_seen_at)
+        SELECT to_char(scheduled_for, 'HH24:MI'), MIN(scheduled_for)
+        FROM job_runs
+        GROUP BY 1
+        ON CONFLICT (slot) DO NOTHING
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS digest_runs (
+            digest_date DATE NOT NULL,
+            tenant_id UUID NOT NULL REFERENCES tenants(tenant_id) ON DELETE CASCADE,
+            sent_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (digest_date, tenant_id)
+        )
+    """)
+
+
+def _migration_007_cash_out_runs_by_trigger(cursor):
+    """Key `cash_out_runs` by trigger type as well as date and tenant.
+
+    A manual cash out closes out the current day, which is also the date the
+    next scheduled run closes out. Keyed by (run_date, tenant_id) alone the
+    manual run used up the scheduled run's entry, so that night's automatic
+    cash out skipped the tenant. Each trigger type now has its own entry.
+    """
+    cursor.execute("UPDATE cash_out_runs SET trigger_type = 'automatic' WHERE trigger_type IS NULL")
+    cursor.execute("""
+        ALTER TABLE cash_out_runs
+            ALTER COLUMN trigger_type SET DEFAULT 'automatic',
+            ALTER COLUMN trigger_type SET NOT NULL
+    """)
+    cursor.execute("ALTER TABLE cash_out_runs DROP CONSTRAINT IF EXISTS cash_out_runs_pkey")
+    cursor.execute("ALTER TABLE cash_out_runs ADD PRIMARY KEY (run_date, tenant_id, trigger_type)")
+
+
+
+def _migration_008_balance_ledger_redemptions(cursor):
+    """Seed the ledger with the redemptions already in each user's history.
+
+    The balance check reconciles points_redemption transactions with the
+    ledger's redemption and cash out entries. Redemptions from before the
+    ledger existed are only in the history, so each user gets a redemption
+    entry for them and an opposite opening entry (net zero, snapshots
+    unchanged), the same way 003 seeded chore points and withdrawals.
+    """
+    cursor.execute("""
+        WITH ledger AS (
+            SELECT user_id,
+                   COALESCE(SUM(points_delta) FILTER (WHERE reason = 'points_redemption'), 0) AS redeemed_points,
+                   COALESCE(SUM(cash_delta) FILTER (WHERE reason = 'daily_cash_out'), 0) AS cash_out_cash
+            FROM balance_ledger
+            GROUP BY user_id
+        ),
+        history AS (
+            SELECT user_id, SUM(value) AS redeemed_points
+            FROM tenant_transactions
+            WHERE transaction_type = 'points_redemption'
+            GROUP BY user_id
+        ),
+        missing AS (
+            SELECT u.tenant_id, u.user_id,
+                   COALESCE(u.points_balance, 0) AS points, COALESCE(u.cash_balance, 0) AS cash,
+                   (h.redeemed_points - COALESCE(l.redeemed_points, 0) + ROUND(5 * COALESCE(l.cash_out_cash, 0)))::integer AS points_delta
+            FROM tenant_users u
+            JOIN history h ON h.user_id = u.user_id
+            LEFT JOIN ledger l ON l.user_id = u.user_id
+        )
+        INSERT INTO balance_ledger (tenant_id, user_id, reason, points_delta, cash_delta, points_balance, cash_balance)
+        SELECT m.tenant_id, m.user_id, e.reason, e.points_delta, 0, m.points, m.cash
+        FROM missing m
+        CROSS JOIN LATERAL (VALUES
+            (1, 'points_redemption', m.points_delta),
+            (2, 'opening', -m.points_delta)
+        ) AS e(ord, reason, points_delta)
+        WHERE m.points_delta <> 0
+        ORDER BY m.user_id, e.ord
+    """)
+
+
+# Ordered list of (version, name, function). Append new migrations at the
+# end with the next version number; never renumber or edit applied ones.
+MIGRATIONS = [
+    (1, 'hot_query_indexes', _migration_001_hot_query_indexes),
+    (2, 'tenant_config_versions', _migration_002_tenant_config_versions),
+    (3, 'balance_ledger', _migration_003_balance_ledger),
+    (4, 'idempotency_keys', _migration_004_idempotency_keys),
+    (5, 'refresh_token_partitions', _migration_005_refresh_token_partitions),
+    (6, 'schedule_slots_and_digest_runs', _migration_006_schedule_slots_and_digest_runs),
+    (7, 'cash_out_runs_by_trigger', _migration_007_cash_out_runs_by_trigger),
+    (8, 'balance_ledger_redemptions', _migration_008_balance_ledger_redemptions),
+]
+
+
+# Hot queries that must not fall back to a sequential scan: (name, sql, params)
+HOT_QUERIES = [
+    ('transactions_page', """
+        SELECT t.transaction_id, t.user_id, t.description, t.value, t.transaction_type, t.timestamp
+        FROM tenant_transactions t
+        WHERE t.tenant_id = %s AND t.timestamp IS NOT NULL
+        ORDER BY t.timestamp DESC, t.transaction_id DESC
+        LIMIT 51
+    """, (_SAMPLE_TENANT_ID,)),
+    ('transactions_page_for_user', """
+        SELECT t.transaction_id, t.description, t.value, t.transaction_type, t.timestamp
+        FROM tenant_transactions t
+        WHERE t.tenant_id = %s AND t.user_id = %s AND t.timestamp IS NOT NULL
+        ORDER BY t.timestamp DESC, t.transaction_id DESC
+        LIMIT 51
+    """, (_SAMPLE_TENANT_ID, 1)),
+    ('tenant_users', """
+        SELECT user_id, full_name, points_balance, cash_balance
+        FROM tenant_users WHERE tenant_id = %s
+    """, (_SAMPLE_TENANT_ID,)),
+    ('tenant_user_lookup', """
+        SELECT full_name FROM tenant_users WHERE user_id = %s AND tenant_id = %s
+    """, (1, _SAMPLE_TENANT_ID)),
+    ('tenant_chores', """
+        SELECT * FROM tenant_chores WHERE tenant_id = %s
+        ORDER BY point_value, REPLACE(chore, '_', ' ') ASC
+    """, (_SAMPLE_TENANT_ID,)),
+    ('refresh_token_lookup', """
+        SELECT id, tenant_id, issued_at, expires_at, revoked
+        FROM refresh_tokens WHERE token_hash = %s AND expires_at > %s
+    """, ('0' * 64, '2000-01-01')),
+    ('tenant_login', """
+        SELECT tenant_id, tenant_password FROM tenants WHERE LOWER(tenant_name) = LOWER(%s)
+    """, ('family',)),
+]
+
+
+def create_schema_migrations_table(cursor):
+    """Create the `schema_migrations` table recording applied versions."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_applied_versions(cursor):
+    cursor.execute('SELECT version FROM schema_migrations')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations(conn):
+    """Apply all pending migrations in version order.
+
+    Returns the list of (version, name) applied by this call. Any failure
+    rolls back the failing migration and re-raises; earlier migrations stay
+    applied.
+    """
+    applied = []
+    cursor = conn.cursor()
+    try:
+        create_schema_migrations_table(cursor)
+        conn.commit()
+
+        cursor.execute('SELECT pg_advisory_lock(%s)', (MIGRATION_LOCK_KEY,))
+        try:
+            done = get_applied_versions(cursor)
+            conn.commit()
+            for version, name, migrate in MIGRATIONS:
+                if version in done:
+                    continue
+                try:
+                    migrate(cursor)
+                    cursor.execute(
+                        'INSERT INTO schema_migrations (version, name) VALUES (%s, %s)',
+                        (version, name)
+                    )
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append((version, name))
+                print(f'Applied migration {version:03d}_{name}')
+        finally:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (MIGRATION_LOCK_KEY,))
+            conn.commit()
+    finally:
+        cursor.close()
+    return applied
+
+
+def _find_seq_scans(plan_node, found):
+    """Collect the relations read by a Seq Scan anywhere in an EXPLAIN JSON plan."""
+    if plan_node.get('Node Type') == 'Seq Scan':
+        found.append(plan_node.get('Relation Name'))
+    for child in plan_node.get('Plans', []):
+        _find_seq_scans(child, found)
+    return found
+
+
+def check_query_plans(conn):
+    """EXPLAIN each hot query with sequential scans disabled.
+
+    With `enable_seqscan = off` the planner still picks a seq scan when no
+    index can serve the query, so any Seq Scan left in the plan means a
+    missing or unusable index. Returns a list of
+    {query, seq_scans, plan} dicts for the failing queries (empty if all pass).
+    """
+    failures = []
+    cursor = conn.cursor()
+    try:
+        for name, sql, params in HOT_QUERIES:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            seq_scans = _find_seq_scans(plan[0]['Plan'], [])
+            if seq_scans:
+                failures.append({'query': name, 'seq_scans': seq_scans, 'plan': plan[0]['Plan']})
+            conn.rollback()
+    finally:
+        cursor.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='list applied and pending migrations')
+    group.add_argument('--check', action='store_true', help='fail if a hot query uses a sequential scan')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        if args.status:
+            cursor = conn.cursor()
+            create_schema_migrations_table(cursor)
+            done = get_applied_versions(cursor)
+            conn.commit()
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:03d}_{name}: {'applied' if version in done else 'pending'}")
+            return 0
+
+        if args.check:
+            failures = check_query_plans(conn)
+            for failure in failures:
+                print(f"FAIL {failure['query']}: seq scan on {', '.join(failure['seq_scans'])}")
+                print(json.dumps(failure['plan'], indent=2))
+            if not failures:
+                print(f'OK: {len(HOT_QUERIES)} hot queries use indexes')
+            return 1 if failures else 0
+
+        applied = run_migrations(conn)
+        if not applied:
+            print('No pending migrations')
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
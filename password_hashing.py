@@ -0,0 +1,64 @@
+"""
+password_hashing.py
+
+Argon2 password hashing for tenant passwords. app.py runs verifications in
+a pool of worker processes (see PasswordHashPool); benchmarks import this
+module on its own.
+
+The hash cost is tunable with ARGON2_TIME_COST, ARGON2_MEMORY_COST (KiB) and
+ARGON2_PARALLELISM; benchmarks/bench_argon2.py measures candidate settings
+on the target hardware. Stored hashes made with other settings are upgraded
+on the tenant's next successful login.
+"""
+
+import functools
+import os
+import secrets
+
+from argon2 import PasswordHasher, exceptions as argon2_exceptions
+
+# Defaults are the argon2-cffi defaults, so existing hashes stay current
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 3))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 65536))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 4))
+
+# Argon2 hasher instance (raise if argon2-cffi missing so failures are visible)
+ph = PasswordHasher(time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST, parallelism=ARGON2_PARALLELISM)
+
+
+def hash_password(password):
+    """Return the Argon2 hash of password."""
+    return ph.hash(password)
+
+
+@functools.lru_cache(maxsize=1)
+def _dummy_hash():
+    return ph.hash(secrets.token_urlsafe(16))
+
+
+def verify_password(stored, password):
+    """Check password against a stored Argon2 hash.
+
+    With stored=None (unknown tenant) the password is checked against a
+    throwaway hash, so the call takes as long as a wrong password.
+
+    Returns:
+        (verified, new_hash): new_hash is a fresh hash of the password when
+        the stored one was made with other parameters, otherwise None.
+    """
+    if stored is None:
+        try:
+            ph.verify(_dummy_hash(), password)
+        except argon2_exceptions.VerificationError:
+            pass
+        return False, None
+    # Only accept Argon2-formatted hashes (argon2-cffi). Reject other formats.
+    if not (isinstance(stored, str) and stored.startswith('$argon2')):
+        return False, None
+    try:
+        ph.verify(stored, password)
+    except (argon2_exceptions.VerificationError, argon2_exceptions.InvalidHash):
+        return False, None
+    if ph.check_needs_rehash(stored):
+        return True, ph.hash(password)
+    return True, None
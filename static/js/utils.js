@@ -387,6 +387,62 @@ async function getTransactions() {
     }
 }
 
+/**
+ * Fetch one page of transactions, newest first.
+ * @param {Object} params - Optional { limit, cursor, user_id, transaction_type, start, end }
+ * @returns {Promise<Object>} { transactions: Array, next_cursor: string|null }
+ */
+async function getTransactionsPage(params = {}) {
+    const query = new URLSearchParams({ limit: 100 });
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== null && value !== undefined && value !== '') {
+            query.set(key, value);
+        }
+    });
+    const response = await fetch(`/api/transactions?${query.toString()}`);
+    if (!response.ok) {
+        throw new Error(`Failed to load transactions: ${response.status}`);
+    }
+    return await response.json();
+}
+
+/**
+ * Create a key that identifies one user action across retries.
+ * @returns {string}
+ */
+function newIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+/**
+ * POST JSON to a balance-changing endpoint with an Idempotency-Key.
+ * Network failures, and 409s for a request still being processed, are retried
+ * with the same key, so the server applies the action at most once and
+ * answers retries with the original result.
+ * @param {string} url - Endpoint URL
+ * @param {Object} payload - JSON body
+ * @param {number} attempts - Total attempts (default 3)
+ * @returns {Promise<Response>} Fetch response
+ */
+async function postIdempotent(url, payload, attempts = 3) {
+    const headers = { 'Content-Type': 'application/json', 'Idempotency-Key': newIdempotencyKey() };
+    const body = JSON.stringify(payload);
+    for (let attempt = 1; ; attempt++) {
+        try {
+            const response = await fetch(url, { method: 'POST', headers, body });
+            if (response.status !== 409 || !response.headers.get('Retry-After') || attempt >= attempts) {
+                return response;
+            }
+        } catch (error) {
+            if (attempt >= attempts) throw error;
+        }
+        await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+    }
+}
+
 /**
  * Record a chore completion (permission-protected endpoint).
  * @param {Object} data - { user_id, chore_id, value }
@@ -400,11 +456,7 @@ async function recordChore(data) {
             points: data.value ?? data.points ?? 0
         };
 
-        const response = await fetch('/api/record-chore', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
+        const response = await postIdempotent('/api/record-chore', payload);
         return response;
     } catch (error) {
         console.error('Error recording chore:', error);
@@ -425,11 +477,7 @@ async function redeemPoints(data) {
         };
         if (data.redemption_type) payload.redemption_type = data.redemption_type;
 
-        const response = await fetch('/api/redeem-points', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(payload)
-        });
+        const response = await postIdempotent('/api/redeem-points', payload);
         return response;
     } catch (error) {
         console.error('Error redeeming points:', error);
@@ -445,15 +493,9 @@ async function redeemPoints(data) {
  */
 async function withdrawCash(userId, amount) {
     try {
-        const response = await fetch('/api/withdraw-cash', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                user_id: userId,
-                amount: amount
-            })
+        const response = await postIdempotent('/api/withdraw-cash', {
+            user_id: userId,
+            amount: amount
         });
         return response;
     } catch (error) {
@@ -988,18 +1030,19 @@ async function updateChore(choreId, choreData) {
 }
 
 /**
- * Import chores from JSON data
- * @param {Array} choresData - Array of chore objects to import
+ * Import chores from a CSV file (streamed as-is) or an array of chore objects
+ * @param {File|Blob|Array} choresData - CSV file or array of chore objects to import
  * @returns {Promise<Response>} Fetch response object
  */
 async function importChores(choresData) {
     try {
+        const isFile = choresData instanceof Blob;
         const response = await fetch('/api/chores/import', {
             method: 'POST',
             headers: {
-                'Content-Type': 'application/json',
+                'Content-Type': isFile ? 'text/csv' : 'application/json',
             },
-            body: JSON.stringify({ chores: choresData })
+            body: isFile ? choresData : JSON.stringify({ chores: choresData })
         });
         return response;
     } catch (error) {
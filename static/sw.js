@@ -3,7 +3,7 @@
  * Handles offline caching and PWA functionality
  */
 
-const ASSET_VERSION = '2025-12-08a';
+const ASSET_VERSION = '2026-10-18b';
 const CACHE_VERSION = `v1.4.0-${ASSET_VERSION}`;
 const CACHE_NAME = `family-chores-${CACHE_VERSION}`;
 